@@ -3,9 +3,14 @@ Script name: Calc_2D_MOE_GeoJSON.py
 Author: Dr. Chris Dearden (Hartree Centre, STFC Daresbury Laboratory)
 Date: March 2020
 Purpose: Script to calculate validation metrics for oil spill dispersion models relative to satellite observations and/or coastal reports.
-Both obs and model data must be in GeoJSON format. Both deterministic and probabilistic model output are supported. Model contours are assumed to
-be cut-outs, such that they do not overlap with contours of a higher level.
-Usage: ./Calc_2D_MOE_GeoJSON.py <obsFile> <modelFile> <modelType> <valType> [--noOilFile NOOILFILE] [--crs CRS] [-h]
+Both obs and model data must be in GeoJSON format, or in GeoParquet (.parquet) or FlatGeobuf (.fgb) format (see geo_formats.py). Both deterministic
+and probabilistic model output are supported. Model contours are assumed to be cut-outs, such that they do not overlap with contours of a higher level.
+When a no oil file is given, only the model features near the observation scene are read from GeoParquet and FlatGeobuf model files.
+Usage: ./Calc_2D_MOE_GeoJSON.py <obsFile> <modelFile> <modelType> <valType> [--noOilFile NOOILFILE] [--crs CRS] [--engine ENGINE] [--resolution RESOLUTION]
+                                   [--bufwidth BUFWIDTH] [--tileVertices TILEVERTICES] [--tileWorkers TILEWORKERS] [--simplify SIMPLIFY] [--gridSize GRIDSIZE]
+                                   [--fss FSS] [--fssScales FSSSCALES [FSSSCALES ...]] [--fssResolution FSSRESOLUTION] [--cacheDir CACHEDIR] [--cacheSize CACHESIZE] [--noCache] [--reader READER]
+                                   [--plots PLOTS] [--mapTolerance MAPTOLERANCE [MAPTOLERANCE ...]]
+                                   [--plotWorkers PLOTWORKERS] [--output OUTPUT] [--metricsOnly] [--timings TIMINGS] [--profile PROFILE] [-h]
         <obsFile>     - Required. Path (relative or full) to the GeoJSON file defining the oil detected within the satellite data
         <modelFile>   - Required. Path (relative or full) to the GeoJSON file containing the model prediction data.
                         This can be either deterministic or probabilistic output.
@@ -16,6 +21,63 @@ Usage: ./Calc_2D_MOE_GeoJSON.py <obsFile> <modelFile> <modelType> <valType> [--n
         <--crs>       - Optional. Integer specifying the code of a particular coordinate reference system to convert to.
                         If not specified, the code will use the default value of 3857, which corresponds to WGS 84 (pseudo mercator projection).
                         See http://epsg.io/3857 for details
+        <--engine>    - Optional. Method used to calculate the overlap areas, either 'index' (default), 'overlay', 'raster', 'line' or 'tiled'.
+                        'index' uses a spatial index to calculate the overlap areas only, and 'overlay' uses geopandas overlay.
+                        The geopandas overlay is always used where the overlap geometry is needed for plotting.
+                        'raster' calculates approximate areas on a grid, with an estimate of their discretisation error
+                        (satellite validation only). 'line' matches the model and observed coastlines directly, without
+                        buffering them, and calculates the 2-D MOE from coastline lengths rather than areas (coastal validation only).
+                        'tiled' splits the domain into tiles sized to the number of vertices they hold, and sums the areas calculated
+                        within each tile on a pool of worker processes, for very large and detailed spills.
+        <--resolution> - Optional. Width in metres of the grid cells used by the 'raster' engine. By default the resolution
+                        is chosen to give 2000 cells along the longest side of the grid.
+        <--bufwidth>  - Optional. Width in metres of the buffer used to convert coastlines to polygons (default 5). For the 'line'
+                        engine, this is instead the maximum distance between model and observed coastlines for them to match.
+        <--tileVertices> - Optional. Largest number of vertices in a tile for the 'tiled' engine (default 50000).
+        <--tileWorkers> - Optional. Number of worker processes used by the 'tiled' engine (default one per tile, up to the number of CPUs).
+        <--simplify>  - Optional. Simplify the obs and model geometries before calculating the overlap, with the largest tolerance
+                        for which the relative change in the area (or coastline length) of each geometry is within this bound,
+                        e.g. 0.001 for 0.1%. The change in area and the reduction in the number of vertices are reported.
+        <--gridSize>  - Optional. Snap the obs and model geometries to a grid of this size in metres (in the chosen crs) before they are
+                        dissolved and overlaid, repairing any geometry made invalid. Snapping the inputs makes near-coincident vertices
+                        coincident, avoiding the topology errors they cause. The grid applies to the inputs only: the dissolve and
+                        overlay run at full precision, so the overlap geometry is not snapped to the grid. The largest relative change
+                        in area (precision_drift) is reported with the metrics.
+        <--fss>       - Optional. Path of a CSV file to write the Fractions Skill Score (FSS) of each contour level to, for a range of
+                        neighbourhood widths (satellite validation only). The obs (within the known observation region) and the model
+                        contours are rasterized onto a common grid, and the FSS of every width is calculated from summed-area tables
+                        (see calc_fss.py). The smallest width at which the model is skilful is printed for each contour level.
+        <--fssScales> - Optional. Neighbourhood widths, in grid cells (odd numbers), of the FSS curves (default 1 3 5 9 17 33 65 129).
+        <--fssResolution> - Optional. Width in metres of the grid cells used for the FSS. By default the resolution is chosen to
+                        give 500 cells along the longest side of the grid.
+        <--cacheDir>  - Optional. Directory used to cache the obs files once converted to the chosen crs and dissolved,
+                        so that repeat validations against the same observations skip the parsing and projection. The areas and
+                        overlaps calculated from the inputs are also cached there (see result_cache.py), keyed by the contents of
+                        the input files and the options that affect them, so that a repeat validation of the same files (e.g. to
+                        change the plots or output) only recalculates the metrics.
+        <--cacheSize> - Optional. Maximum size of the cache directory in MB (default 1024). Least recently used entries are removed first.
+        <--noCache>   - Optional. Do not read from or write to the cache directory, i.e. recalculate everything as if --cacheDir
+                        was not given. Also accepted as --no-cache.
+        <--reader>    - Optional. Method used to read the GeoJSON files: 'gdal' (default) for geopandas read_file, 'fast' to parse
+                        the files with a fast JSON parser, reading only the properties used here, or 'stream' to do the same
+                        while decoding the features one at a time (lower peak memory use). Not used for GeoParquet and
+                        FlatGeobuf files.
+        <--plots>     - Optional. Plots to produce: 'all' (default) for the png plots and interactive maps, 'png' for the png plots
+                        only, or 'none' to calculate the metrics only (matplotlib is then not used at all).
+        <--mapTolerance> - Optional. Simplification tolerances in metres of the levels of detail of the interactive maps, from
+                        coarsest to finest (default 500 50 5). The map shows the coarsest level finer than a pixel at each zoom.
+        <--plotWorkers> - Optional. Number of worker processes used to render the plots (default one per plot, up to the number of CPUs).
+        <--output>    - Optional. Path of a CSV file to write the results to (the 2-D MOE of each contour level, and the skill scores).
+        <--metricsOnly> - Optional. Calculate the metrics only, for scripted use: no plots are produced (as for --plots none), the
+                        progress of the validation is not printed, and the results are written to --output, or printed in CSV
+                        format if --output is not given. The plotting and map modules are never imported. Also accepted as
+                        --metrics-only.
+        <--timings>   - Optional. Path of a file to write the profile of the run to, in JSON format (or CSV format, if the path ends
+                        in .csv): the wall time, CPU time and peak memory of each stage (read, reproject, dissolve, no oil clip,
+                        coastal buffer, overlay, metrics, plotting and html export), and the number of features, parts and
+                        vertices of each input (see instrumentation.py).
+        <--profile>   - Optional. Path of a file to write the report of a sampling profiler (pyinstrument, if installed) of the run to,
+                        as text, or as html if the path ends in .html.
         <--help>      - Optional. Shows help text.
 
 Output:
@@ -24,23 +86,25 @@ is the 2-D Measure of Effectiveness (Warner et al, 2004, J. Appl. Met.). The res
 is presented as a scatter plot, revealing the extent of the overlap between the model prediction
 and the observations. In addition, skill scores based on area and centroid location are also calculated
 for validation of 'best estimate' model output against satellite data. These results are also presented as a 2-D scatter plot.
-Maps showing the predicted and observed oil spill areas/coastlines are also produced.
+Maps showing the predicted and observed oil spill areas/coastlines are also produced, along with an interactive map in html format.
 """
 
 ##### IMPORT RELEVANT LIBRARIES
 
 import argparse
-from process_data import calc_poly_overlap, read_geojson
-from plot_maps_metrics import plot_2D_MOE_scat, plot_area_maps, plot_coastal_maps
-import mplleaflet as leaf
-from calc_metrics import calc_2DMOE
+import contextlib
+from process_data import DEFAULT_BUFWIDTH
+from calc_fss import DEFAULT_SCALES
+from instrumentation import sampling_profiler, start_profile, stop_profile, write_profile
+from render_plots import DEFAULT_TOLERANCES, PLOT_MODES, render_plots
+from validation import validate
 
 #####
 
 
-def main():
-
-    ##### READ IN COMMAND LINE ARGUMENTS
+def build_parser():
+    #  Function to return the parser of the command line arguments, which are also accepted by the validation service
+    #  (see validation_service.py)
 
     parser = argparse.ArgumentParser(
         description="""
@@ -53,12 +117,14 @@ def main():
     )
     parser.add_argument(
         "obsFile",
-        help="Required. Absolute or relative path to observation data file in GeoJSON format",
+        help="Required. Absolute or relative path to observation data file in GeoJSON, GeoParquet (.parquet) or FlatGeobuf (.fgb) format",
         type=str,
     )
     parser.add_argument(
         "modelFile",
-        help="Required. Absolute/relative path to model output file (either deterministic or probabilistic) in GeoJSON format",
+        help="Required. Absolute/relative path to model output file (either deterministic or probabilistic) in GeoJSON, GeoParquet (.parquet) \
+                            or FlatGeobuf (.fgb) format. If a no oil file is given, only the model features whose bounding boxes meet the \
+                            observation scene are read from GeoParquet and FlatGeobuf files.",
         type=str,
     )
     parser.add_argument(
@@ -74,7 +140,7 @@ def main():
     )
     parser.add_argument(
         "--noOilFile",
-        help="Optional path to a file in GeoJSON format defining the region where oil was not observed in the satellite image. \
+        help="Optional path to a file in GeoJSON, GeoParquet or FlatGeobuf format defining the region where oil was not observed in the satellite image. \
                             If this is specified, any model output that lies outside this detection region will be excluded from the analysis.",
         type=str,
     )
@@ -85,157 +151,279 @@ def main():
         type=int,
         default=3857,
     )
+    parser.add_argument(
+        "--engine",
+        help="Optional method used to calculate the overlap areas, either 'index' (default; spatial index, areas only), \
+                            'overlay' (geopandas overlay), 'raster' (approximate areas on a grid; Satellite only) \
+                            'line' (coastline lengths from matching the coastlines directly; Coastal only) \
+                            or 'tiled' (areas summed over tiles on a pool of worker processes)",
+        type=str,
+        choices=["index", "overlay", "raster", "line", "tiled"],
+        default="index",
+    )
+    parser.add_argument(
+        "--resolution",
+        help="Optional width in metres of the grid cells used by the 'raster' engine. \
+                            Default is to use 2000 cells along the longest side of the grid",
+        type=float,
+    )
+    parser.add_argument(
+        "--bufwidth",
+        help="Optional width in metres of the buffer used to convert coastlines to polygons for coastal validation. \
+                            For the 'line' engine, the maximum distance between model and obs coastlines for them to match. Default value is 5",
+        type=float,
+        default=DEFAULT_BUFWIDTH,
+    )
+    parser.add_argument(
+        "--tileVertices",
+        help="Optional largest number of vertices in a tile for the 'tiled' engine. Default value is 50000",
+        type=int,
+    )
+    parser.add_argument(
+        "--tileWorkers",
+        help="Optional number of worker processes used by the 'tiled' engine. Default is one per tile, up to the number of CPUs",
+        type=int,
+    )
+    parser.add_argument(
+        "--simplify",
+        help="Optional maximum relative change in area (or coastline length) allowed when simplifying the obs and model \
+                            geometries before calculating the overlap, e.g. 0.001 for 0.1%%. Default is no simplification",
+        type=float,
+    )
+    parser.add_argument(
+        "--gridSize",
+        help="Optional size in metres of the grid to snap the obs and model geometries to before they are dissolved and overlaid, \
+                            e.g. 1. Only the inputs are snapped; the dissolve and overlay run at full precision. The resulting \
+                            change in area is reported with the metrics. Default is to keep the full precision",
+        type=float,
+    )
+    parser.add_argument(
+        "--fss",
+        help="Optional path of a CSV file to write the Fractions Skill Score of each contour level to, over a range of \
+                            neighbourhood widths (satellite validation only)",
+        type=str,
+    )
+    parser.add_argument(
+        "--fssScales",
+        help="Optional neighbourhood widths, in grid cells (odd numbers), over which to calculate the Fractions Skill Score. \
+                            Default values are " + " ".join(str(n) for n in DEFAULT_SCALES),
+        type=int,
+        nargs="+",
+        default=DEFAULT_SCALES,
+    )
+    parser.add_argument(
+        "--fssResolution",
+        help="Optional width in metres of the grid cells used for the Fractions Skill Score. \
+                            By default the resolution is chosen to give 500 cells along the longest side of the grid",
+        type=float,
+    )
+    parser.add_argument(
+        "--cacheDir",
+        help="Optional directory in which to cache the obs files, once converted to crs and dissolved, and the overlap areas. \
+                            Repeat validations against the same obs files will then skip the parsing and projection, and \
+                            repeat validations of the same inputs with the same options will skip the overlap calculation",
+        type=str,
+    )
+    parser.add_argument(
+        "--cacheSize",
+        help="Optional maximum size of the cache directory in MB. Default value is 1024",
+        type=int,
+        default=1024,
+    )
+    parser.add_argument(
+        "--noCache",
+        "--no-cache",
+        help="Optional flag to ignore the cache directory, recalculating the obs geometries and overlap areas \
+                            without reading or writing any cached results",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--reader",
+        help="Optional method used to read the GeoJSON files: 'gdal' (default; geopandas read_file), 'fast' (fast JSON parser, \
+                            only the properties used are read) or 'stream' (as 'fast', decoding the features one at a time). GeoParquet and FlatGeobuf \
+                            files are always read with their own readers",
+        type=str,
+        choices=["gdal", "fast", "stream"],
+        default="gdal",
+    )
+    parser.add_argument(
+        "--plots",
+        help="Optional choice of plots to produce: 'all' (default; png plots and interactive maps), 'png' (png plots only) \
+                            or 'none' (metrics only, without using matplotlib)",
+        type=str,
+        choices=PLOT_MODES,
+        default="all",
+    )
+    parser.add_argument(
+        "--mapTolerance",
+        help="Optional simplification tolerances in metres of the levels of detail written to the interactive maps, \
+                            from coarsest to finest. Default values are 500 50 5",
+        type=float,
+        nargs="+",
+        default=DEFAULT_TOLERANCES,
+    )
+    parser.add_argument(
+        "--plotWorkers",
+        help="Optional number of worker processes used to render the plots. Default is one per plot, up to the number of CPUs",
+        type=int,
+    )
+    parser.add_argument(
+        "--output",
+        help="Optional path of a CSV file to write the results (2-D MOE of each contour level and skill scores) to",
+        type=str,
+    )
+    parser.add_argument(
+        "--metricsOnly",
+        "--metrics-only",
+        help="Optional flag to calculate the metrics only, without any plots or progress output. The results are written \
+                            to --output, or printed in CSV format if --output is not given",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--timings",
+        help="Optional path of a file to write the time, CPU time and peak memory of each stage of the run, and the size \
+                            of each input, to. JSON format, or CSV format if the path ends in .csv",
+        type=str,
+    )
+    parser.add_argument(
+        "--profile",
+        help="Optional path of a file to write the report of a sampling profiler of the run to (text, or html if the \
+                            path ends in .html). Uses pyinstrument if it is installed, and cProfile otherwise",
+        type=str,
+    )
+
+    return parser
+
+
+def run_validation(args, store=None):
+    #  Function to run the validation and render the plots for the parsed command line arguments
+    #
+    #   Input arguments:
+    #
+    #   args  - argparse namespace of the command line arguments (see build_parser)
+    #   store - Optional dictionary in which the obs are kept in memory for reuse by later validations (see read_geojson)
+    #
+    #   Output arguments:
+    #
+    #   result - ValidationResult holding the results of the validation (see validation.py)
+    #   files  - list of the plot files written
+
+    plots = args.plots
+    metricsOnly = args.metricsOnly
+    timings = args.timings
+    profile = args.profile
+
+    if metricsOnly:
+        plots = "none"
+
+    #  Record the time and memory of each stage of the run, if requested (see instrumentation.py)
+    if timings is not None:
+        start_profile()
+
+    with contextlib.nullcontext() if profile is None else sampling_profiler(profile):
+        result, files = run_stages(args, plots, store)
+
+    if timings is not None:
+        result.profile = stop_profile()
+        write_profile(result.profile, timings)
+        if not metricsOnly:
+            print("Profile of the run written to : ", timings)
+
+    return result, files
+
+
+def run_stages(args, plots, store=None):
+    #  Function to run the stages of the validation (see run_validation), and return the ValidationResult and the list
+    #  of plot files written
 
-    args = parser.parse_args()
     obsFile = args.obsFile
     modelFile = args.modelFile
     modelType = args.modelType
     valType = args.valType
     noOilFile = args.noOilFile
     crs = args.crs
+    engine = args.engine
+    resolution = args.resolution
+    bufwidth = args.bufwidth
+    tileVertices = args.tileVertices
+    tileWorkers = args.tileWorkers
+    simplify = args.simplify
+    gridSize = args.gridSize
+    fss = args.fss
+    fssScales = args.fssScales
+    fssResolution = args.fssResolution
+    cacheDir = None if args.noCache else args.cacheDir
+    cacheSize = args.cacheSize * 1024 ** 2
+    reader = args.reader
+    mapTolerance = args.mapTolerance
+    plotWorkers = args.plotWorkers
+    output = args.output
+    metricsOnly = args.metricsOnly
+
+    #####
+
+    ##### READ IN GEOJSON FILES, CALCULATE THE OBS, MODEL AND OVERLAP AREAS, THE 2-D MOE AND SKILL SCORES
+    ##### For details of the 2-D MOE, see Warner et al 2004., J. Appl. Met; for the steps of the validation, see validation.py
+
+    #  The overlap geometry is only needed for the area maps, which are plotted for satellite validation,
+    #  and the interactive maps (and so only if the plots are being produced)
+    result = validate(
+        obsFile,
+        modelFile,
+        noOilFile,
+        modelType,
+        valType,
+        crs,
+        engine=engine,
+        resolution=resolution,
+        bufwidth=bufwidth,
+        tile_vertices=tileVertices,
+        tile_workers=tileWorkers,
+        simplify=simplify,
+        grid_size=gridSize,
+        fss_scales=None if fss is None else fssScales,
+        fss_resolution=fssResolution,
+        keep_geometry=(plots == "all" or (valType == "Satellite" and plots != "none")),
+        reader=reader,
+        cache_dir=cacheDir,
+        cache_size=cacheSize,
+        verbose=not metricsOnly,
+        store=store,
+    )
 
     #####
 
-    ##### READ IN GEOJSON FILES, CHECK VALIDITY, AND RETURN AS GEODATAFRAMES
-
-    oil, model, no_oil, casename, time, plevs = read_geojson(
-        obsFile, modelFile, noOilFile, modelType, valType, crs
-    )
-
-    if valType == "Coastal":
-        #  Do a basic plot of the model coastal prediction with the obs regions highlighted and save as a png file
-        modelplot, ax = plot_coastal_maps(
-            oil, model, casename, time, modelType, noOil=no_oil, levels=plevs
-        )
-        modelplot.savefig(
-            "/media/Coastal_map_"
-            + str(casename)
-            + "_"
-            + str(modelType)
-            + "_"
-            + str(time)
-            + ".png",
-            bbox_inches="tight",
-        )
-        if modelType == "BE":
-            leaf.save_html(
-                fig=ax.figure,
-                fileobj="/media/Interactive_map_"
-                + str(casename)
-                + "_"
-                + str(modelType)
-                + "_"
-                + str(time)
-                + ".html",
-            )
+    ##### WRITE OUT THE RESULTS
+
+    if output is not None:
+        result.summary().to_csv(output, index=False)
+        if not metricsOnly:
+            print("Results written to : ", output)
+    elif metricsOnly:
+        print(result.summary().to_csv(index=False), end="")
+
+    if result.fss is not None:
+        result.fss.to_csv(fss, index=False)
+        if not metricsOnly:
+            print("Fractions skill score curves written to : ", fss)
 
     #####
 
-    ##### PREPARE AND UPDATE GEODATAFRAMES WITH OBS AREA, MODEL AREA AND OVERLAP AREA
-
-    oil, model_known, overlap, plevs = calc_poly_overlap(
-        oil, model, no_oil, casename, time, noOilFile, modelType, valType, crs
-    )
-
-    if overlap.empty:
-        Aob = oil["obs_area"]
-        Apr = model_known["area_full_contour"]
-        print("Overlap geodataframe is empty; skipping 2-D MOE calculation")
-
-    else:
-        if valType == "Satellite":
-            #  Produce a basic map of the obs, model and overlap regions and save in png format
-            modelplot = plot_area_maps(
-                oil, model_known, overlap, casename, time, modelType, levels=plevs
-            )
-            modelplot.savefig(
-                "/media/Area_maps_"
-                + str(casename)
-                + "_"
-                + str(modelType)
-                + "_"
-                + str(time)
-                + ".png",
-                bbox_inches="tight",
-            )
-
-        ##### CALCULATE THE 2-D MEASURE OF EFFECTIVENESS AND GENERATE PLOTS
-        ##### For details, see Warner et al 2004., J. Appl. Met
-
-        Aob = overlap["obs_area"]
-        Apr = overlap["area_full_contour"]
-        Aov = overlap["overlap_full_contour"]
-
-        #  Call function to return x and y components of the 2-D MOE
-        (x, y) = calc_2DMOE(Aob, Apr, Aov)
-
-        #  Generate 2-D MOE space diagram and save in png format
-        olevs = (overlap.contourlev).to_numpy()
-        if modelType == "BE":
-            MOEfig = plot_2D_MOE_scat(x, y, modelType, casename, time)
-        elif modelType == "Prob":
-            MOEfig = plot_2D_MOE_scat(x, y, modelType, casename, time, levels=olevs)
-
-        MOEfig.savefig(
-            "/media/2D_MOE_"
-            + str(casename)
-            + "_"
-            + str(modelType)
-            + "_"
-            + str(valType)
-            + "_"
-            + str(time)
-            + ".png",
-            bbox_inches="tight",
-        )
+    ##### RENDER THE PLOTS
+
+    #  The plots are rendered together once the metrics have been calculated (see render_plots.py)
+    files = render_plots(result.plot_jobs("/media", plots, mapTolerance), plotWorkers)
 
     #####
 
-    ##### FOR SATELLITE VALIDATION AGAINST DETERMINISTIC OUTPUT, CALCULATE ADDITIONAL SKILL SCORES
-
-    if valType == "Satellite" and modelType == "BE":
-        from calc_metrics import calc_area_ss, calc_centroid_ss
-        from plot_maps_metrics import plot_ss_scat, plot_centroid_map
-
-        print("Area (in km^2) of observed spill is : ", Aob[0])
-        print("Area (in km^2) of modelled spill is : ", Apr[0])
-
-        #  Call function to calcluate Area Skill Score, Ass
-        Ass = calc_area_ss(Aob[0], Apr[0])
-        print("Area skill score is : ", Ass)
-
-        #  Call function to calculate Centroid Skill Score, Css
-        Css, obs_centroid, model_centroid, minpoint, maxpoint = calc_centroid_ss(
-            oil, model_known
-        )
-        print("Centroid skill score is : ", Css)
-
-        #  Plot the modelled and observed oil spill areas, with centroids and distances indicated
-        centroidfig = plot_centroid_map(
-            oil,
-            obs_centroid,
-            model_known,
-            model_centroid,
-            minpoint,
-            maxpoint,
-            casename,
-            time,
-        )
-        centroidfig.savefig(
-            "/media/Centroid_map_" + str(casename) + "_" + str(time) + ".png",
-            bbox_inches="tight",
-        )
-
-        #  Proceed to plot skill score results on a scatter diagram
-        SSfig = plot_ss_scat(Ass, Css, casename, time)
-        SSfig.savefig(
-            "/media/Skillscores_scatterplot_"
-            + str(casename)
-            + "_"
-            + str(time)
-            + ".png",
-            bbox_inches="tight",
-        )
+    return result, files
+
+
+def main():
+
+    ##### READ IN COMMAND LINE ARGUMENTS, THEN RUN THE VALIDATION
+
+    run_validation(build_parser().parse_args())
 
     #####
 
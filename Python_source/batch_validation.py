@@ -0,0 +1,518 @@
+"""
+Script name: batch_validation.py
+Purpose: Script to run many validations (obs/model pairs) within a single Python process, using a pool of worker processes.
+This avoids paying the interpreter and library start-up costs for every timestamp and model type, as happens when
+Calc_2D_MOE_GeoJSON.py is invoked once per case. The cases to run are either read from a manifest file (CSV), or discovered
+automatically from the GeoJSON filenames within a test case directory (e.g. validation_data/Corsica). The 2-D MOE results
+for every case are written to one consolidated results table in CSV format.
+Usage: ./batch_validation.py [--caseDir CASEDIR] [--manifest MANIFEST] [--modelType MODELTYPE] [--valType VALTYPE]
+                             [--crs CRS] [--engine ENGINE] [--resolution RESOLUTION] [--bufwidth BUFWIDTH] [--tileVertices TILEVERTICES] [--simplify SIMPLIFY]
+                             [--gridSize GRIDSIZE] [--cacheDir CACHEDIR] [--reader READER]
+                             [--workers WORKERS] [--output OUTPUT] [--logDir LOGDIR] [-h]
+        <--caseDir>   - Path to a test case directory containing GeoJSON files named according to the convention used in
+                        validation_data, i.e. <case>_<contour|coastline>_geojson_<detected_oil|detected_no_oil|probability|concentration>[_<DATE>].geojson
+        <--manifest>  - Path to a CSV file listing the cases to run. Required columns are obsFile, modelFile, modelType and valType.
+                        Optional columns are noOilFile and crs. Relative paths are taken relative to the manifest location.
+        <--modelType> - Optional. Restrict discovered cases to either 'BE' or 'Prob' (default is to run both)
+        <--valType>   - Optional. Override the validation type ('Satellite' or 'Coastal') inferred from the filenames
+        <--crs>       - Optional. Integer code of the coordinate reference system to convert to (default 3857)
+        <--engine>    - Optional. Method used to calculate the overlap areas, either 'index' (default), 'overlay', 'raster', 'line' or 'tiled'
+        <--resolution> - Optional. Width in metres of the grid cells used by the 'raster' engine
+        <--bufwidth>  - Optional. Width in metres of the coastline buffer, or matching tolerance of the 'line' engine (default 5)
+        <--tileVertices> - Optional. Largest number of vertices in a tile for the 'tiled' engine (default 50000)
+        <--simplify>  - Optional. Maximum relative change in area (or length) allowed when simplifying the geometries, e.g. 0.001
+        <--gridSize>  - Optional. Size in metres of the grid to snap the input geometries to before the dissolve and overlay, which run at
+                        full precision (see precision_geometry.py)
+        <--cacheDir>  - Optional. Directory used to cache the obs files once converted to crs and dissolved (see geometry_cache.py)
+        <--reader>    - Optional. Method used to read the GeoJSON files, either 'gdal' (default), 'fast' or 'stream'
+        <--workers>   - Optional. Number of worker processes (default is the number of CPUs)
+        <--output>    - Optional. Path of the consolidated results table (default batch_results.csv)
+        <--logDir>    - Optional. Directory in which to write the log output of each case (default is to discard it)
+        <--help>      - Optional. Shows help text.
+
+One of --caseDir or --manifest must be given.
+"""
+
+##### IMPORT RELEVANT LIBRARIES
+
+import argparse
+import contextlib
+import glob
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from process_data import DEFAULT_BUFWIDTH, moe_columns
+from validation import validate
+
+#####
+
+#  Model output filenames are of the form <prefix>_<probability|concentration>_<DATE>.geojson
+MODEL_FILE_PATTERN = re.compile(r"^(?P<prefix>.+)_(?P<kind>probability|concentration)_(?P<date>[^_]+)\.geojson$")
+MODEL_TYPES = {"probability": "Prob", "concentration": "BE"}
+
+#  Columns of the consolidated results table. For the 'line' engine, the obs_area, area_full_contour and
+#  overlap_full_contour columns hold coastline lengths (in km) rather than areas (in km^2)
+RESULT_COLUMNS = [
+    "casename",
+    "time",
+    "modelType",
+    "valType",
+    "crs",
+    "engine",
+    "obsFile",
+    "modelFile",
+    "noOilFile",
+    "contourlev",
+    "obs_area",
+    "area_full_contour",
+    "overlap_full_contour",
+    "x",
+    "y",
+    "Ass",
+    "Css",
+    "simplify_error",
+    "vertex_reduction",
+    "precision_drift",
+    "status",
+]
+
+
+def discover_cases(
+    caseDir,
+    modelType=None,
+    valType=None,
+    crs=3857,
+    engine="index",
+    resolution=None,
+    bufwidth=DEFAULT_BUFWIDTH,
+    simplify=None,
+    gridSize=None,
+    tileVertices=None,
+):
+    #  Function to find all of the obs/model file combinations within a test case directory.
+    #  Model files are matched with the oil (and no oil) observation files carrying the same timestamp.
+    #  Where no timestamped observation file exists (as for the coastal reports), an observation file
+    #  without a timestamp is used instead.
+    #
+    #   Input arguments:
+    #
+    #   caseDir    - path to the test case directory, e.g. validation_data/Corsica
+    #   modelType  - either 'BE' or 'Prob' to restrict the cases to one model output type (None to include both)
+    #   valType    - either 'Satellite' or 'Coastal'. If None, this is inferred from the filenames ('coastline' or 'contour')
+    #   crs        - Integer specifying the coordinate reference system to convert the data to.
+    #   engine     - Method used to calculate the overlap areas, either 'index', 'overlay', 'raster', 'line' or 'tiled'
+    #   resolution - Width in metres of the grid cells used by the 'raster' engine (None to choose automatically)
+    #   bufwidth   - Width in metres of the coastline buffer, or matching tolerance of the 'line' engine
+    #   simplify   - Maximum relative change in area (or length) allowed when simplifying the geometries (None for no simplification)
+    #   gridSize   - Size in metres of the grid to snap the geometries to (None to keep their full precision)
+    #   tileVertices - Largest number of vertices in a tile for the 'tiled' engine (None for the default)
+    #
+    #   Output arguments:
+    #
+    #   cases - list of dictionaries, one per case, with keys obsFile, modelFile, noOilFile, modelType, valType, crs,
+    #           engine, resolution, bufwidth, simplify, gridSize and tileVertices
+
+    cases = []
+    for modelFile in sorted(glob.glob(os.path.join(caseDir, "*.geojson"))):
+        match = MODEL_FILE_PATTERN.match(os.path.basename(modelFile))
+        if match is None:
+            continue
+
+        caseModelType = MODEL_TYPES[match.group("kind")]
+        if modelType is not None and caseModelType != modelType:
+            continue
+
+        prefix = os.path.join(caseDir, match.group("prefix"))
+        date = match.group("date")
+
+        obsFile = find_obs_file(prefix, "detected_oil", date)
+        if obsFile is None:
+            print("No oil observation file found for ", modelFile, "; skipping")
+            continue
+        noOilFile = find_obs_file(prefix, "detected_no_oil", date)
+
+        if valType is not None:
+            caseValType = valType
+        elif "_coastline_" in os.path.basename(modelFile):
+            caseValType = "Coastal"
+        else:
+            caseValType = "Satellite"
+
+        cases.append(
+            {
+                "obsFile": obsFile,
+                "modelFile": modelFile,
+                "noOilFile": noOilFile,
+                "modelType": caseModelType,
+                "valType": caseValType,
+                "crs": crs,
+                "engine": engine,
+                "resolution": resolution,
+                "bufwidth": bufwidth,
+                "simplify": simplify,
+                "gridSize": gridSize,
+                "tileVertices": tileVertices,
+            }
+        )
+
+    return cases
+
+
+def find_obs_file(prefix, kind, date):
+    #  Function to return the path to an observation file of the given kind ('detected_oil' or 'detected_no_oil'),
+    #  preferring the file valid at the given date over one with no timestamp. Returns None if neither exists.
+
+    for candidate in [prefix + "_" + kind + "_" + date + ".geojson", prefix + "_" + kind + ".geojson"]:
+        if os.path.exists(candidate):
+            return candidate
+
+    return None
+
+
+def read_manifest(
+    manifest,
+    crs=3857,
+    engine="index",
+    resolution=None,
+    bufwidth=DEFAULT_BUFWIDTH,
+    simplify=None,
+    gridSize=None,
+    tileVertices=None,
+):
+    #  Function to read the list of cases to run from a manifest file in CSV format.
+    #  Required columns are obsFile, modelFile, modelType and valType; noOilFile and crs are optional.
+    #  Relative paths within the manifest are interpreted relative to the directory containing the manifest.
+    #
+    #   Input arguments:
+    #
+    #   manifest   - path to the manifest file
+    #   crs        - default coordinate reference system, used where the manifest has no crs column (or it is blank)
+    #   engine     - Method used to calculate the overlap areas, either 'index', 'overlay', 'raster', 'line' or 'tiled'
+    #   resolution - Width in metres of the grid cells used by the 'raster' engine (None to choose automatically)
+    #   bufwidth   - Width in metres of the coastline buffer, or matching tolerance of the 'line' engine
+    #   simplify   - Maximum relative change in area (or length) allowed when simplifying the geometries (None for no simplification)
+    #   gridSize   - Size in metres of the grid to snap the geometries to (None to keep their full precision)
+    #   tileVertices - Largest number of vertices in a tile for the 'tiled' engine (None for the default)
+    #
+    #   Output arguments:
+    #
+    #   cases - list of dictionaries, one per case, with keys obsFile, modelFile, noOilFile, modelType, valType, crs,
+    #           engine, resolution, bufwidth, simplify, gridSize and tileVertices
+
+    assert os.path.exists(manifest), "manifest does not exist"
+
+    table = pd.read_csv(manifest, dtype=str, keep_default_na=False)
+    for column in ["obsFile", "modelFile", "modelType", "valType"]:
+        assert column in table.columns, "manifest is missing column %r" % column
+
+    basedir = os.path.dirname(os.path.abspath(manifest))
+
+    def resolve(path):
+        if path == "":
+            return None
+        return os.path.join(basedir, path)
+
+    cases = []
+    for row in table.to_dict("records"):
+        cases.append(
+            {
+                "obsFile": resolve(row["obsFile"]),
+                "modelFile": resolve(row["modelFile"]),
+                "noOilFile": resolve(row.get("noOilFile", "")),
+                "modelType": row["modelType"],
+                "valType": row["valType"],
+                "crs": int(row["crs"]) if row.get("crs", "") != "" else crs,
+                "engine": engine,
+                "resolution": resolution,
+                "bufwidth": bufwidth,
+                "simplify": simplify,
+                "gridSize": gridSize,
+                "tileVertices": tileVertices,
+            }
+        )
+
+    return cases
+
+
+def run_case(case, logDir=None, cacheDir=None, reader="gdal", store=None):
+    #  Function to run the validation for a single case and return its results as a list of table rows
+    #  (one row per contour level with a non-zero overlap). Any error raised during the validation is
+    #  recorded in the 'status' column rather than being raised, so that one bad case does not stop the campaign.
+    #  The output that the validation functions print is written to a log file in logDir (if specified).
+    #
+    #   Input arguments:
+    #
+    #   case     - dictionary with keys obsFile, modelFile, noOilFile, modelType, valType, crs, engine, resolution, bufwidth,
+    #              simplify, gridSize and tileVertices
+    #   logDir   - directory in which to write the log output of the case (None to discard it)
+    #   cacheDir - directory of the geometry cache used to read the obs files (None to read them directly)
+    #   reader   - method used to read the GeoJSON files, either 'gdal', 'fast' or 'stream'
+    #   store    - dictionary in which the obs are kept in memory for reuse by later cases (None to not keep them)
+    #
+    #   Output arguments:
+    #
+    #   rows - list of dictionaries, with keys as given by RESULT_COLUMNS
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        try:
+            rows = validate_case(case, cacheDir, reader, store)
+        except Exception as err:
+            print("Validation failed: ", repr(err))
+            rows = [dict(case, status="failed: " + repr(err))]
+
+    if logDir is not None:
+        logFile = os.path.join(
+            logDir,
+            os.path.splitext(os.path.basename(case["modelFile"]))[0]
+            + "_"
+            + case["modelType"]
+            + "_"
+            + case["valType"]
+            + "_crs_"
+            + str(case["crs"])
+            + ".log",
+        )
+        with open(logFile, "w") as f:
+            f.write(log.getvalue())
+
+    return rows
+
+
+def validate_case(case, cacheDir=None, reader="gdal", store=None):
+    #  Function to validate a single case with validation.validate (as Calc_2D_MOE_GeoJSON.py does, without plotting),
+    #  and return its results as a list of table rows. If store is a dictionary, the obs are kept in it for reuse by
+    #  later cases (see read_geojson).
+
+    #  The cases are already run on a pool of worker processes, so the tiles of the 'tiled' engine are processed
+    #  within the worker running the case
+    result = validate(
+        case["obsFile"],
+        case["modelFile"],
+        case["noOilFile"],
+        case["modelType"],
+        case["valType"],
+        case["crs"],
+        engine=case["engine"],
+        resolution=case["resolution"],
+        bufwidth=case["bufwidth"],
+        tile_vertices=case.get("tileVertices"),
+        tile_workers=1,
+        simplify=case["simplify"],
+        grid_size=case.get("gridSize"),
+        keep_geometry=False,
+        reader=reader,
+        cache_dir=cacheDir,
+        verbose=True,
+        store=store,
+    )
+
+    info = dict(case, casename=result.casename, time=result.time, Ass=result.Ass, Css=result.Css, **result.simplify_stats)
+    info["precision_drift"] = result.precision_stats.get("precision_drift")
+
+    if result.moe.empty:
+        #  Names of the columns holding the observed and predicted areas (or coastline lengths)
+        obsCol, predCol, overlapCol = moe_columns(case["engine"])
+        return [
+            dict(
+                info,
+                contourlev=result.model_known["contourlev"].iloc[0],
+                obs_area=result.oil[obsCol].iloc[0],
+                area_full_contour=result.model_known[predCol].iloc[0],
+                overlap_full_contour=0.0,
+                x=0.0,
+                y=0.0,
+                status="no overlap",
+            )
+        ]
+
+    columns = ["contourlev", "obs_area", "area_full_contour", "overlap_full_contour", "x", "y"]
+    return [dict(info, status="ok", **row) for row in result.moe[columns].to_dict("records")]
+
+
+def run_batch(cases, workers=None, logDir=None, cacheDir=None, reader="gdal"):
+    #  Function to run the validation for a list of cases on a pool of worker processes
+    #
+    #   Input arguments:
+    #
+    #   cases    - list of case dictionaries, as returned by discover_cases or read_manifest
+    #   workers  - number of worker processes (None to use the number of CPUs)
+    #   logDir   - directory in which to write the log output of each case (None to discard it)
+    #   cacheDir - directory of the geometry cache used to read the obs files (None to read them directly)
+    #   reader   - method used to read the GeoJSON files, either 'gdal', 'fast' or 'stream'
+    #
+    #   Output arguments:
+    #
+    #   results - pandas DataFrame containing the consolidated results of all cases, with columns as given by RESULT_COLUMNS
+
+    if logDir is not None:
+        os.makedirs(logDir, exist_ok=True)
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for caseRows in pool.map(
+            run_case,
+            cases,
+            [logDir] * len(cases),
+            [cacheDir] * len(cases),
+            [reader] * len(cases),
+        ):
+            rows.extend(caseRows)
+
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+def main():
+
+    ##### READ IN COMMAND LINE ARGUMENTS
+
+    parser = argparse.ArgumentParser(
+        description="""
+        Purpose: Script to run the 2-D MOE validation for many obs/model pairs within one process, using a pool of workers.
+        Cases are either listed in a manifest file, or discovered from the filenames within a test case directory.
+        The results of all cases are written to one consolidated table in CSV format.""",
+        epilog="Example of use: ./batch_validation.py --caseDir ../validation_data/Corsica --workers 4 --output corsica_results.csv",
+    )
+    parser.add_argument(
+        "--caseDir",
+        help="Path to a test case directory containing GeoJSON files named as in the validation_data directory",
+        type=str,
+    )
+    parser.add_argument(
+        "--manifest",
+        help="Path to a CSV file listing the cases to run, with columns obsFile, modelFile, modelType, valType \
+                            and (optionally) noOilFile and crs",
+        type=str,
+    )
+    parser.add_argument(
+        "--modelType",
+        help="Optional. Only run discovered cases of this model output type, either 'BE' or 'Prob'",
+        type=str,
+        choices=["BE", "Prob"],
+    )
+    parser.add_argument(
+        "--valType",
+        help="Optional. Validation type of discovered cases, either 'Satellite' or 'Coastal'. Inferred from the filenames if not given",
+        type=str,
+        choices=["Satellite", "Coastal"],
+    )
+    parser.add_argument(
+        "--crs",
+        help="Optional integer specifying the crs code to convert obs and model data to. Default value is 3857",
+        type=int,
+        default=3857,
+    )
+    parser.add_argument(
+        "--engine",
+        help="Optional method used to calculate the overlap areas, either 'index' (default), 'overlay', 'raster', 'line' or 'tiled'",
+        type=str,
+        choices=["index", "overlay", "raster", "line", "tiled"],
+        default="index",
+    )
+    parser.add_argument(
+        "--resolution",
+        help="Optional width in metres of the grid cells used by the 'raster' engine",
+        type=float,
+    )
+    parser.add_argument(
+        "--bufwidth",
+        help="Optional width in metres of the coastline buffer, or matching tolerance of the 'line' engine. Default value is 5",
+        type=float,
+        default=DEFAULT_BUFWIDTH,
+    )
+    parser.add_argument(
+        "--tileVertices",
+        help="Optional largest number of vertices in a tile for the 'tiled' engine. Default value is 50000",
+        type=int,
+    )
+    parser.add_argument(
+        "--simplify",
+        help="Optional maximum relative change in area (or length) allowed when simplifying the geometries, e.g. 0.001",
+        type=float,
+    )
+    parser.add_argument(
+        "--gridSize",
+        help="Optional size in metres of the grid to snap the input geometries to before the dissolve and overlay (which run at \
+                            full precision), e.g. 1",
+        type=float,
+    )
+    parser.add_argument(
+        "--cacheDir",
+        help="Optional directory in which to cache the obs files, once converted to crs and dissolved",
+        type=str,
+    )
+    parser.add_argument(
+        "--reader",
+        help="Optional method used to read the GeoJSON files, either 'gdal' (default), 'fast' or 'stream'",
+        type=str,
+        choices=["gdal", "fast", "stream"],
+        default="gdal",
+    )
+    parser.add_argument(
+        "--workers",
+        help="Optional number of worker processes. Default is the number of CPUs",
+        type=int,
+    )
+    parser.add_argument(
+        "--output",
+        help="Optional path of the consolidated results table. Default is batch_results.csv",
+        type=str,
+        default="batch_results.csv",
+    )
+    parser.add_argument(
+        "--logDir",
+        help="Optional directory in which to write the log output of each case",
+        type=str,
+    )
+
+    args = parser.parse_args()
+
+    if (args.caseDir is None) == (args.manifest is None):
+        parser.error("exactly one of --caseDir or --manifest must be given")
+
+    #####
+
+    ##### COLLECT THE CASES, RUN THEM AND WRITE OUT THE RESULTS
+
+    if args.manifest is not None:
+        cases = read_manifest(
+            args.manifest,
+            args.crs,
+            args.engine,
+            args.resolution,
+            args.bufwidth,
+            args.simplify,
+            args.gridSize,
+            args.tileVertices,
+        )
+    else:
+        cases = discover_cases(
+            args.caseDir,
+            args.modelType,
+            args.valType,
+            args.crs,
+            args.engine,
+            args.resolution,
+            args.bufwidth,
+            args.simplify,
+            args.gridSize,
+            args.tileVertices,
+        )
+    print("Number of cases to run : ", len(cases))
+
+    results = run_batch(cases, args.workers, args.logDir, args.cacheDir, args.reader)
+    results.to_csv(args.output, index=False)
+
+    failed = results[~results["status"].isin(["ok", "no overlap"])]
+    print("Number of failed cases : ", len(failed))
+    print("Results written to : ", args.output)
+
+    #####
+
+
+if __name__ == "__main__":
+    main()
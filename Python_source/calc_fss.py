@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+from raster_engine import RasterGrid
+
+#  Number of grid cells along the longest side of the grid, used when no resolution is specified. The neighbourhoods
+#  are much larger than the cells, so the grid can be coarser than that of the 'raster' engine.
+DEFAULT_FSS_CELLS = 500
+
+#  Default neighbourhood widths (in grid cells) over which the Fractions Skill Score is calculated. Widths must be odd,
+#  so that each neighbourhood is centred on a grid cell.
+DEFAULT_SCALES = [1, 3, 5, 9, 17, 33, 65, 129]
+
+#  Columns of the table of FSS curves
+FSS_COLUMNS = ["contourlev", "scale", "scale_km", "fss", "fss_useful"]
+
+
+def prepare_fss_obs(oil, no_oil, model=None, resolution=None, scales=DEFAULT_SCALES):
+    #  Function to rasterize the obs onto the grid used for the Fractions Skill Score, and prepare everything about them
+    #  that is needed to score a model against them (including the fraction of each neighbourhood covered by the obs),
+    #  so that this can be done once for a whole ensemble. Only the cells within the known observation region (the
+    #  observed oil and the region where no oil was detected) are scored, so when a no oil region is given the grid
+    #  covers the obs scene only. Otherwise the whole grid is known, and it covers both the obs and the model.
+    #
+    #   Input arguments:
+    #
+    #   oil        - geodataframe containing the oil observations, in a projected crs and dissolved
+    #   no_oil     - geodataframe defining the observation region where no oil was detected, in the same crs (None if not available)
+    #   model      - geodataframe containing the model prediction, in the same crs, covered by the grid if there is no no oil region
+    #   resolution - width of the grid cells in metres (None to give DEFAULT_FSS_CELLS cells along the longest side of the grid)
+    #   scales     - list of the (odd) neighbourhood widths in grid cells
+    #
+    #   Output arguments:
+    #
+    #   fssObs - dictionary with the grid (see raster_engine.RasterGrid), the mask of the known observation region (known),
+    #            the neighbourhood widths (scales), and for each width the number of known cells in the neighbourhood of
+    #            each known cell (cells) and the fraction of them covered by observed oil (fractions), together with the
+    #            fraction of the whole known region covered by observed oil (obsFraction)
+
+    assert all(int(n) == n and n > 0 and n % 2 == 1 for n in scales), "Neighbourhood widths must be odd positive integers"
+
+    extents = [oil.total_bounds]
+    if no_oil is not None:
+        extents.append(no_oil.total_bounds)
+    elif model is not None and not model.empty:
+        extents.append(model.total_bounds)
+    extents = np.array(extents)
+    bounds = (extents[:, 0].min(), extents[:, 1].min(), extents[:, 2].max(), extents[:, 3].max())
+    if resolution is None:
+        resolution = max(bounds[2] - bounds[0], bounds[3] - bounds[1]) / DEFAULT_FSS_CELLS
+    grid = RasterGrid(bounds, resolution)
+
+    obsMask = rasterize_union(grid, np.asarray(oil.geometry))
+    if no_oil is not None:
+        known = obsMask | rasterize_union(grid, np.asarray(no_oil.geometry))
+    else:
+        known = np.ones((grid.ny, grid.nx), dtype=bool)
+
+    obsTable, knownTable = summed_area(obsMask), summed_area(known)
+    cells = [box_sums(knownTable, n)[known] for n in scales]
+    fractions = [box_sums(obsTable, n)[known] / count for n, count in zip(scales, cells)]
+
+    return {
+        "grid": grid,
+        "known": known,
+        "scales": list(scales),
+        "cells": cells,
+        "fractions": fractions,
+        "obsFraction": np.count_nonzero(obsMask) / max(np.count_nonzero(known), 1),
+    }
+
+
+def calc_fss_curves(fssObs, model):
+    #  Function to calculate the Fractions Skill Score (FSS; Roberts and Lean 2008, Mon. Weather Rev.) of each model
+    #  contour level against the prepared obs, over a range of neighbourhood widths. The event for each level is the
+    #  region enclosed by the full contour (the cut-outs of that level and above), within the known observation region.
+    #  The fraction of each neighbourhood covered by the obs and by the model is counted over the known cells of the
+    #  neighbourhood only, from summed-area tables, so that the cost of each width is the same however wide it is.
+    #
+    #   Input arguments:
+    #
+    #   fssObs - dictionary with the prepared obs, as returned by prepare_fss_obs (which sets the neighbourhood widths)
+    #   model  - geodataframe containing the model prediction (cut-outs, with a contourlev column), in the crs of the obs
+    #
+    #   Output arguments:
+    #
+    #   curves - pandas DataFrame with one row per contour level and neighbourhood width (see FSS_COLUMNS): the width in
+    #            cells (scale) and km (scale_km), the FSS (NaN if there is neither observed nor modelled oil), and the FSS
+    #            of a uniform forecast of the observed fraction (fss_useful), above which the model is considered skilful
+
+    grid, known = fssObs["grid"], fssObs["known"]
+    model = model.sort_values(by="contourlev")
+
+    #  Rasterize each cut-out, and take the union of the cut-outs of each level and above, within the known region
+    full_masks = []
+    full_mask = np.zeros((grid.ny, grid.nx), dtype=bool)
+    for geom in np.asarray(model.geometry)[::-1]:
+        full_mask = full_mask | (grid.rasterize(geom) & known)
+        full_masks.insert(0, full_mask)
+
+    rows = []
+    for contourlev, mask in zip(model["contourlev"], full_masks):
+        fss = fractions_skill_score(fssObs, summed_area(mask))
+        for n, value in zip(fssObs["scales"], fss):
+            rows.append((contourlev, n, n * grid.resolution / 10 ** 3, value, 0.5 + fssObs["obsFraction"] / 2))
+
+    return pd.DataFrame(rows, columns=FSS_COLUMNS)
+
+
+def fractions_skill_score(fssObs, modelTable):
+    #  Function to calculate the Fractions Skill Score for each neighbourhood width of the prepared obs, from the
+    #  summed-area table of the model mask. The neighbourhood of each known cell is the square of the given width
+    #  centred on it, cut off at the edges of the grid, and the fractions are taken over the known cells within it.
+    #
+    #   Input arguments:
+    #
+    #   fssObs     - dictionary with the prepared obs, as returned by prepare_fss_obs
+    #   modelTable - summed-area table of the model mask (see summed_area)
+    #
+    #   Output arguments:
+    #
+    #   fss - array of the FSS for each neighbourhood width
+
+    known = fssObs["known"]
+    fss = np.full(len(fssObs["scales"]), np.nan)
+    for k, n in enumerate(fssObs["scales"]):
+        obs = fssObs["fractions"][k]
+        model = box_sums(modelTable, n)[known] / fssObs["cells"][k]
+        reference = np.dot(obs, obs) + np.dot(model, model)
+        if reference > 0:
+            fss[k] = 1 - np.sum((obs - model) ** 2) / reference
+
+    return fss
+
+
+def summed_area(mask):
+    #  Function to return the summed-area table of a mask, i.e. the number of cells of the mask below and to the left
+    #  of each grid point, with a leading row and column of zeros ((ny + 1) by (nx + 1))
+
+    table = np.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=np.int32)
+    np.cumsum(np.cumsum(mask, axis=0, dtype=np.int32), axis=1, out=table[1:, 1:])
+
+    return table
+
+
+def box_sums(table, n):
+    #  Function to return the number of cells of a mask within the square of width n centred on each grid cell, cut off
+    #  at the edges of the grid, from the summed-area table of the mask (see summed_area). The differences are taken
+    #  along the rows and then along the columns, so that whole rows of the table are copied at once.
+
+    ny, nx = table.shape[0] - 1, table.shape[1] - 1
+    half = n // 2
+    j, i = np.arange(ny), np.arange(nx)
+    rows = table[np.clip(j + half + 1, 0, ny)] - table[np.clip(j - half, 0, ny)]
+
+    return rows[:, np.clip(i + half + 1, 0, nx)] - rows[:, np.clip(i - half, 0, nx)]
+
+
+def rasterize_union(grid, geoms):
+    #  Function to return the mask of the cells of the grid within any of the given geometries
+
+    mask = np.zeros((grid.ny, grid.nx), dtype=bool)
+    for geom in geoms:
+        mask |= grid.rasterize(geom)
+
+    return mask
+
+
+def useful_scales(curves):
+    #  Function to return the smallest neighbourhood width (in km) at which the model is skilful, i.e. at which the FSS
+    #  reaches fss_useful, for each contour level of a table of FSS curves (NaN if it is not reached)
+
+    skilful = curves[curves["fss"] >= curves["fss_useful"]]
+    scales = skilful.groupby("contourlev")["scale_km"].min()
+
+    return scales.reindex(curves["contourlev"].unique()).rename("useful_scale_km").reset_index()
@@ -1,3 +1,14 @@
+import numpy as np
+import pandas as pd
+
+from coord_arrays import polygon_bounds, polygon_centroids
+
+#  Default thresholds of the area and centroid skill scores. A threshold of one means that, for the model to have some
+#  skill, the error in the predicted area (or centroid location) must not exceed the observed area (or lengthscale).
+AREA_THRESHOLD = 1
+CENTROID_THRESHOLD = 1
+
+
 def calc_2DMOE(Aob, Apr, Aov):
     #  Function to calculate the x and y components of the Two Dimensional Measure of Effectiveness (Warner et al 2004, J. Appl. Met.)
     #
@@ -58,7 +69,7 @@ def calc_area_ss(Aob, Apr):
     #  Use Area_index to calculate the area skill score, for an area threshold of one
     #  This means that for the model to have some skill, the error in the predicted oil spill area
     #  must not exceed the magnitude of the observed oil spill area
-    A_thr = 1
+    A_thr = AREA_THRESHOLD
 
     if Area_index < A_thr:
         Ass = 1 - (Area_index / A_thr)
@@ -93,26 +104,29 @@ def calc_centroid_ss(oil, model):
 
     #  First, let's compute the Centroid Skillscore
     #  Start by calculating the centroid locations of the obs and modelled oil extents
-    obs_centroid = oil.geometry.centroid[0]
-    model_centroid = model.geometry.centroid[0]
+    #  (from the coordinate arrays of the geometries; see coord_arrays.py)
+    geoms = np.array([oil.geometry[0], model.geometry[0]], dtype=object)
+    centroids = polygon_centroids(geoms)
+    obs_centroid = Point(centroids[0])
+    model_centroid = Point(centroids[1])
 
-    #  Now use the distance function to take min distance between the two centroids
-    centroid_dist = model_centroid.distance(other=obs_centroid)
+    #  Now take the distance between the two centroids
+    centroid_dist = float(np.hypot(*(centroids[1] - centroids[0])))
     print(
         "Distance (in km) between observed and modelled centroid is : ",
         centroid_dist / 1000.0,
     )
 
-    #  Now use the bounds function to return the coordinates of a bounding box around the observed oil extent
-    obsbounds = oil.geometry.bounds
+    #  Now return the coordinates of a bounding box around the observed oil extent
+    minx, miny, maxx, maxy = polygon_bounds(geoms[:1])[0]
 
     #  Store the points that make up the diagonal of the bounding box;
     #  we will use these points to calculate the observed length scale
-    minpoint = Point(obsbounds.minx[0], obsbounds.miny[0])
-    maxpoint = Point(obsbounds.maxx[0], obsbounds.maxy[0])
+    minpoint = Point(minx, miny)
+    maxpoint = Point(maxx, maxy)
 
     #  Now take the distance between the two points and use this as the length scale of the observed area
-    obslengthscale = minpoint.distance(other=maxpoint)
+    obslengthscale = float(np.hypot(maxx - minx, maxy - miny))
     print("Lengthscale (in km) of observed spill is : ", obslengthscale / 1000.0)
 
     #  Calculate the centroid index, i.e. the normalised centroid displacement
@@ -122,10 +136,162 @@ def calc_centroid_ss(oil, model):
     #  This means that for the model to have some skill, the error in the centroid location
     #  must not exceed the magnitude of the observed oil spill length scale. This criteria
     #  can be relaxed by choosing a higher threshold value
-    C_thr = 1  #  Define centroid threshold used to calculate area skill score
+    C_thr = CENTROID_THRESHOLD  #  Define centroid threshold used to calculate area skill score
     if C_index < C_thr:
         Css = 1 - (C_index / C_thr)
     elif C_index >= C_thr:
         Css = 0
 
     return Css, obs_centroid, model_centroid, minpoint, maxpoint
+
+
+def calc_2DMOE_batch(Aob, Apr, Aov):
+    #  Function to calculate the 2-D MOE components (see calc_2DMOE) for many cases/contour levels at once, without printing.
+    #  Unlike calc_2DMOE, which divides by zero, cases with no observed area have x set to zero, and cases with no
+    #  predicted area have y set to zero (so Afn or Afp, respectively, is zero).
+    #
+    #   Input arguments:
+    #
+    #   Aob - array-like (e.g. Pandas Series) of observed areas
+    #   Apr - array-like of predicted areas, one per observed area
+    #   Aov - array-like of overlap areas, one per observed area
+    #
+    #   Output arguments:
+    #
+    #   moe - Pandas DataFrame with columns x, y, Afn (area of false negative) and Afp (area of false positive),
+    #         with the index of Aob if it is a Pandas Series
+
+    index = Aob.index if isinstance(Aob, pd.Series) else None
+    Aob, Apr, Aov = [np.asarray(a, dtype=float) for a in (Aob, Apr, Aov)]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = np.where(Aob > 0, Aov / Aob, 0.0)
+        y = np.where(Apr > 0, Aov / Apr, 0.0)
+
+    #  Keep missing values (e.g. failed cases) missing
+    missing = np.isnan(Aob) | np.isnan(Apr) | np.isnan(Aov)
+    x[missing] = np.nan
+    y[missing] = np.nan
+
+    return pd.DataFrame(
+        {"x": x, "y": y, "Afn": (1 - x) * Aob, "Afp": (1 - y) * Apr}, index=index
+    )
+
+
+def calc_area_ss_batch(Aob, Apr, thresholds=AREA_THRESHOLD):
+    #  Function to calculate the area skill score (see calc_area_ss) for many cases and area thresholds at once
+    #
+    #   Input arguments:
+    #
+    #   Aob        - array-like of observed areas
+    #   Apr        - array-like of predicted areas, one per observed area
+    #   thresholds - area threshold, or array-like of thresholds
+    #
+    #   Output arguments:
+    #
+    #   Ass - numpy array of area skill scores in the range 0.0 to 1.0, of shape (cases,) for a single threshold,
+    #         or (cases, thresholds) for an array of thresholds
+
+    Aob = np.asarray(Aob, dtype=float)
+    Apr = np.asarray(Apr, dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Area_index = np.abs(Apr - Aob) / Aob
+
+    return threshold_skill(Area_index, thresholds)
+
+
+def calc_centroid_ss_batch(obsCentroid, modelCentroid, obsBounds, thresholds=CENTROID_THRESHOLD):
+    #  Function to calculate the centroid skill score (see calc_centroid_ss) for many cases and centroid thresholds
+    #  at once, from the coordinates of the centroids and the bounds of the observations
+    #
+    #   Input arguments:
+    #
+    #   obsCentroid   - array-like of shape (cases, 2) with the x, y coordinates of the observed oil centroids
+    #   modelCentroid - array-like of shape (cases, 2) with the x, y coordinates of the predicted oil centroids
+    #   obsBounds     - array-like of shape (cases, 4) with the bounds (minx, miny, maxx, maxy) of the observed oil
+    #   thresholds    - centroid threshold, or array-like of thresholds
+    #
+    #   Output arguments:
+    #
+    #   Css - numpy array of centroid skill scores in the range 0.0 to 1.0, of shape (cases,) for a single threshold,
+    #         or (cases, thresholds) for an array of thresholds
+
+    obsCentroid = np.asarray(obsCentroid, dtype=float).reshape(-1, 2)
+    modelCentroid = np.asarray(modelCentroid, dtype=float).reshape(-1, 2)
+    obsBounds = np.asarray(obsBounds, dtype=float).reshape(-1, 4)
+
+    centroid_dist = np.hypot(*(modelCentroid - obsCentroid).T)
+    obslengthscale = np.hypot(
+        obsBounds[:, 2] - obsBounds[:, 0], obsBounds[:, 3] - obsBounds[:, 1]
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        C_index = centroid_dist / obslengthscale
+
+    return threshold_skill(C_index, thresholds)
+
+
+def calc_metrics_batch(
+    Aob,
+    Apr,
+    Aov,
+    obsCentroid=None,
+    modelCentroid=None,
+    obsBounds=None,
+    areaThresholds=AREA_THRESHOLD,
+    centroidThresholds=CENTROID_THRESHOLD,
+):
+    #  Function to calculate the 2-D MOE components and the skill scores of many cases at once, e.g. the contour levels
+    #  of all the cases of a validation campaign, or the members of an ensemble
+    #
+    #   Input arguments:
+    #
+    #   Aob, Apr, Aov      - array-likes of the observed, predicted and overlap areas of each case (see calc_2DMOE_batch)
+    #   obsCentroid        - array-like of shape (cases, 2) of observed centroids (None to leave out the centroid skill score)
+    #   modelCentroid      - array-like of shape (cases, 2) of predicted centroids
+    #   obsBounds          - array-like of shape (cases, 4) of the bounds of the observed oil
+    #   areaThresholds     - area threshold, or array-like of thresholds (None to leave out the area skill score)
+    #   centroidThresholds - centroid threshold, or array-like of thresholds
+    #
+    #   Output arguments:
+    #
+    #   metrics - Pandas DataFrame with columns x, y, Afn, Afp, Ass and Css. For arrays of thresholds, there is one skill
+    #             score column per threshold instead, named after the threshold (e.g. Ass_0.5, Ass_1).
+
+    metrics = calc_2DMOE_batch(Aob, Apr, Aov)
+
+    if areaThresholds is not None:
+        Ass = calc_area_ss_batch(Aob, Apr, areaThresholds)
+        add_skill_columns(metrics, "Ass", Ass, areaThresholds)
+
+    if obsCentroid is not None:
+        Css = calc_centroid_ss_batch(obsCentroid, modelCentroid, obsBounds, centroidThresholds)
+        add_skill_columns(metrics, "Css", Css, centroidThresholds)
+
+    return metrics
+
+
+def threshold_skill(index, thresholds):
+    #  Function to convert an array of normalised errors (area or centroid index) into skill scores for each threshold,
+    #  i.e. 1 - index/threshold where the index is below the threshold, and zero otherwise. Missing values stay missing.
+
+    index = np.asarray(index, dtype=float)
+    thr = np.asarray(thresholds, dtype=float)
+    if thr.ndim > 0:
+        index = index[:, np.newaxis]
+
+    skill = np.where(index < thr, 1 - index / thr, 0.0)
+
+    return np.where(np.isnan(index), np.nan, skill)
+
+
+def add_skill_columns(metrics, name, skill, thresholds):
+    #  Function to add the skill scores to the metrics dataframe, as one column for a single threshold,
+    #  or as one column per threshold (named after the threshold) for an array of thresholds
+
+    if np.ndim(thresholds) == 0:
+        metrics[name] = skill
+        return
+
+    for k, thr in enumerate(np.asarray(thresholds)):
+        metrics[name + "_" + ("%g" % thr)] = skill[:, k]
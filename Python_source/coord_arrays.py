@@ -0,0 +1,269 @@
+import numpy as np
+import shapely
+from shapely import GeometryType
+
+#  Type ids (see shapely.get_type_id) of the geometries that can be held as coordinate arrays
+POLYGONAL_TYPES = [GeometryType.POLYGON, GeometryType.MULTIPOLYGON]
+
+#  Number of coordinates processed at once by the ring kernels (see CoordArrays.ring_moments)
+BLOCK_COORDS = 2 ** 16
+
+
+class CoordArrays:
+    #  Class holding an array of (multi)polygons in a compact form: a single flat array of the coordinates of all of
+    #  the rings, plus offset arrays marking where each ring, polygon and geometry starts (the ragged array layout used
+    #  by shapely.to_ragged_array and GeoArrow). The areas, bounds and centroids of all of the geometries are calculated
+    #  with vectorized numpy kernels (shoelace sums over the rings), without creating a Python object per geometry.
+    #
+    #   coords         - float64 array (ncoords by 2) of the x, y coordinates of the rings, each closed (last = first)
+    #   ringOffsets    - integer array (nrings + 1); the coordinates of ring i are coords[ringOffsets[i]:ringOffsets[i + 1]]
+    #   polygonOffsets - integer array (npolygons + 1); the rings of polygon j are polygonOffsets[j] to polygonOffsets[j + 1],
+    #                    of which the first is the exterior and the rest are holes
+    #   partOffsets    - integer array (ngeoms + 1); the polygons of geometry k are partOffsets[k] to partOffsets[k + 1]
+
+    def __init__(self, coords, ringOffsets, polygonOffsets, partOffsets):
+        self.coords = coords
+        self.ringOffsets = ringOffsets
+        self.polygonOffsets = polygonOffsets
+        self.partOffsets = partOffsets
+
+    @classmethod
+    def from_geometries(cls, geoms):
+        #  Create the coordinate arrays of an array of polygons and multipolygons (which may be empty, but not missing).
+        #  The coordinates are copied out of GEOS in one call, in the same order as shapely.to_ragged_array, and the
+        #  offsets are built from the numbers of parts, rings and coordinates, so that (unlike to_ragged_array) the
+        #  rings are only extracted as separate geometries for the polygons that have holes.
+
+        geoms = np.asarray(geoms, dtype=object)
+        assert np.isin(shapely.get_type_id(geoms), POLYGONAL_TYPES).all(), "Coordinate arrays hold polygons only"
+
+        parts, partIndex = shapely.get_parts(geoms, return_index=True)
+        nonempty = ~shapely.is_empty(parts)
+        parts, partIndex = parts[nonempty], partIndex[nonempty]
+        partOffsets = np.concatenate([[0], np.cumsum(np.bincount(partIndex, minlength=len(geoms)))])
+
+        #  Number of rings of each polygon (the exterior plus any holes), and of coordinates of each ring
+        holes = shapely.get_num_interior_rings(parts)
+        polygonOffsets = np.concatenate([[0], np.cumsum(1 + holes)])
+        ringLengths = np.empty(polygonOffsets[-1], dtype=np.int64)
+        ringLengths[polygonOffsets[:-1][holes == 0]] = shapely.get_num_coordinates(parts[holes == 0])
+        if (holes > 0).any():
+            rings = shapely.get_rings(parts[holes > 0])
+            first = polygonOffsets[:-1][holes > 0]
+            count = 1 + holes[holes > 0]
+            slots = np.repeat(first, count) + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+            ringLengths[slots] = shapely.get_num_coordinates(rings)
+        ringOffsets = np.concatenate([[0], np.cumsum(ringLengths)])
+
+        coords = shapely.get_coordinates(parts)
+        assert len(coords) == ringOffsets[-1], "Inconsistent coordinate counts"
+
+        return cls(coords, ringOffsets, polygonOffsets, partOffsets)
+
+    def to_geometries(self):
+        #  Return the geometries as an array of shapely multipolygons, built directly from the coordinate arrays
+
+        return shapely.from_ragged_array(
+            GeometryType.MULTIPOLYGON, self.coords, (self.ringOffsets, self.polygonOffsets, self.partOffsets)
+        )
+
+    def __len__(self):
+        return len(self.partOffsets) - 1
+
+    def ring_geometry(self):
+        #  Return the index of the geometry that each ring belongs to, and whether each ring is the exterior of its polygon
+
+        nrings = len(self.ringOffsets) - 1
+        polygonRings = np.diff(self.polygonOffsets)
+        geomPolygons = np.diff(self.partOffsets)
+
+        geomIndex = np.repeat(np.arange(len(self)), geomPolygons)
+        ringGeom = np.repeat(geomIndex, polygonRings)
+        exterior = np.zeros(nrings, dtype=bool)
+        exterior[self.polygonOffsets[:-1][polygonRings > 0]] = True
+
+        return ringGeom, exterior
+
+    def moments(self):
+        #  Return the area and first moments of area (area times the x and y coordinates of the centroid) of each
+        #  geometry, from the shoelace sums of its rings (see ring_sums). The areas of holes are subtracted whatever
+        #  the orientation of the rings, as in GEOS.
+        #
+        #   Output arguments:
+        #
+        #   area   - array (ngeoms) of the areas, in the units of the crs squared
+        #   moment - array (ngeoms by 2) of the first moments of area
+
+        ringGeom, exterior = self.ring_geometry()
+        ringArea, ringMx, ringMy, ringOrigin = self.ring_moments()
+
+        #  Exteriors add and holes subtract their area, whichever way round they are wound
+        sign = np.where(exterior, 1.0, -1.0) * np.sign(ringArea)
+        area = np.bincount(ringGeom, weights=sign * ringArea, minlength=len(self)).astype(float)
+        moment = np.column_stack(
+            [
+                np.bincount(ringGeom, weights=sign * (ringArea * ringOrigin[:, 0] + ringMx), minlength=len(self)),
+                np.bincount(ringGeom, weights=sign * (ringArea * ringOrigin[:, 1] + ringMy), minlength=len(self)),
+            ]
+        ).astype(float)
+
+        return area, moment
+
+    def ring_moments(self):
+        #  Return the signed area, first moments of area relative to the first vertex, and first vertex of each ring
+        #  (see ring_sums). The rings are processed in blocks of about BLOCK_COORDS coordinates, so that the temporary
+        #  arrays stay in the CPU cache.
+
+        nrings = len(self.ringOffsets) - 1
+        ringArea, ringMx, ringMy = np.zeros(nrings), np.zeros(nrings), np.zeros(nrings)
+        ringOrigin = np.zeros((nrings, 2))
+
+        i = 0
+        while i < nrings:
+            j = np.searchsorted(self.ringOffsets, self.ringOffsets[i] + BLOCK_COORDS, side="right") - 1
+            j = min(max(j, i + 1), nrings)
+            offsets = self.ringOffsets[i : j + 1]
+            block = ring_sums(self.coords[offsets[0] : offsets[-1]], offsets - offsets[0])
+            ringArea[i:j], ringMx[i:j], ringMy[i:j], ringOrigin[i:j] = block
+            i = j
+
+        return ringArea, ringMx, ringMy, ringOrigin
+
+    def areas(self):
+        #  Return the area of each geometry, in the units of the crs squared
+
+        return self.moments()[0]
+
+    def centroids(self):
+        #  Return the centroid (x, y) of each geometry, as an array (ngeoms by 2); NaN for geometries with no area
+
+        area, moment = self.moments()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(area[:, np.newaxis] > 0, moment / area[:, np.newaxis], np.nan)
+
+    def bounds(self):
+        #  Return the bounds (minx, miny, maxx, maxy) of each geometry, as an array (ngeoms by 4); NaN for empty geometries
+
+        starts = self.ringOffsets[self.polygonOffsets[self.partOffsets]]
+        counts = np.diff(starts)
+        bounds = np.full((len(self), 4), np.nan)
+        nonempty = counts > 0
+        if nonempty.any():
+            #  The coordinates of each geometry are contiguous, so the empty geometries can be skipped
+            first = starts[:-1][nonempty]
+            bounds[nonempty, :2] = np.minimum.reduceat(self.coords, first, axis=0)
+            bounds[nonempty, 2:] = np.maximum.reduceat(self.coords, first, axis=0)
+
+        return bounds
+
+
+def ring_sums(coords, ringOffsets):
+    #  Function to calculate the shoelace sums of a set of closed rings: the signed area of each ring (positive if
+    #  anticlockwise), and its first moments of area, relative to the first vertex of the ring so that the products of
+    #  the (large) projected coordinates do not lose precision
+    #
+    #   Input arguments:
+    #
+    #   coords      - float64 array (ncoords by 2) of the coordinates of the rings
+    #   ringOffsets - integer array (nrings + 1) of the offsets of the rings in coords, starting at 0
+    #
+    #   Output arguments:
+    #
+    #   area   - array (nrings) of the signed areas
+    #   mx, my - arrays (nrings) of the first moments of area about the first vertex
+    #   origin - array (nrings by 2) of the first vertex of each ring
+
+    nrings = len(ringOffsets) - 1
+    area, mx, my = np.zeros(nrings), np.zeros(nrings), np.zeros(nrings)
+    origin = np.zeros((nrings, 2))
+    ringLengths = np.diff(ringOffsets)
+    nonempty = ringLengths > 0
+    if not nonempty.any():
+        return area, mx, my, origin
+
+    starts = ringOffsets[:-1][nonempty]
+    origin[nonempty] = coords[starts]
+    x = coords[:, 0] - np.repeat(origin[:, 0], ringLengths)
+    y = coords[:, 1] - np.repeat(origin[:, 1], ringLengths)
+
+    #  Cross products of consecutive vertices; the pairs that span two rings (at the end of each ring) are zeroed
+    cross = np.empty(len(x))
+    np.subtract(x[:-1] * y[1:], x[1:] * y[:-1], out=cross[:-1])
+    cross[ringOffsets[1:][nonempty] - 1] = 0.0
+
+    area[nonempty] = np.add.reduceat(cross, starts) / 2
+    x[:-1] += x[1:]
+    y[:-1] += y[1:]
+    mx[nonempty] = np.add.reduceat(x * cross, starts) / 6
+    my[nonempty] = np.add.reduceat(y * cross, starts) / 6
+
+    return area, mx, my, origin
+
+
+def area_moments(geoms):
+    #  Function to return the area and first moments of area of an array of geometries (see CoordArrays.moments). The
+    #  polygons and multipolygons are handled by the coordinate array kernels; any other geometries (e.g. the geometry
+    #  collections that an intersection can return, or missing geometries) by shapely.
+    #
+    #   Input arguments:
+    #
+    #   geoms - array-like of shapely geometries, e.g. the geometry column of a geodataframe
+    #
+    #   Output arguments:
+    #
+    #   area   - array of the areas, in the units of the crs squared
+    #   moment - array (ngeoms by 2) of the first moments of area, i.e. area times centroid
+
+    geoms = np.asarray(geoms, dtype=object)
+    polygonal = np.isin(shapely.get_type_id(geoms), POLYGONAL_TYPES)
+
+    area = np.zeros(len(geoms))
+    moment = np.zeros((len(geoms), 2))
+    if polygonal.any():
+        area[polygonal], moment[polygonal] = CoordArrays.from_geometries(geoms[polygonal]).moments()
+
+    other = ~polygonal & ~shapely.is_missing(geoms)
+    if other.any():
+        area[other] = shapely.area(geoms[other])
+        positive = np.flatnonzero(other)[area[other] > 0]
+        moment[positive] = area[positive, np.newaxis] * shapely.get_coordinates(shapely.centroid(geoms[positive]))
+
+    return area, moment
+
+
+def polygon_areas(geoms):
+    #  Function to return the areas of an array of geometries (see area_moments), in the units of the crs squared
+
+    return area_moments(geoms)[0]
+
+
+def polygon_centroids(geoms):
+    #  Function to return the centroids (x, y) of an array of geometries, as an array (ngeoms by 2). Geometries with no
+    #  area (e.g. lines, or empty geometries) fall back to the centroid calculated by shapely (NaN if empty).
+
+    geoms = np.asarray(geoms, dtype=object)
+    area, moment = area_moments(geoms)
+    centroids = np.full((len(geoms), 2), np.nan)
+    positive = area > 0
+    centroids[positive] = moment[positive] / area[positive, np.newaxis]
+
+    fallback = ~positive & ~shapely.is_missing(geoms) & ~shapely.is_empty(geoms)
+    if fallback.any():
+        centroids[fallback] = shapely.get_coordinates(shapely.centroid(geoms[fallback]))
+
+    return centroids
+
+
+def polygon_bounds(geoms):
+    #  Function to return the bounds (minx, miny, maxx, maxy) of an array of geometries, as an array (ngeoms by 4)
+
+    geoms = np.asarray(geoms, dtype=object)
+    polygonal = np.isin(shapely.get_type_id(geoms), POLYGONAL_TYPES)
+
+    bounds = np.full((len(geoms), 4), np.nan)
+    if polygonal.any():
+        bounds[polygonal] = CoordArrays.from_geometries(geoms[polygonal]).bounds()
+    if (~polygonal).any():
+        bounds[~polygonal] = shapely.bounds(geoms[~polygonal])
+
+    return bounds
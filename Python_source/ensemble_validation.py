@@ -0,0 +1,571 @@
+"""
+Script name: ensemble_validation.py
+Purpose: Script to validate the members of a model ensemble (e.g. 50-200 runs of one forecast) against a single set of
+observations. The observation side of the calculation is prepared once: the obs and no oil files are read, converted to crs
+and dissolved, the known observation region (the union of the two) is built and prepared for repeated intersection, and a
+spatial index is built over the parts of the observed oil. The members are then read one at a time and streamed through the
+overlap calculation, so that only one member is held in memory at once. The 2-D MOE, area skill score and centroid skill score
+of every member are calculated together (vectorized over the whole table) and written to one table in CSV format, along with a
+table of ensemble summary statistics for each contour level. The Fractions Skill Score of each contour level of every member can
+also be calculated over a range of neighbourhood widths (--fss), against obs rasterized once for the whole ensemble (see calc_fss.py).
+Usage: ./ensemble_validation.py <obsFile> <members> [<members> ...] <--modelType MODELTYPE> <--valType VALTYPE>
+                                [--noOilFile NOOILFILE] [--crs CRS] [--bufwidth BUFWIDTH] [--cacheDir CACHEDIR] [--reader READER]
+                                [--output OUTPUT] [--summary SUMMARY] [--fss FSS] [--fssSummary FSSSUMMARY]
+                                [--fssScales FSSSCALES [FSSSCALES ...]] [--fssResolution FSSRESOLUTION] [-h]
+        <obsFile>     - Required. Path to the oil observation file
+        <members>     - Required. Paths to the model prediction files of the ensemble members (GeoJSON, GeoParquet or FlatGeobuf)
+        <--modelType> - Required. Model output type of the members, either 'BE' or 'Prob'
+        <--valType>   - Required. Validation type, either 'Satellite' or 'Coastal'
+        <--noOilFile> - Optional. Path to the observation file that defines the region where no oil was detected
+        <--crs>       - Optional. Integer code of the coordinate reference system to convert to (default 3857)
+        <--bufwidth>  - Optional. Width in metres of the buffer placed around the coastlines for Coastal validation (default 5)
+        <--cacheDir>  - Optional. Directory used to cache the obs files once converted to crs and dissolved (see geometry_cache.py)
+        <--reader>    - Optional. Method used to read the GeoJSON files, either 'gdal' (default), 'fast' or 'stream'
+        <--output>    - Optional. Path of the table of member results (default ensemble_results.csv)
+        <--summary>   - Optional. Path of the table of ensemble summary statistics (default ensemble_summary.csv)
+        <--fss>       - Optional. Path of the table of the Fractions Skill Score curves of every member (satellite validation only).
+                        The FSS is only calculated if this is given.
+        <--fssSummary> - Optional. Path of the table of ensemble summary statistics of the FSS (default ensemble_fss_summary.csv)
+        <--fssScales> - Optional. Neighbourhood widths, in grid cells (odd numbers), of the FSS curves (default 1 3 5 9 17 33 65 129)
+        <--fssResolution> - Optional. Width in metres of the grid cells used for the FSS (default 500 cells along the longest side)
+        <--help>      - Optional. Shows help text.
+"""
+
+##### IMPORT RELEVANT LIBRARIES
+
+import argparse
+import os
+import time as timer
+
+import numpy as np
+import pandas as pd
+
+from calc_fss import DEFAULT_SCALES, calc_fss_curves, prepare_fss_obs
+from calc_metrics import calc_metrics_batch
+from coord_arrays import polygon_areas, polygon_bounds, polygon_centroids
+from geometry_cache import DEFAULT_CACHE_SIZE
+from process_data import (
+    DEFAULT_BUFWIDTH,
+    READERS,
+    build_obs_index,
+    calc_overlap_areas,
+    check_geom_types,
+    clip_to_region,
+    dissolve_levels,
+    known_region,
+    prepare_model,
+    project_dissolve,
+    read_geofile,
+    read_obs,
+    scene_bbox,
+)
+
+#####
+
+#  Columns of the table of member results
+ENSEMBLE_COLUMNS = [
+    "member",
+    "modelFile",
+    "casename",
+    "time",
+    "contourlev",
+    "obs_area",
+    "area_full_contour",
+    "overlap_full_contour",
+    "centroid_x",
+    "centroid_y",
+    "x",
+    "y",
+    "Ass",
+    "Css",
+    "status",
+]
+
+#  Metrics summarised over the ensemble members, and the quantiles reported for each
+SUMMARY_METRICS = ["x", "y", "Ass", "Css"]
+SUMMARY_QUANTILES = [0.1, 0.5, 0.9]
+
+
+def prepare_obs(
+    obsFile,
+    noOilFile,
+    valType,
+    crs=3857,
+    bufwidth=DEFAULT_BUFWIDTH,
+    cacheDir=None,
+    reader="gdal",
+    fssScales=None,
+    fssResolution=None,
+):
+    #  Function to read the obs (and no oil obs) and prepare everything about them that is needed to score a model
+    #  against them, so that this is done once for the whole ensemble rather than once per member
+    #
+    #   Input arguments:
+    #
+    #   obsFile   - absolute/relative path to oil observation file
+    #   noOilFile - absolute/relative path to observation file that defines the region where no oil was detected (None if not available)
+    #   valType   - Type of obs data to validate against, either 'Satellite' or 'Coastal'
+    #   crs       - Integer specifying the coordinate reference system to convert the data to
+    #   bufwidth  - Width in metres of the buffer placed around the coastlines for Coastal validation
+    #   cacheDir  - Optional directory of the geometry cache used to read the obs files (see geometry_cache.py)
+    #   reader    - Method used to read the GeoJSON files, either 'gdal', 'fast' or 'stream'
+    #   fssScales - Neighbourhood widths (odd numbers of grid cells) of the FSS curves (None if the FSS is not calculated)
+    #   fssResolution - Width in metres of the grid cells used for the FSS (None to choose automatically)
+    #
+    #   Output arguments:
+    #
+    #   obs - dictionary with the prepared obs: the oil geodataframe including its area (oil, in km^2), the known
+    #         observation region, prepared for clipping (known; see process_data.known_region; None if there is no no oil file), the spatial
+    #         index over the obs parts (index; see process_data.build_obs_index), the observed area (obs_area), the
+    #         coordinates of the obs centroid (centroid), the bounds of the obs (bounds) and the bounding box of the
+    #         observation scene used to filter the model features when reading (bbox; see process_data.scene_bbox),
+    #         the obs rasterized for the FSS (fss; see calc_fss.prepare_fss_obs; None if the FSS is not calculated, or
+    #         if there is no no oil file, in which case the grid must also cover each member), together with valType,
+    #         crs, bufwidth, fssScales and fssResolution
+
+    assert os.path.exists(obsFile), "obsFile does not exist"
+    assert noOilFile is None or os.path.exists(noOilFile), "noOilFile does not exist"
+    assert valType == "Satellite" or valType == "Coastal", "Invalid valType argument"
+    assert reader in READERS, "Invalid reader argument"
+
+    oil = project_dissolve(
+        read_obs(obsFile, crs, cacheDir, DEFAULT_CACHE_SIZE, reader, None), crs, "test-case"
+    )
+    check_geom_types(oil, valType)
+    no_oil = None
+    if noOilFile is not None:
+        no_oil = project_dissolve(
+            read_obs(noOilFile, crs, cacheDir, DEFAULT_CACHE_SIZE, reader, None),
+            crs,
+            "test-case",
+        )
+        check_geom_types(no_oil, valType)
+
+    if valType == "Coastal":
+        #  Convert the coastlines to polygons, as in calc_poly_overlap
+        oil["geometry"] = oil.geometry.buffer(bufwidth)
+        if no_oil is not None:
+            no_oil["geometry"] = no_oil.geometry.buffer(bufwidth)
+
+    oil["obs_area"] = polygon_areas(oil.geometry.values) / 10 ** 6
+
+    #  Build the known observation region once, and prepare it for the repeated clipping of the members
+    known, bbox = None, None
+    if no_oil is not None:
+        known = known_region(oil, no_oil)
+        bbox = scene_bbox(oil, no_oil)
+
+    #  Store the obs centroid and bounds used by the centroid skill score (see calc_metrics.calc_centroid_ss)
+    centroid = polygon_centroids(oil.geometry.values[:1])[0]
+
+    #  Rasterize the obs for the FSS once, if the grid can be fixed by the observation scene
+    fss = None
+    if fssScales is not None and valType == "Satellite" and no_oil is not None:
+        fss = prepare_fss_obs(oil, no_oil, None, fssResolution, fssScales)
+
+    obs = {
+        "oil": oil,
+        "known": known,
+        "index": build_obs_index(oil),
+        "obs_area": oil["obs_area"].iloc[0],
+        "centroid": tuple(centroid),
+        "bounds": tuple(polygon_bounds(oil.geometry.values[:1])[0]),
+        "bbox": bbox,
+        "fss": fss,
+        "valType": valType,
+        "crs": crs,
+        "bufwidth": bufwidth,
+        "fssScales": fssScales,
+        "fssResolution": fssResolution,
+    }
+    print("Number of levels in obsFile : ", len(oil))
+    print("Observed oil area : ", obs["obs_area"])
+
+    return obs
+
+
+def score_member(obs, modelFile, modelType, reader="gdal", fssCurves=None):
+    #  Function to calculate the predicted and overlap areas of one ensemble member against the prepared obs,
+    #  following the same steps as read_geojson and calc_poly_overlap (with the 'index' engine)
+    #
+    #   Input arguments:
+    #
+    #   obs       - dictionary with the prepared obs, as returned by prepare_obs
+    #   modelFile - absolute/relative path to the model prediction file of the member
+    #   modelType - Model output type. Either 'BE' for best estimate, or 'Prob' for probabilistic
+    #   reader    - Method used to read the GeoJSON file, either 'gdal', 'fast' or 'stream'
+    #   fssCurves - Optional list to which the FSS curves of the member are appended (see calc_fss.calc_fss_curves),
+    #               for satellite validation with fssScales given to prepare_obs
+    #
+    #   Output arguments:
+    #
+    #   rows - list of dictionaries, one per contour level of the member (including the levels without any overlap with
+    #          the obs, or without any area in the known observation region, which have status 'no overlap'), with the
+    #          areas (in km^2) and the coordinates of the model centroid (BE only). The metrics are added by score_table.
+
+    info = {"member": os.path.splitext(os.path.basename(modelFile))[0], "modelFile": modelFile}
+
+    model = read_geofile(modelFile, reader, obs["bbox"])
+    model, casename, time, plevs = prepare_model(model, modelType, obs["valType"])
+    model = model.to_crs({"init": "epsg:" + str(obs["crs"])})
+    info.update(casename=casename, time=time)
+
+    if modelType == "BE":
+        model = dissolve_levels(model)
+
+    if obs["valType"] == "Coastal":
+        model["geometry"] = model.geometry.buffer(obs["bufwidth"])
+
+    #  Contour levels of the member, each of which is given a row whether or not it overlaps the obs
+    levels = np.unique(model["contourlev"].to_numpy())
+
+    #  Clip the model to the known observation region, dropping any contours that lie wholly outside it
+    if obs["known"] is not None:
+        model = clip_to_region(model, obs["known"])
+
+    model_known = model.sort_values(by="contourlev").reset_index(drop=True)
+
+    #  Calculate the FSS curves of the member, against the obs rasterized once for the ensemble where possible
+    if fssCurves is not None and obs["fssScales"] is not None and obs["valType"] == "Satellite":
+        fssObs = obs["fss"]
+        if fssObs is None:
+            fssObs = prepare_fss_obs(obs["oil"], None, model_known, obs["fssResolution"], obs["fssScales"])
+        curves = calc_fss_curves(fssObs, model_known)
+        curves.insert(0, "member", info["member"])
+        fssCurves.append(curves)
+
+    #  Sum the cut-out and overlap areas of each level; levels with nothing left in the known region have zero area.
+    #  The model centroid (BE only) does not depend on the overlap, so it is calculated for every member with some
+    #  area in the known region; a member without any has no centroid, and is given no centroid skill by score_table.
+    cutout = np.zeros(len(levels))
+    overlap_area = np.zeros(len(levels))
+    centroid_x, centroid_y = np.nan, np.nan
+    if not model_known.empty:
+        areas = polygon_areas(model_known.geometry.values) / 10 ** 6
+        np.add.at(cutout, np.searchsorted(levels, model_known["contourlev"].to_numpy()), areas)
+
+        overlap = calc_overlap_areas(model_known, obs["oil"], obs["index"])
+        if not overlap.empty:
+            np.add.at(
+                overlap_area,
+                np.searchsorted(levels, overlap["contourlev"].to_numpy()),
+                overlap["overlap_area"].to_numpy(),
+            )
+
+        if modelType == "BE":
+            centroid_x, centroid_y = polygon_centroids(model_known.geometry.values[:1])[0]
+
+    #  The region enclosed by each full contour is the union of the cut-outs of that level and above
+    area_full_contour = np.cumsum(cutout[::-1])[::-1]
+    overlap_full_contour = np.cumsum(overlap_area[::-1])[::-1]
+
+    rows = []
+    for i in range(len(levels)):
+        rows.append(
+            dict(
+                info,
+                contourlev=levels[i],
+                obs_area=obs["obs_area"],
+                area_full_contour=area_full_contour[i],
+                overlap_full_contour=overlap_full_contour[i],
+                centroid_x=centroid_x,
+                centroid_y=centroid_y,
+                status="ok" if overlap_full_contour[i] > 0 else "no overlap",
+            )
+        )
+
+    return rows
+
+
+def score_table(results, obs, modelType):
+    #  Function to calculate the 2-D MOE components and skill scores of every row of the member results at once.
+    #  The metrics are calculated by calc_metrics.calc_metrics_batch (with the default thresholds), and
+    #  as in Calc_2D_MOE_GeoJSON.py the skill scores are only calculated for BE output against satellite data.
+    #
+    #   Input arguments:
+    #
+    #   results   - pandas DataFrame of member results (see score_member)
+    #   obs       - dictionary with the prepared obs, as returned by prepare_obs
+    #   modelType - Model output type. Either 'BE' for best estimate, or 'Prob' for probabilistic
+    #
+    #   Output arguments:
+    #
+    #   results - pandas DataFrame with the columns x, y, Ass and Css filled in (x and y are 0 where there is no overlap,
+    #             and Css is 0 where the member has no predicted area within the known observation region)
+
+    valid = results["status"].isin(["ok", "no overlap"])
+    Aov = results["overlap_full_contour"].where(valid)
+
+    if obs["valType"] == "Satellite" and modelType == "BE":
+        n = len(results)
+        metrics = calc_metrics_batch(
+            results["obs_area"],
+            results["area_full_contour"],
+            Aov,
+            np.tile(obs["centroid"], (n, 1)),
+            results[["centroid_x", "centroid_y"]].to_numpy(dtype=float),
+            np.tile(obs["bounds"], (n, 1)),
+        )
+    else:
+        metrics = calc_metrics_batch(
+            results["obs_area"], results["area_full_contour"], Aov, areaThresholds=None
+        )
+
+    for metric in metrics.columns.intersection(ENSEMBLE_COLUMNS):
+        results[metric] = metrics[metric]
+
+    #  A member with no predicted oil within the known observation region has no centroid; it is given no skill
+    if "Css" in metrics.columns:
+        results.loc[valid & (results["area_full_contour"] == 0), "Css"] = 0.0
+
+    return results
+
+
+def run_ensemble(obs, memberFiles, modelType, reader="gdal", fssCurves=None):
+    #  Function to score every member of an ensemble against the prepared obs. The members are read and scored one
+    #  at a time; a member that fails (e.g. a missing or malformed file) is recorded with status 'failed' rather
+    #  than stopping the run.
+    #
+    #   Input arguments:
+    #
+    #   obs         - dictionary with the prepared obs, as returned by prepare_obs
+    #   memberFiles - list of paths to the model prediction files of the members
+    #   modelType   - Model output type. Either 'BE' for best estimate, or 'Prob' for probabilistic
+    #   reader      - Method used to read the GeoJSON files, either 'gdal', 'fast' or 'stream'
+    #   fssCurves   - Optional list to which the FSS curves of each member are appended (see score_member)
+    #
+    #   Output arguments:
+    #
+    #   results - pandas DataFrame with one row per member and contour level (columns as given by ENSEMBLE_COLUMNS)
+
+    assert modelType == "BE" or modelType == "Prob", "Invalid modelType argument"
+
+    rows = []
+    for modelFile in memberFiles:
+        start = timer.perf_counter()
+        try:
+            memberRows = score_member(obs, modelFile, modelType, reader, fssCurves)
+        except Exception as err:
+            memberRows = [
+                {
+                    "member": os.path.splitext(os.path.basename(modelFile))[0],
+                    "modelFile": modelFile,
+                    "status": "failed: " + repr(err),
+                }
+            ]
+        print(
+            "Scored ",
+            os.path.basename(modelFile),
+            " in ",
+            round(timer.perf_counter() - start, 3),
+            " s : ",
+            memberRows[0]["status"],
+        )
+        rows.extend(memberRows)
+
+    results = pd.DataFrame(rows, columns=ENSEMBLE_COLUMNS)
+
+    return score_table(results, obs, modelType)
+
+
+def summarise_ensemble(results):
+    #  Function to calculate summary statistics of the 2-D MOE and skill scores over the ensemble members,
+    #  for each contour level. Members without any overlap count as zero skill; failed members are left out.
+    #
+    #   Input arguments:
+    #
+    #   results - pandas DataFrame of member results, as returned by run_ensemble
+    #
+    #   Output arguments:
+    #
+    #   summary - pandas DataFrame with one row per contour level, giving the number of members and the mean,
+    #             standard deviation, minimum, quantiles (see SUMMARY_QUANTILES) and maximum of each metric
+
+    scored = results[results["status"].isin(["ok", "no overlap"])]
+    grouped = scored.groupby("contourlev")
+
+    summary = pd.DataFrame({"members": grouped["member"].nunique()})
+    for metric in SUMMARY_METRICS:
+        values = grouped[metric]
+        summary[metric + "_mean"] = values.mean()
+        summary[metric + "_std"] = values.std()
+        summary[metric + "_min"] = values.min()
+        for q in SUMMARY_QUANTILES:
+            summary[metric + "_p" + str(int(round(100 * q)))] = values.quantile(q)
+        summary[metric + "_max"] = values.max()
+
+    return summary.reset_index()
+
+
+def summarise_fss(curves):
+    #  Function to calculate summary statistics of the FSS over the ensemble members, for each contour level and
+    #  neighbourhood width
+    #
+    #   Input arguments:
+    #
+    #   curves - pandas DataFrame of the FSS curves of the members (see calc_fss.calc_fss_curves, with a member column)
+    #
+    #   Output arguments:
+    #
+    #   summary - pandas DataFrame with one row per contour level and neighbourhood width, giving the width in km, the
+    #             FSS of a uniform forecast (fss_useful), the number of members and the mean, standard deviation,
+    #             minimum, quantiles (see SUMMARY_QUANTILES) and maximum of the FSS
+
+    grouped = curves.groupby(["contourlev", "scale"])
+
+    summary = grouped[["scale_km", "fss_useful"]].first()
+    summary["members"] = grouped["member"].nunique()
+    values = grouped["fss"]
+    summary["fss_mean"] = values.mean()
+    summary["fss_std"] = values.std()
+    summary["fss_min"] = values.min()
+    for q in SUMMARY_QUANTILES:
+        summary["fss_p" + str(int(round(100 * q)))] = values.quantile(q)
+    summary["fss_max"] = values.max()
+
+    return summary.reset_index()
+
+
+def main():
+
+    ##### READ IN COMMAND LINE ARGUMENTS
+
+    parser = argparse.ArgumentParser(
+        description="""
+        Purpose: Script to calculate the 2-D MOE and skill scores of every member of a model ensemble against one set of
+        observations. The observations are read and prepared once, and the members are streamed through the overlap
+        calculation one at a time. The results of every member, and summary statistics over the ensemble, are written
+        to tables in CSV format.""",
+        epilog="Example of use: ./ensemble_validation.py obs.geojson member_*.geojson --modelType BE --valType Satellite --noOilFile no_oil.geojson",
+    )
+    parser.add_argument("obsFile", help="Required. Path to the oil observation file", type=str)
+    parser.add_argument(
+        "members",
+        help="Required. Paths to the model prediction files of the ensemble members",
+        type=str,
+        nargs="+",
+    )
+    parser.add_argument(
+        "--modelType",
+        help="Required. Model output type of the members, either 'BE' or 'Prob'",
+        type=str,
+        choices=["BE", "Prob"],
+        required=True,
+    )
+    parser.add_argument(
+        "--valType",
+        help="Required. Validation type, either 'Satellite' or 'Coastal'",
+        type=str,
+        choices=["Satellite", "Coastal"],
+        required=True,
+    )
+    parser.add_argument(
+        "--noOilFile",
+        help="Optional path to the observation file that defines the region where no oil was detected",
+        type=str,
+    )
+    parser.add_argument(
+        "--crs",
+        help="Optional integer specifying the crs code to convert obs and model data to. Default value is 3857",
+        type=int,
+        default=3857,
+    )
+    parser.add_argument(
+        "--bufwidth",
+        help="Optional width in metres of the buffer placed around the coastlines for Coastal validation. Default value is 5",
+        type=float,
+        default=DEFAULT_BUFWIDTH,
+    )
+    parser.add_argument(
+        "--cacheDir",
+        help="Optional directory in which to cache the obs files, once converted to crs and dissolved",
+        type=str,
+    )
+    parser.add_argument(
+        "--reader",
+        help="Optional method used to read the GeoJSON files, either 'gdal' (default), 'fast' or 'stream'",
+        type=str,
+        choices=["gdal", "fast", "stream"],
+        default="gdal",
+    )
+    parser.add_argument(
+        "--output",
+        help="Optional path of the table of member results. Default is ensemble_results.csv",
+        type=str,
+        default="ensemble_results.csv",
+    )
+    parser.add_argument(
+        "--summary",
+        help="Optional path of the table of ensemble summary statistics. Default is ensemble_summary.csv",
+        type=str,
+        default="ensemble_summary.csv",
+    )
+    parser.add_argument(
+        "--fss",
+        help="Optional path of the table of the Fractions Skill Score curves of every member (satellite validation only). \
+                            The FSS is only calculated if this is given",
+        type=str,
+    )
+    parser.add_argument(
+        "--fssSummary",
+        help="Optional path of the table of ensemble summary statistics of the FSS. Default is ensemble_fss_summary.csv",
+        type=str,
+        default="ensemble_fss_summary.csv",
+    )
+    parser.add_argument(
+        "--fssScales",
+        help="Optional neighbourhood widths, in grid cells (odd numbers), of the FSS curves. Default values are "
+        + " ".join(str(n) for n in DEFAULT_SCALES),
+        type=int,
+        nargs="+",
+        default=DEFAULT_SCALES,
+    )
+    parser.add_argument(
+        "--fssResolution",
+        help="Optional width in metres of the grid cells used for the FSS. Default is 500 cells along the longest side of the grid",
+        type=float,
+    )
+
+    args = parser.parse_args()
+
+    #####
+
+    ##### PREPARE THE OBS ONCE, THEN SCORE EVERY MEMBER AGAINST THEM
+
+    start = timer.perf_counter()
+    obs = prepare_obs(
+        args.obsFile,
+        args.noOilFile,
+        args.valType,
+        args.crs,
+        args.bufwidth,
+        args.cacheDir,
+        args.reader,
+        None if args.fss is None else args.fssScales,
+        args.fssResolution,
+    )
+    print("Observations prepared in ", round(timer.perf_counter() - start, 3), " s")
+    print("Number of ensemble members to score : ", len(args.members))
+
+    fssCurves = None if args.fss is None else []
+    results = run_ensemble(obs, args.members, args.modelType, args.reader, fssCurves)
+    results.to_csv(args.output, index=False)
+    print("Member results written to : ", args.output)
+
+    summary = summarise_ensemble(results)
+    summary.to_csv(args.summary, index=False)
+    print("Ensemble summary written to : ", args.summary)
+    print(summary[["contourlev", "members", "x_mean", "y_mean"]].to_string(index=False))
+
+    if fssCurves:
+        curves = pd.concat(fssCurves, ignore_index=True)
+        curves.to_csv(args.fss, index=False)
+        print("Member FSS curves written to : ", args.fss)
+        summarise_fss(curves).to_csv(args.fssSummary, index=False)
+        print("Ensemble FSS summary written to : ", args.fssSummary)
+
+    #####
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Script name: geo_formats.py
+Purpose: Functions to read and write the obs and model files in GeoParquet and FlatGeobuf format, as alternatives to GeoJSON.
+Both formats can be read with a bounding box filter, so that only the features near the observation scene are decoded: GeoParquet
+files written here include a bounding box column for each feature (the 'covering' of GeoParquet 1.1), which is used to skip whole
+row groups and rows before their geometry is decoded, and FlatGeobuf files include a packed R-tree spatial index. Run as a script,
+this converts GeoJSON files (e.g. the files in validation_data) to either format, keeping all of their properties.
+Usage: ./geo_formats.py <files> [<files> ...] [--format FORMAT] [--outDir OUTDIR] [-h]
+        <files>    - Required. Paths to the GeoJSON files to convert
+        <--format> - Optional. Format to convert to, either 'geoparquet' (default) or 'flatgeobuf'
+        <--outDir> - Optional. Directory to write the converted files to (default is the directory of each file)
+        <--help>   - Optional. Shows help text.
+"""
+
+##### IMPORT RELEVANT LIBRARIES
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+#####
+
+#  File formats, by file extension. Files with any other extension are read as GeoJSON.
+FORMATS = {
+    ".geojson": "geojson",
+    ".json": "geojson",
+    ".parquet": "geoparquet",
+    ".geoparquet": "geoparquet",
+    ".fgb": "flatgeobuf",
+}
+
+#  File extension used for the files converted to each format
+EXTENSIONS = {"geoparquet": ".parquet", "flatgeobuf": ".fgb"}
+
+#  Number of features in each row group of the GeoParquet files written here. Row groups whose features all lie
+#  outside a bounding box filter are skipped without being read.
+DEFAULT_ROW_GROUP_SIZE = 64
+
+#  Name of the bounding box column of the GeoParquet files written here
+BBOX_COLUMN = "bbox"
+
+
+def file_format(path):
+    #  Function to return the format of a file ('geojson', 'geoparquet' or 'flatgeobuf'), from its extension
+
+    return FORMATS.get(os.path.splitext(path)[1].lower(), "geojson")
+
+
+def read_geoformat(path, bbox=None):
+    #  Function to read a GeoParquet or FlatGeobuf file into a geodataframe
+    #
+    #   Input arguments:
+    #
+    #   path - absolute/relative path to the file
+    #   bbox - Optional GeoSeries (with a crs) whose bounds are used to filter the features: only the features whose
+    #          bounding boxes meet them are read. None to read all of the features.
+    #
+    #   Output arguments:
+    #
+    #   gdf - geodataframe containing the (filtered) contents of the file
+
+    if file_format(path) == "geoparquet":
+        return read_geoparquet(path, bbox)
+
+    return gpd.read_file(path, driver="FlatGeobuf", bbox=bbox)
+
+
+def read_geoparquet(path, bbox=None):
+    #  Function to read a GeoParquet file into a geodataframe. If the file has a bounding box column (as written by
+    #  write_geoparquet), a bounding box filter is applied when the file is read, using the statistics of each row
+    #  group to skip those lying wholly outside it, so the geometry of the features outside is never decoded.
+    #  Otherwise the whole file is read, and the filter is applied to the bounds of the geometries.
+    #
+    #   Input arguments:
+    #
+    #   path - absolute/relative path to the GeoParquet file
+    #   bbox - Optional GeoSeries (with a crs) whose bounds are used to filter the features (None to read all of them)
+    #
+    #   Output arguments:
+    #
+    #   gdf - geodataframe containing the (filtered) contents of the file
+
+    #  pyarrow is only imported when a GeoParquet file is read or written, so that it is not loaded for GeoJSON files
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    geo = json.loads(pq.read_schema(path).metadata[b"geo"])
+    column = geo["primary_column"]
+    meta = geo["columns"][column]
+    #  A missing crs means longitude/latitude coordinates (OGC:CRS84); a null crs means that it is unknown
+    crs = meta.get("crs", "OGC:CRS84")
+    covering = meta.get("covering", {}).get("bbox")
+
+    filters = None
+    if bbox is not None:
+        xmin, ymin, xmax, ymax = bbox.to_crs(crs).total_bounds if crs is not None else bbox.total_bounds
+        if covering is not None:
+            field = {name: pc.field(*covering[name]) for name in ["xmin", "ymin", "xmax", "ymax"]}
+            filters = (
+                (field["xmin"] <= xmax) & (field["xmax"] >= xmin) & (field["ymin"] <= ymax) & (field["ymax"] >= ymin)
+            )
+
+    table = pq.read_table(path, filters=filters)
+    if covering is not None:
+        table = table.drop([covering["xmin"][0]])
+
+    geometry = shapely.from_wkb(table.column(column).to_numpy(zero_copy_only=False))
+    gdf = gpd.GeoDataFrame(table.drop([column]).to_pandas(), geometry=geometry, crs=crs)
+
+    if bbox is not None and covering is None:
+        bounds = gdf.geometry.bounds
+        gdf = gdf[
+            (bounds["minx"] <= xmax) & (bounds["maxx"] >= xmin) & (bounds["miny"] <= ymax) & (bounds["maxy"] >= ymin)
+        ].reset_index(drop=True)
+
+    return gdf
+
+
+def write_geoparquet(gdf, path, rowGroupSize=DEFAULT_ROW_GROUP_SIZE):
+    #  Function to write a geodataframe to a GeoParquet file (version 1.1), with the geometry encoded as WKB and a
+    #  bounding box column (BBOX_COLUMN) holding the bounds of each feature, declared as the 'covering' of the
+    #  geometry so that it can be used to filter the features when reading (see read_geoparquet)
+    #
+    #   Input arguments:
+    #
+    #   gdf          - geodataframe to write
+    #   path         - absolute/relative path of the GeoParquet file
+    #   rowGroupSize - number of features in each row group
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    geoms = np.asarray(gdf.geometry)
+    bounds = shapely.bounds(geoms)
+    names = ["xmin", "ymin", "xmax", "ymax"]
+
+    table = pa.Table.from_pandas(pd.DataFrame(gdf.drop(columns=gdf.geometry.name)), preserve_index=False)
+    table = table.append_column("geometry", pa.array(shapely.to_wkb(geoms), pa.binary()))
+    table = table.append_column(
+        BBOX_COLUMN, pa.StructArray.from_arrays([pa.array(bounds[:, i]) for i in range(4)], names=names)
+    )
+
+    meta = {
+        "encoding": "WKB",
+        "geometry_types": sorted(set(gdf.geom_type.dropna())),
+        "bbox": [float(value) for value in gdf.total_bounds],
+        "covering": {BBOX_COLUMN: {name: [BBOX_COLUMN, name] for name in names}},
+    }
+    meta["crs"] = gdf.crs.to_json_dict() if gdf.crs is not None else None
+    geo = {"version": "1.1.0", "primary_column": "geometry", "columns": {"geometry": meta}}
+
+    table = table.replace_schema_metadata(dict(table.schema.metadata or {}, geo=json.dumps(geo)))
+    pq.write_table(table, path, row_group_size=rowGroupSize)
+
+
+def convert_file(path, fileFormat="geoparquet", outDir=None):
+    #  Function to convert a GeoJSON file to GeoParquet or FlatGeobuf format, keeping all of its properties
+    #
+    #   Input arguments:
+    #
+    #   path       - absolute/relative path to the GeoJSON file
+    #   fileFormat - format to convert to, either 'geoparquet' or 'flatgeobuf'
+    #   outDir     - directory to write the converted file to (None for the directory of the GeoJSON file)
+    #
+    #   Output arguments:
+    #
+    #   outFile - path of the converted file
+
+    assert fileFormat in EXTENSIONS, "Invalid format argument"
+
+    outDir = outDir or os.path.dirname(path) or "."
+    os.makedirs(outDir, exist_ok=True)
+    outFile = os.path.join(outDir, os.path.splitext(os.path.basename(path))[0] + EXTENSIONS[fileFormat])
+
+    gdf = gpd.read_file(path, driver="geojson")
+    if fileFormat == "geoparquet":
+        write_geoparquet(gdf, outFile)
+    else:
+        gdf.to_file(outFile, driver="FlatGeobuf", SPATIAL_INDEX="YES")
+
+    return outFile
+
+
+def main():
+
+    ##### READ IN COMMAND LINE ARGUMENTS
+
+    parser = argparse.ArgumentParser(
+        description="""
+        Purpose: Script to convert GeoJSON obs and model files to GeoParquet or FlatGeobuf format, which can be read
+        faster, and with a bounding box filter so that only the model features near the observation scene are decoded.
+        The converted files can be given to Calc_2D_MOE_GeoJSON.py in place of the GeoJSON files.""",
+        epilog="Example of use: ./geo_formats.py ../validation_data/Corsica/*.geojson --format geoparquet --outDir corsica_parquet",
+    )
+    parser.add_argument("files", help="Required. Paths to the GeoJSON files to convert", type=str, nargs="+")
+    parser.add_argument(
+        "--format",
+        help="Optional format to convert to, either 'geoparquet' (default) or 'flatgeobuf'",
+        type=str,
+        choices=list(EXTENSIONS),
+        default="geoparquet",
+    )
+    parser.add_argument(
+        "--outDir",
+        help="Optional directory to write the converted files to. Default is the directory of each file",
+        type=str,
+    )
+
+    args = parser.parse_args()
+
+    #####
+
+    for path in args.files:
+        outFile = convert_file(path, args.format, args.outDir)
+        print("Converted ", path, " to ", outFile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import json
+import re
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from shapely import GeometryType
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#  Feature properties used by OMEN; all other properties are dropped when reading
+PROPERTIES = ["level", "test-case", "time", "name"]
+
+#  Nesting depth of the coordinate arrays for each geometry type, above the individual points
+GEOMETRY_DEPTHS = {
+    "Point": 0,
+    "LineString": 1,
+    "Polygon": 2,
+    "MultiLineString": 2,
+    "MultiPolygon": 3,
+}
+GEOMETRY_TYPES = {
+    "Point": GeometryType.POINT,
+    "LineString": GeometryType.LINESTRING,
+    "Polygon": GeometryType.POLYGON,
+    "MultiLineString": GeometryType.MULTILINESTRING,
+    "MultiPolygon": GeometryType.MULTIPOLYGON,
+}
+
+CRS_PATTERN = re.compile(r'"crs"\s*:\s*\{.*?"name"\s*:\s*"([^"]+)"', re.S)
+
+
+def read_geojson_fast(path, stream=False):
+    #  Function to read a GeoJSON FeatureCollection into a geodataframe, as a faster alternative to
+    #  gpd.read_file. Only the properties used by OMEN (see PROPERTIES) are kept, and the geometries of
+    #  each type are built in bulk from flat coordinate arrays using shapely's vectorized constructors.
+    #  The document is parsed with orjson where available (and the standard json module otherwise).
+    #  If stream is True, the features are instead decoded one at a time as the file is read, and reduced
+    #  to coordinate arrays straight away, so that the whole document is never held as Python objects.
+    #  Only the x and y coordinates are kept.
+    #
+    #   Input arguments:
+    #
+    #   path   - absolute/relative path to the GeoJSON file
+    #   stream - if True, decode the features one at a time rather than parsing the whole document at once
+    #
+    #   Output arguments:
+    #
+    #   gdf - geodataframe with a geometry column and the columns in PROPERTIES that are present in the file
+
+    if stream:
+        features = iter_features(path)
+        header = next(features)
+    else:
+        with open(path, "rb") as f:
+            if orjson is not None:
+                collection = orjson.loads(f.read())
+            else:
+                collection = json.load(f)
+        assert collection.get("type") == "FeatureCollection", (
+            "Not a GeoJSON FeatureCollection: %r" % path
+        )
+        header = collection
+        features = collection["features"]
+
+    properties = {name: [] for name in PROPERTIES}
+    builders = {}
+    geomTypes = []
+
+    for i, feature in enumerate(features):
+        props = feature.get("properties") or {}
+        for name in PROPERTIES:
+            properties[name].append(props.get(name))
+
+        geometry = feature.get("geometry")
+        if geometry is None:
+            geomTypes.append(None)
+            continue
+        geomType = geometry["type"]
+        assert geomType in GEOMETRY_DEPTHS, "Unsupported geometry type: %r" % geomType
+        if geomType not in builders:
+            builders[geomType] = RaggedBuilder(GEOMETRY_DEPTHS[geomType])
+        builders[geomType].add(i, geometry["coordinates"])
+        geomTypes.append(geomType)
+
+    #  Build the geometries of each type in one go, then put them back in feature order
+    geometry = np.full(len(geomTypes), None, dtype=object)
+    for geomType, builder in builders.items():
+        index, geoms = builder.build(GEOMETRY_TYPES[geomType])
+        geometry[index] = geoms
+
+    data = {}
+    for name in PROPERTIES:
+        values = properties[name]
+        if all(v is None for v in values):
+            continue
+        data[name] = values
+    df = pd.DataFrame(data)
+    if "time" in df.columns:
+        df["time"] = parse_times(df["time"])
+
+    return gpd.GeoDataFrame(df, geometry=geometry, crs=collection_crs(header))
+
+
+def iter_features(path, chunkSize=1024 ** 2):
+    #  Generator to decode the features of a GeoJSON FeatureCollection one at a time, reading the file in chunks.
+    #  The first item generated is the text preceding the features array (from which the crs can be found), and the
+    #  features follow. Any members of the FeatureCollection that follow the features array are ignored. When a feature
+    #  continues beyond the end of the buffer, the size of each further read is doubled until the feature is complete,
+    #  so that a feature much larger than chunkSize (e.g. a dissolved obs or BE model) is only decoded from its start a
+    #  few times. The file is closed when the generator finishes, fails, or is closed (or discarded) before the end.
+
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        while True:
+            chunk = f.read(chunkSize)
+            assert chunk, "No features found in GeoJSON file: %r" % path
+            buf += chunk
+            match = re.search(r'"features"\s*:\s*\[', buf)
+            if match is not None:
+                break
+
+        yield buf[: match.start()]
+
+        decoder = json.JSONDecoder()
+        buf = buf[match.end() :]
+        pos = 0
+        readSize = chunkSize
+        eof = False
+        while True:
+            #  Skip over the separators between features
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                feature, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                #  The feature continues beyond the end of the buffer, so read some more (twice as much as last time)
+                assert not eof, "Unterminated features array in GeoJSON file: %r" % path
+                chunk = f.read(readSize)
+                eof = chunk == ""
+                buf = buf[pos:] + chunk
+                pos = 0
+                readSize *= 2
+                continue
+            readSize = chunkSize
+            yield feature
+
+
+def collection_crs(header):
+    #  Function to return the crs of a GeoJSON FeatureCollection. This is taken from the (legacy) 'crs' member
+    #  where present, and is otherwise WGS 84 longitude/latitude, as specified by RFC 7946.
+
+    if isinstance(header, dict):
+        name = ((header.get("crs") or {}).get("properties") or {}).get("name")
+    else:
+        match = CRS_PATTERN.search(header)
+        name = None if match is None else match.group(1)
+
+    if name is None or name.upper().endswith("CRS84"):
+        return "EPSG:4326"
+
+    return name
+
+
+def parse_times(values):
+    #  Function to convert a column of time strings to datetimes, as gpd.read_file does for date-time fields.
+    #  The strings are left unchanged if any of them cannot be converted (or they are all empty).
+
+    parsed = pd.to_datetime(values, errors="coerce")
+    nonempty = (values.notna() & (values != "")).sum()
+    if nonempty > 0 and parsed.notna().sum() == nonempty:
+        return parsed
+
+    return values
+
+
+class RaggedBuilder:
+    #  Class to accumulate the coordinates of geometries of a single type as a flat array of points plus the
+    #  number of elements at each level of nesting (points per ring/line, rings per polygon, polygons per
+    #  multipolygon), from which shapely.from_ragged_array can build all of the geometries in a single call.
+    #
+    #   depth - nesting depth of the coordinate arrays above the individual points (see GEOMETRY_DEPTHS)
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.index = []
+        self.coords = []
+        self.counts = [[] for level in range(depth)]
+
+    def add(self, i, coordinates):
+        #  Add the coordinates of the geometry of feature i
+
+        self.index.append(i)
+
+        #  Descend through the levels of nesting, recording the number of elements at each one
+        parts = [coordinates]
+        for level in range(self.depth - 1, -1, -1):
+            self.counts[level].extend(len(part) for part in parts)
+            if level > 0:
+                parts = [element for part in parts for element in part]
+
+        #  Convert the points of the feature to a single array
+        points = [point for part in parts for point in part] if self.depth > 0 else [coordinates]
+        try:
+            xy = np.array(points, dtype=float).reshape(len(points), -1)
+        except ValueError:
+            #  Mixture of 2-D and 3-D points
+            xy = np.array([point[:2] for point in points], dtype=float)
+        self.coords.append(xy[:, :2])
+
+    def build(self, geomType):
+        #  Return the feature indices and geometries of all of the geometries added
+
+        coords = np.concatenate(self.coords) if self.coords else np.empty((0, 2))
+        offsets = tuple(
+            np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+            for counts in self.counts
+        )
+        geoms = shapely.from_ragged_array(geomType, coords, offsets if offsets else None)
+
+        return np.array(self.index), geoms
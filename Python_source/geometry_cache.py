@@ -0,0 +1,102 @@
+import hashlib
+import os
+import uuid
+
+import geopandas as gpd
+
+#  Increment this if the way the cached geodataframes are prepared changes, so that old entries are not reused
+CACHE_VERSION = "1"
+
+#  Default size limit of the cache directory (in bytes)
+DEFAULT_CACHE_SIZE = 1024 ** 3
+
+
+def load_geometry(
+    path, crs, dissolveBy, cacheDir, maxBytes=DEFAULT_CACHE_SIZE, reader="gdal"
+):
+    #  Function to return the geodataframe read from a GeoJSON file, converted to the given coordinate
+    #  reference system and dissolved by the given column, using an on-disk cache of previously prepared files.
+    #  On a cache hit the geodataframe is read from a GeoParquet file, so that the GeoJSON parsing,
+    #  projection and dissolve are skipped entirely. On a miss the file is prepared and then added to the cache.
+    #  The cache is limited in size, with the least recently used entries evicted first.
+    #
+    #   Input arguments:
+    #
+    #   path       - absolute/relative path to the GeoJSON file
+    #   crs        - Integer specifying the coordinate reference system to convert the data to
+    #   dissolveBy - name of the column to dissolve the geometries by (None to skip the dissolve)
+    #   cacheDir   - directory in which the cached files are stored (created if it does not exist)
+    #   maxBytes   - maximum total size (in bytes) of the cached files
+    #   reader     - method used to read the GeoJSON file on a cache miss (see process_data.read_geofile)
+    #
+    #   Output arguments:
+    #
+    #   gdf - geodataframe in the given crs, dissolved by (and so indexed by) the dissolveBy column
+
+    from process_data import project_dissolve, read_geofile
+
+    os.makedirs(cacheDir, exist_ok=True)
+    cacheFile = os.path.join(cacheDir, cache_key(path, crs, dissolveBy) + ".parquet")
+
+    if os.path.exists(cacheFile):
+        gdf = gpd.read_parquet(cacheFile)
+        #  Update the modification time, which is used to record when the entry was last used
+        os.utime(cacheFile)
+        print("Read ", path, " from geometry cache")
+        return gdf
+
+    gdf = read_geofile(path, reader)
+    gdf = project_dissolve(gdf, crs, dissolveBy)
+
+    #  Write to a temporary file first, so that other processes never see a partially written entry
+    tmpFile = cacheFile + "." + uuid.uuid4().hex + ".tmp"
+    gdf.to_parquet(tmpFile)
+    os.replace(tmpFile, cacheFile)
+
+    evict_lru(cacheDir, maxBytes)
+
+    return gdf
+
+
+def cache_key(path, crs, dissolveBy):
+    #  Function to return the key of a cache entry, as a hash of the file contents, crs and dissolve column
+
+    sha = hashlib.sha256()
+    update_file_hash(sha, path)
+    sha.update(("|" + str(crs) + "|" + str(dissolveBy) + "|" + CACHE_VERSION).encode())
+
+    return sha.hexdigest()
+
+
+def update_file_hash(sha, path):
+    #  Function to add the contents of a file to a hashlib hash object, reading it in blocks
+
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 ** 2), b""):
+            sha.update(block)
+
+
+def evict_lru(cacheDir, maxBytes):
+    #  Function to delete the least recently used files in a cache directory until the total size
+    #  of the files in the directory is no greater than maxBytes
+
+    entries = []
+    for name in os.listdir(cacheDir):
+        if name.endswith(".tmp"):
+            continue
+        filename = os.path.join(cacheDir, name)
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, filename))
+
+    total = sum(size for mtime, size, filename in entries)
+    for mtime, size, filename in sorted(entries):
+        if total <= maxBytes:
+            break
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+        total -= size
@@ -0,0 +1,189 @@
+import contextlib
+import csv
+import json
+import os
+import resource
+import sys
+import time as timer
+
+import numpy as np
+
+#  Profile of the current run, while one is being recorded (see start_profile): a dictionary with a list of the stages
+#  timed (stages) and of the sizes of the input geometries (geometry). Stages are only recorded while this is not None.
+PROFILE = None
+
+#  Columns of a profile written in CSV format (see write_profile). Each row is either a stage or an input geometry.
+PROFILE_COLUMNS = ["kind", "name", "wall_s", "cpu_s", "peak_rss_mb", "features", "parts", "vertices"]
+
+
+def start_profile():
+    #  Function to start recording a new profile of the stages of a run (see stage and record_geometry)
+
+    global PROFILE
+    PROFILE = {"stages": [], "geometry": []}
+
+    return PROFILE
+
+
+def stop_profile():
+    #  Function to stop recording the profile, and return it
+
+    global PROFILE
+    profile, PROFILE = PROFILE, None
+
+    return profile
+
+
+@contextlib.contextmanager
+def stage(name):
+    #  Context manager to record the wall time, CPU time and peak memory of a stage of the validation (e.g. 'read',
+    #  'overlay' or 'metrics') in the current profile. Nothing is recorded unless a profile has been started. Stages
+    #  should not be nested, since the peak memory of the process is reset at the start of each stage where possible.
+    #
+    #   Input arguments:
+    #
+    #   name - name of the stage
+
+    if PROFILE is None:
+        yield
+        return
+
+    reset_peak_rss()
+    wall, cpu = timer.perf_counter(), timer.process_time()
+    try:
+        yield
+    finally:
+        if PROFILE is not None:
+            PROFILE["stages"].append(stage_record(name, wall, cpu))
+
+
+def timed_call(name, function, *args):
+    #  Function to call function(*args) as a stage, whether or not a profile is being recorded, and return its result
+    #  with the record of the stage. This is used in worker processes (e.g. to render the plots), which return the
+    #  records to the parent process to be added to its profile (see add_stages).
+
+    reset_peak_rss()
+    wall, cpu = timer.perf_counter(), timer.process_time()
+    result = function(*args)
+
+    return result, stage_record(name, wall, cpu)
+
+
+def stage_record(name, wall, cpu):
+    #  Function to return the record of a stage that started at the given wall time and CPU time (see stage)
+
+    return {
+        "name": name,
+        "wall_s": timer.perf_counter() - wall,
+        "cpu_s": timer.process_time() - cpu,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def add_stages(stages):
+    #  Function to add stages recorded elsewhere (e.g. in the worker processes rendering the plots) to the current profile
+
+    if PROFILE is not None:
+        PROFILE["stages"].extend(stages)
+
+
+def record_geometry(name, gdf):
+    #  Function to record the number of features, parts and vertices of an input geodataframe (e.g. 'obs', 'model' or
+    #  'no oil') in the current profile. Nothing is recorded unless a profile has been started.
+
+    if PROFILE is None or gdf is None:
+        return
+
+    import shapely
+
+    geoms = np.asarray(gdf.geometry)
+    PROFILE["geometry"].append(
+        {
+            "name": name,
+            "features": len(geoms),
+            "parts": int(shapely.get_num_geometries(geoms).sum()),
+            "vertices": int(shapely.get_num_coordinates(geoms).sum()),
+        }
+    )
+
+
+def reset_peak_rss():
+    #  Function to reset the peak resident set size of the process to its current size, so that the peak of the next
+    #  stage can be measured. This is only possible on Linux; elsewhere the peak of the process so far is reported.
+
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    #  Function to return the peak resident set size (in MB) of the process since it was last reset (see reset_peak_rss)
+
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    #  ru_maxrss is in kB on Linux, but in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 1024 ** 2 if sys.platform == "darwin" else maxrss / 1024
+
+
+def write_profile(profile, path):
+    #  Function to write a profile (see start_profile) to file, in JSON format, or in CSV format if the path ends in .csv
+    #  (one row per stage and per input geometry, with the columns given by PROFILE_COLUMNS)
+
+    if os.path.splitext(path)[1].lower() == ".csv":
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=PROFILE_COLUMNS)
+            writer.writeheader()
+            for kind in ["stages", "geometry"]:
+                for row in profile[kind]:
+                    writer.writerow(dict(row, kind="stage" if kind == "stages" else "geometry"))
+    else:
+        with open(path, "w") as f:
+            json.dump(profile, f, indent=1)
+
+
+@contextlib.contextmanager
+def sampling_profiler(path):
+    #  Context manager to run a sampling profiler over the enclosed code and write its report to a text file (or an
+    #  html file, if the path ends in .html). pyinstrument is used if it is installed; otherwise the deterministic
+    #  profiler in the standard library (cProfile) is used, and its statistics are written instead.
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is None:
+        import cProfile
+        import pstats
+
+        print("pyinstrument is not installed; using cProfile for ", path)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with open(path, "w") as f:
+                pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(50)
+        return
+
+    profiler = Profiler()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        with open(path, "w") as f:
+            if path.lower().endswith(".html"):
+                f.write(profiler.output_html())
+            else:
+                f.write(profiler.output_text(unicode=True))
@@ -0,0 +1,224 @@
+import json
+import os
+import time as timer
+from html import escape
+
+import numpy as np
+import geopandas as gpd
+import shapely
+
+from render_plots import DEFAULT_TOLERANCES
+
+#  Number of decimal places kept in the longitude/latitude coordinates (about 0.1 m)
+COORD_DECIMALS = 6
+
+#  Colours of the model contour levels, from lowest to highest (sampled from the viridis colour map)
+LEVEL_COLOURS = ["#440154", "#482878", "#3e4989", "#31688e", "#26828e", "#1f9e89", "#35b779", "#6ece58", "#b5de2b", "#fde725"]
+
+#  Size (in metres) of a map pixel at zoom level 0 in the web mercator projection used by Leaflet
+ZOOM0_PIXEL_SIZE = 156543.03392
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>%(title)s</title>
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>html, body, #map { height: 100%%; margin: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+var layers = %(layers)s;
+var map = L.map("map");
+L.tileLayer("https://tile.openstreetmap.org/{z}/{x}/{y}.png", {
+  maxZoom: 19, attribution: "&copy; OpenStreetMap contributors"
+}).addTo(map);
+var groups = [], overlays = {};
+layers.forEach(function (layer) {
+  var group = L.layerGroup().addTo(map);
+  groups.push({layer: layer, group: group, current: -1});
+  overlays[layer.name] = group;
+});
+L.control.layers(null, overlays, {collapsed: false}).addTo(map);
+var title = L.control({position: "bottomleft"});
+title.onAdd = function () {
+  var div = L.DomUtil.create("div");
+  div.style.background = "white"; div.style.padding = "4px";
+  div.innerHTML = %(titleJson)s;
+  return div;
+};
+title.addTo(map);
+function pickLevel(levels) {
+  //  Use the coarsest level of detail whose simplification tolerance is below the size of a pixel
+  var pixel = %(zoom0)s / Math.pow(2, map.getZoom());
+  for (var k = 0; k < levels.length; k++) {
+    if (levels[k].tolerance <= pixel) { return k; }
+  }
+  return levels.length - 1;
+}
+function update() {
+  groups.forEach(function (g) {
+    var k = pickLevel(g.layer.levels);
+    if (k === g.current) { return; }
+    g.group.clearLayers();
+    g.group.addLayer(L.geoJSON(g.layer.levels[k].geojson, {
+      style: function (feature) {
+        var colour = feature.properties.colour || g.layer.colour;
+        return {color: colour, fillColor: colour, weight: 2, fillOpacity: 0.4};
+      },
+      onEachFeature: function (feature, item) {
+        var text = g.layer.name;
+        if (feature.properties.contourlev !== undefined) { text += "<br>Level: " + feature.properties.contourlev; }
+        item.bindPopup(text);
+      }
+    }));
+    g.current = k;
+  });
+}
+map.on("zoomend", update);
+map.fitBounds(%(bounds)s);
+update();
+</script>
+</body>
+</html>
+"""
+
+
+def write_interactive_map(
+    filename,
+    oil,
+    model,
+    casename,
+    time,
+    overlap=None,
+    noOil=None,
+    tolerances=DEFAULT_TOLERANCES,
+):
+    #  Function to write an interactive (Leaflet) map of the observed oil, the model prediction and their overlap
+    #  to a single html file. The geometries are simplified (preserving topology) to several levels of detail and
+    #  embedded in the file as GeoJSON, and the map shows the coarsest level of detail that is finer than the size of
+    #  a pixel at the current zoom level, so that the file stays small and quick to display even for detailed
+    #  coastlines. The map can be produced for both satellite (polygons) and coastal (lines) validation.
+    #
+    #   Input arguments:
+    #
+    #   filename   - path of the html file to write
+    #   oil        - geodataframe containing the oil observations
+    #   model      - geodataframe containing the model prediction (coloured by contourlev, if present)
+    #   casename   - String to identify the case study (used in title heading)
+    #   time       - String to denote the validity time (used in title heading)
+    #   overlap    - geodataframe with geometry that defines the overlap between obs and model (None, or a dataframe
+    #                without geometry, to leave it out)
+    #   noOil      - geodataframe defining the observation region where no oil was detected (None if not available)
+    #   tolerances - list of simplification tolerances (in metres) of the levels of detail, from coarsest to finest.
+    #                A tolerance of 0 keeps the geometries unsimplified.
+    #
+    #   Output arguments:
+    #
+    #   size    - size of the html file written (in bytes)
+    #   seconds - time taken to write the file (in s)
+
+    start = timer.perf_counter()
+
+    tolerances = sorted(tolerances, reverse=True)
+
+    layers = []
+    if noOil is not None:
+        layers.append(map_layer("No oil detected", noOil, "#1f77b4", tolerances))
+    layers.append(map_layer("Predicted oil", model, LEVEL_COLOURS[0], tolerances))
+    layers.append(map_layer("Observed oil", oil, "#d62728", tolerances))
+    if overlap is not None and hasattr(overlap, "geometry") and not overlap.empty:
+        layers.append(map_layer("Overlap", overlap, "#ff7f0e", tolerances))
+
+    #  Zoom to the extent of the model and obs
+    bounds = np.array([model.to_crs("EPSG:4326").total_bounds, oil.to_crs("EPSG:4326").total_bounds])
+    #  (escaped, since the casename is taken from the properties of the GeoJSON files)
+    title = escape(str(casename) + ", valid at " + str(time))
+
+    html = HTML_TEMPLATE % {
+        "title": title,
+        "titleJson": json.dumps(title),
+        "layers": json.dumps(layers, separators=(",", ":")),
+        "zoom0": ZOOM0_PIXEL_SIZE,
+        "bounds": json.dumps(
+            [
+                [bounds[:, 1].min(), bounds[:, 0].min()],
+                [bounds[:, 3].max(), bounds[:, 2].max()],
+            ]
+        ),
+    }
+    with open(filename, "w") as f:
+        f.write(html)
+
+    size = os.path.getsize(filename)
+    seconds = timer.perf_counter() - start
+    print(
+        "Interactive map written to ",
+        filename,
+        " (size in kB : ",
+        round(size / 1024.0, 1),
+        ", time taken in s : ",
+        round(seconds, 3),
+        ")",
+    )
+
+    return size, seconds
+
+
+def map_layer(name, gdf, colour, tolerances):
+    #  Function to return a layer of the interactive map as a dictionary, with the GeoJSON feature collection of the
+    #  geodataframe at each level of detail. Model contour levels are each given their own colour.
+
+    #  Simplify in a projected crs, so that the tolerances are in metres
+    if gdf.crs is not None and gdf.crs.is_geographic:
+        gdf = gdf.to_crs("EPSG:3857")
+    geoms = np.asarray(gdf.geometry)
+
+    properties = [{} for i in range(len(gdf))]
+    if "contourlev" in gdf.columns:
+        levels = gdf["contourlev"].to_numpy()
+        unique = np.unique(levels)
+        for i, level in enumerate(levels):
+            rank = np.searchsorted(unique, level)
+            properties[i]["contourlev"] = level.item() if hasattr(level, "item") else level
+            if len(unique) > 1:
+                properties[i]["colour"] = LEVEL_COLOURS[
+                    int(round(rank * (len(LEVEL_COLOURS) - 1) / (len(unique) - 1)))
+                ]
+
+    levels = []
+    for tolerance in tolerances:
+        simple = shapely.simplify(geoms, tolerance, preserve_topology=True) if tolerance > 0 else geoms
+        levels.append(
+            {
+                "tolerance": tolerance,
+                "geojson": feature_collection(simple, gdf.crs, properties),
+            }
+        )
+
+    return {"name": name, "colour": colour, "levels": levels}
+
+
+def feature_collection(geoms, crs, properties):
+    #  Function to return an array of geometries as a GeoJSON feature collection (a dictionary) in longitude/latitude,
+    #  with the coordinates rounded to COORD_DECIMALS decimal places
+
+    geoms = np.asarray(gpd.GeoSeries(geoms, crs=crs).to_crs("EPSG:4326"))
+    geoms = shapely.transform(geoms, lambda coords: np.round(coords, COORD_DECIMALS))
+
+    features = []
+    for geom, props in zip(geoms, properties):
+        if geom is None or geom.is_empty:
+            continue
+        features.append(
+            {
+                "type": "Feature",
+                "properties": props,
+                "geometry": json.loads(shapely.to_geojson(geom)),
+            }
+        )
+
+    return {"type": "FeatureCollection", "features": features}
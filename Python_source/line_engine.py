@@ -0,0 +1,222 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from shapely.strtree import STRtree
+
+
+def calc_line_lengths(oil, model, no_oil, tolerance, keepGeometry=False):
+    #  Function to calculate the length of observed oiled coastline, the length of the model coastline contours
+    #  within the known observation region, and the length of coastline shared by the model and obs, by matching
+    #  the line segments of the model and obs directly rather than buffering them into polygons and overlaying.
+    #  A model segment is matched to an obs segment along the part of its length where the obs segment lies
+    #  within the tolerance of it (see match_segments), with the segments found using an STRtree spatial index.
+    #
+    #   Input arguments:
+    #
+    #   oil          - geodataframe containing the oiled coastline observations, in a projected crs and dissolved
+    #   model        - geodataframe containing the model coastline prediction (cut-outs, sorted by contourlev), in the same crs
+    #   no_oil       - geodataframe defining the observed coastline where no oil was detected, in the same crs
+    #                  (None if not available)
+    #   tolerance    - maximum distance (in metres) between model and obs coastlines for them to be matched
+    #   keepGeometry - If True, overlap is a geodataframe including the geometry of the matched parts of the model coastline
+    #
+    #   Output arguments:
+    #
+    #   oil         - updated oil geodataframe to include the observed coastline length (obs_length), in km
+    #   model_known - updated model geodataframe, containing the contour levels that lie within the known observation
+    #                 region, to include the length of each contour (contour_cutout_length) and the length enclosed by
+    #                 the contour level and above (length_full_contour) within the known observation region, in km
+    #   overlap     - new dataframe with one row per matched pair of model and obs geometries, with the same columns
+    #                 as calc_poly_overlap plus the length of the matched coastline (overlap_length), in km
+
+    model_segs, model_rows = line_segments(np.asarray(model.geometry))
+    oil_segs, oil_rows = line_segments(np.asarray(oil.geometry))
+
+    oil = oil.copy()
+    oil["obs_length"] = (
+        np.bincount(oil_rows, weights=segment_lengths(oil_segs), minlength=len(oil)) / 10 ** 3
+    )
+
+    #  Find the length of each model contour within the known observation region (if specified)
+    if no_oil is not None:
+        no_oil_segs, no_oil_rows = line_segments(np.asarray(no_oil.geometry))
+        known_segs = np.concatenate([oil_segs, no_oil_segs])
+        iseg, t0, t1 = match_segments(
+            model_segs, known_segs, np.zeros(len(known_segs), dtype=int), tolerance
+        )[:3]
+        cutout_length = np.bincount(
+            model_rows[iseg], weights=t1 - t0, minlength=len(model)
+        )
+    else:
+        cutout_length = np.bincount(
+            model_rows, weights=segment_lengths(model_segs), minlength=len(model)
+        )
+
+    #  As with a geopandas overlay, contour levels entirely outside the known observation region are dropped
+    keep = np.arange(len(model))
+    if no_oil is not None:
+        keep = keep[cutout_length > 0]
+    model_known = model.iloc[keep].copy()
+    model_known["contour_cutout_length"] = cutout_length[keep] / 10 ** 3
+    model_known["length_full_contour"] = model_known.loc[
+        ::-1, "contour_cutout_length"
+    ].cumsum()[::-1]
+
+    #  Match the model segments to the obs, and sum the matched lengths for each pair of model and obs rows
+    keepSegs = np.isin(model_rows, keep)
+    model_segs = model_segs[keepSegs]
+    model_rows = np.searchsorted(keep, model_rows[keepSegs])
+    iseg, t0, t1, iobs = match_segments(model_segs, oil_segs, oil_rows, tolerance)
+    pairs = pd.DataFrame(
+        {
+            "__idx1": model_rows[iseg],
+            "__idx2": iobs,
+            "overlap_length": (t1 - t0) / 10 ** 3,
+        }
+    )
+    if keepGeometry:
+        pairs["geometry"] = segment_pieces(model_segs[iseg], t0, t1)
+        pairs = gpd.GeoDataFrame(pairs, geometry="geometry", crs=oil.crs).dissolve(
+            by=["__idx1", "__idx2"], aggfunc="sum", as_index=False
+        )
+    else:
+        pairs = pairs.groupby(["__idx1", "__idx2"], as_index=False).sum()
+    pairs = pairs[pairs["overlap_length"] > 0]
+
+    #  Join the attributes of the model and obs rows, in the same way as geopandas overlay
+    df1 = pd.DataFrame(model_known.drop(columns=model_known.geometry.name))
+    df2 = pd.DataFrame(oil.drop(columns=oil.geometry.name))
+    overlap = pairs.merge(df1.reset_index(drop=True), left_on="__idx1", right_index=True)
+    overlap = overlap.merge(
+        df2.reset_index(drop=True),
+        left_on="__idx2",
+        right_index=True,
+        suffixes=("_1", "_2"),
+    )
+    overlap["overlap_length"] = overlap.pop("overlap_length")
+    if keepGeometry:
+        overlap["geometry"] = overlap.pop("geometry")
+    overlap.drop(["__idx1", "__idx2"], axis=1, inplace=True)
+    overlap.reset_index(drop=True, inplace=True)
+
+    return oil, model_known, overlap
+
+
+def line_segments(geoms):
+    #  Function to split an array of (multi)linestrings into their individual straight line segments
+    #
+    #   Input arguments:
+    #
+    #   geoms - array of LineString/MultiLineString geometries
+    #
+    #   Output arguments:
+    #
+    #   segs - array (nsegs by 4) of the segment end points (x0, y0, x1, y1)
+    #   rows - index into geoms of the geometry each segment belongs to
+
+    parts, rows = shapely.get_parts(geoms, return_index=True)
+    coords, ipart = shapely.get_coordinates(parts, return_index=True)
+
+    #  Consecutive points of the same part form a segment
+    same = ipart[1:] == ipart[:-1]
+    segs = np.hstack([coords[:-1][same], coords[1:][same]])
+
+    return segs, rows[ipart[:-1][same]]
+
+
+def segment_lengths(segs):
+    #  Function to return the lengths of an array of line segments (see line_segments)
+
+    return np.hypot(segs[:, 2] - segs[:, 0], segs[:, 3] - segs[:, 1])
+
+
+def match_segments(segs, otherSegs, otherRows, tolerance):
+    #  Function to find the parts of a set of line segments that are matched by a second set of segments.
+    #  Each segment AB is matched by a segment CD of the other set along the part of AB onto which the part of CD
+    #  lying within the tolerance (perpendicular distance) of the line through AB projects. The candidate pairs of
+    #  segments are found with an STRtree spatial index. Where several segments of the same row of the other set
+    #  match a segment, the union of the matched parts is taken, so that no length is counted twice.
+    #
+    #   Input arguments:
+    #
+    #   segs      - array (n by 4) of the segments to be matched (see line_segments)
+    #   otherSegs - array (m by 4) of the segments to match them against
+    #   otherRows - row (e.g. geodataframe row) of each of otherSegs. The matched parts are found separately for each row.
+    #   tolerance - maximum distance between the matched segments
+    #
+    #   Output arguments:
+    #
+    #   iseg - index into segs of the segment of each matched part
+    #   t0   - distance along the segment at which the matched part starts
+    #   t1   - distance along the segment at which the matched part ends
+    #   rows - row of the other set of segments matched
+
+    empty = np.zeros(0)
+    if len(segs) == 0 or len(otherSegs) == 0:
+        return empty.astype(int), empty, empty, empty.astype(int)
+
+    lines = shapely.linestrings(segs.reshape(-1, 2, 2))
+    tree = STRtree(shapely.linestrings(otherSegs.reshape(-1, 2, 2)))
+    iseg, iother = tree.query(lines, predicate="dwithin", distance=tolerance)
+
+    #  Work in the frame of each segment AB, with t the distance along AB and n the perpendicular distance from it
+    a = segs[iseg, :2]
+    length = segment_lengths(segs)[iseg]
+    valid = length > 0
+    a, length, iseg, iother = a[valid], length[valid], iseg[valid], iother[valid]
+    u = (segs[iseg, 2:] - a) / length[:, None]
+    c = otherSegs[iother, :2] - a
+    d = otherSegs[iother, 2:] - a
+    tc = c[:, 0] * u[:, 0] + c[:, 1] * u[:, 1]
+    td = d[:, 0] * u[:, 0] + d[:, 1] * u[:, 1]
+    nc = u[:, 0] * c[:, 1] - u[:, 1] * c[:, 0]
+    nd = u[:, 0] * d[:, 1] - u[:, 1] * d[:, 0]
+
+    #  Orient CD so that t increases from C to D
+    swap = td < tc
+    tc, td = np.where(swap, td, tc), np.where(swap, tc, td)
+    nc, nd = np.where(swap, nd, nc), np.where(swap, nc, nd)
+
+    #  n varies linearly with t along CD, so find the range of t over which CD lies within the tolerance of AB.
+    #  (Segments of CD perpendicular to AB project onto a single point and so do not contribute any length.)
+    span = td - tc
+    slope = np.divide(nd - nc, span, out=np.zeros_like(span), where=span > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ta = tc + (-tolerance - nc) / slope
+        tb = tc + (tolerance - nc) / slope
+    flat = slope == 0
+    inside = np.abs(nc) <= tolerance
+    lo = np.where(flat, np.where(inside, tc, np.inf), np.minimum(ta, tb))
+    hi = np.where(flat, np.where(inside, td, -np.inf), np.maximum(ta, tb))
+
+    #  Restrict to the parts of CD, and of AB
+    t0 = np.maximum.reduce([lo, tc, np.zeros_like(tc)])
+    t1 = np.minimum.reduce([hi, td, length])
+    matched = t1 > t0
+    iseg, rows, t0, t1 = iseg[matched], otherRows[iother[matched]], t0[matched], t1[matched]
+    if len(iseg) == 0:
+        return iseg, t0, t1, rows
+
+    #  Merge the overlapping parts matched on each segment by the same row
+    order = np.lexsort((t0, rows, iseg))
+    iseg, rows, t0, t1 = iseg[order], rows[order], t0[order], t1[order]
+    group = np.concatenate([[True], (iseg[1:] != iseg[:-1]) | (rows[1:] != rows[:-1])])
+    reach = pd.Series(t1).groupby(np.cumsum(group)).cummax().to_numpy()
+    start = np.concatenate([[True], group[1:] | (t0[1:] > reach[:-1])])
+    merged = np.cumsum(start) - 1
+    t1 = pd.Series(t1).groupby(merged).max().to_numpy()
+    iseg, rows, t0 = iseg[start], rows[start], t0[start]
+
+    return iseg, t0, t1, rows
+
+
+def segment_pieces(segs, t0, t1):
+    #  Function to return the parts of an array of line segments between distances t0 and t1 along them, as LineStrings
+
+    length = segment_lengths(segs)[:, None]
+    a = segs[:, :2]
+    u = (segs[:, 2:] - a) / length
+    coords = np.stack([a + u * t0[:, None], a + u * t1[:, None]], axis=1)
+
+    return shapely.linestrings(coords)
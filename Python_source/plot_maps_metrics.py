@@ -337,3 +337,59 @@ def plot_coastal_maps(oil, model, casename, time, outputtype, noOil=None, levels
     ax.set_ylabel("Degrees Latitude", size=12)
 
     return modelplot, ax
+
+
+def plot_2D_MOE_trajectory(results, casename, outputtype):
+    #  Function to plot the results of the 2-D Measure of Effectiveness metric for a series of validation times on a
+    #  single scatter plot, showing how the skill of the model evolves with time. Points are coloured by validation
+    #  time and, for each contour level, the points are joined in time order
+    #
+    #   Input arguments:
+    #
+    #   results    - Pandas DataFrame with one row per validation time and contour level, with columns time,
+    #                contourlev, x and y (as produced by time_series_validation.py)
+    #   casename   - String to denote the name of case study (used in plot title)
+    #   outputtype - String to denote type of model output, either 'BE' or 'Prob'
+    #
+    #   Output arguments:
+    #
+    #   MOEfig - figure handle
+
+    MOEfig, ax1 = plot.subplots(1, figsize=(8, 8))
+
+    times = sorted(results["time"].astype(str).unique())
+    cmap = plot.cm.plasma
+    colours = {t: cmap(i / max(len(times) - 1, 1)) for i, t in enumerate(times)}
+
+    levels = sorted(results["contourlev"].unique())
+    for level in levels:
+        rows = results[results["contourlev"] == level].copy()
+        rows["time"] = rows["time"].astype(str)
+        rows = rows.sort_values(by="time")
+        ax1.plot(rows["x"], rows["y"], color="gray", linewidth=1.0)
+        ax1.scatter(
+            rows["x"],
+            rows["y"],
+            c=[colours[t] for t in rows["time"]],
+            s=100,
+            zorder=3,
+        )
+
+    #  Add a legend entry for each validation time
+    for t in times:
+        ax1.scatter([], [], color=colours[t], s=100, label=t)
+
+    ax1.set_xlim(0, 1)
+    ax1.set_ylim(0, 1)
+    ax1.plot([0, 1], [0, 1], color="red", linestyle="dashed")
+    if outputtype == "Prob":
+        #  Each line joins the points of one probability level
+        title = "2-D MOE space diagram (one line per probability level)\n"
+    else:
+        title = "2-D MOE space diagram\n"
+    ax1.set_title(title + str(casename) + ", " + str(len(times)) + " validation times")
+    ax1.set_xlabel("$x ( = A_{ov}/A_{ob})$", size=12)
+    ax1.set_ylabel("$y ( = A_{ov}/A_{pr})$", size=12)
+    ax1.legend(loc="upper left", fontsize=8)
+
+    return MOEfig
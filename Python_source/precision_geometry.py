@@ -0,0 +1,116 @@
+import numpy as np
+import shapely
+
+from simplify_geometry import geometry_measure
+
+
+def snap_to_grid(gdf, gridSize):
+    #  Function to snap the vertices of the geometries of a geodataframe to a grid of the given size (fixed-precision
+    #  geometry), so that near-coincident vertices (e.g. of neighbouring contours, or of the obs and model) become
+    #  coincident. The snapped geometries are made valid: shapely.set_precision removes collapsed rings and
+    #  self-intersections it creates, and any geometry still invalid is repaired with shapely.make_valid, keeping
+    #  only the parts with the dimension of the original geometry (e.g. the polygons of a polygonal geometry).
+    #  Geometries that collapse entirely (smaller than the grid) become empty.
+    #
+    #   Input arguments:
+    #
+    #   gdf      - geodataframe to be snapped, in a projected crs
+    #   gridSize - size of the grid in the units of the crs (e.g. 1 for 1 m)
+    #
+    #   Output arguments:
+    #
+    #   gdf   - copy of the geodataframe with the snapped geometries
+    #   stats - dictionary with the largest relative change in area (or length, for linear geometries) of any geometry (drift),
+    #           the number of geometries repaired with make_valid (repaired) and the number of vertices before and after
+    #           (vertices_in, vertices_out)
+
+    geoms = np.asarray(gdf.geometry)
+    measure = geometry_measure(geoms)
+    dimension = shapely.get_dimensions(geoms)
+
+    snapped = shapely.set_precision(geoms, gridSize)
+
+    invalid = ~shapely.is_valid(snapped)
+    for i in np.flatnonzero(invalid):
+        snapped[i] = keep_dimension(shapely.make_valid(snapped[i]), dimension[i])
+
+    gdf = gdf.copy()
+    gdf[gdf.geometry.name] = snapped
+
+    valid = measure > 0
+    drift = 0.0
+    if valid.any():
+        drift = float(np.max(np.abs(geometry_measure(snapped)[valid] - measure[valid]) / measure[valid]))
+
+    stats = {
+        "drift": drift,
+        "repaired": int(invalid.sum()),
+        "vertices_in": int(shapely.get_num_coordinates(geoms).sum()),
+        "vertices_out": int(shapely.get_num_coordinates(snapped).sum()),
+    }
+
+    return gdf, stats
+
+
+def keep_dimension(geom, dimension):
+    #  Function to return the parts of a geometry (e.g. a geometry collection returned by make_valid) with the
+    #  given dimension (2 for polygons, 1 for lines), combined into a single (multi-part) geometry
+
+    parts = shapely.get_parts(geom)
+    parts = parts[shapely.get_dimensions(parts) == dimension]
+    if len(parts) == 0:
+        return shapely.Polygon() if dimension == 2 else shapely.LineString()
+
+    return shapely.union_all(parts)
+
+
+def snap_inputs(oil, model, no_oil, gridSize, crs):
+    #  Function to convert the obs, model and no oil geodataframes to the given crs and snap them to a grid of the
+    #  given size ahead of calc_poly_overlap (see snap_to_grid), so that the dissolve and overlay operate on
+    #  fixed-precision inputs, and print a summary of the change to each. Only the inputs are snapped: the dissolve and
+    #  overlay themselves run at full precision, so their results (e.g. the overlap geometry) are not on the grid.
+    #
+    #   Input arguments:
+    #
+    #   oil      - geodataframe containing the oil observations
+    #   model    - geodataframe containing the model prediction
+    #   no_oil   - geodataframe defining the observation region where no oil was detected (None if not available)
+    #   gridSize - size of the grid in metres (in the units of crs)
+    #   crs      - Integer specifying the (projected) coordinate reference system to convert the data to
+    #
+    #   Output arguments:
+    #
+    #   oil, model, no_oil - geodataframes in crs, snapped to the grid
+    #   stats              - dictionary with the largest relative change in area (or length) of any geometry (precision_drift),
+    #                        and the number of geometries repaired after snapping (precision_repaired)
+
+    from process_data import project_dissolve
+
+    maxDrift, repaired = 0.0, 0
+    snapped = []
+    for name, gdf in [("obs", oil), ("model", model), ("no oil", no_oil)]:
+        if gdf is None:
+            snapped.append(None)
+            continue
+        gdf, stats = snap_to_grid(project_dissolve(gdf, crs, None), gridSize)
+        print(
+            "Snapped ",
+            name,
+            " geometries to a grid of ",
+            gridSize,
+            ": vertices ",
+            stats["vertices_in"],
+            " -> ",
+            stats["vertices_out"],
+            ", relative area/length change ",
+            stats["drift"],
+            ", geometries repaired ",
+            stats["repaired"],
+        )
+        maxDrift = max(maxDrift, stats["drift"])
+        repaired += stats["repaired"]
+        snapped.append(gdf)
+
+    stats = {"precision_drift": maxDrift, "precision_repaired": repaired}
+
+    return snapped[0], snapped[1], snapped[2], stats
@@ -1,12 +1,52 @@
+import hashlib
 import os
+import numpy as np
 import pandas as pd
 import geopandas as gpd
+import shapely
+from shapely.strtree import STRtree
 import warnings
+from coord_arrays import polygon_areas
+from geometry_cache import DEFAULT_CACHE_SIZE, load_geometry
+from instrumentation import record_geometry, stage
 
-warnings.filterwarnings("ignore", category=FutureWarning)
+#  The optional engines and readers (raster_engine, line_engine and geojson_reader) are only imported when selected
 
+warnings.filterwarnings("ignore", category=FutureWarning)
 
-def read_geojson(obsFile, modelFile, noOilFile, modelType, valType, crs):
+#  Methods available to read the GeoJSON files (see read_geofile)
+READERS = ["gdal", "fast", "stream"]
+
+#  Methods available to calculate the overlap areas (see calc_poly_overlap)
+ENGINES = ["index", "overlay", "raster", "line", "tiled"]
+
+#  Maximum number of known observation regions kept in memory, and the regions themselves (see known_region)
+KNOWN_REGION_CACHE_SIZE = 8
+KNOWN_REGION_CACHE = {}
+
+#  Default width (in metres) of the buffer placed around coastlines, and matching tolerance of the 'line' engine
+DEFAULT_BUFWIDTH = 5
+
+#  Columns of the overlap dataframe holding the observed, predicted and overlap quantities passed to calc_2DMOE.
+#  These are areas (in km^2), except for the 'line' engine, which calculates coastline lengths (in km).
+MOE_COLUMNS = {
+    "area": ("obs_area", "area_full_contour", "overlap_full_contour"),
+    "length": ("obs_length", "length_full_contour", "overlap_full_contour_length"),
+}
+
+
+def read_geojson(
+    obsFile,
+    modelFile,
+    noOilFile,
+    modelType,
+    valType,
+    crs,
+    cacheDir=None,
+    cacheSize=DEFAULT_CACHE_SIZE,
+    reader="gdal",
+    store=None,
+):
     #  Function to read in geojson files, perform validity checks and return
     #  the data as geopandas geodataframes ready for further processing.
     #
@@ -18,12 +58,19 @@ def read_geojson(obsFile, modelFile, noOilFile, modelType, valType, crs):
     #   modelType - Model output type. Either 'BE' for best estimate, or 'Prob' for probabilistic
     #   valType   - Type of obs data to validate against, either 'Satellite' or 'Coastal'
     #   crs       - Integer specifying the coordinate reference system to convert the data to.
+    #   cacheDir  - Optional directory of the geometry cache. If specified, the obs files are read from the cache
+    #               (or added to it), already converted to crs and dissolved (see geometry_cache.py)
+    #   cacheSize - Maximum size (in bytes) of the geometry cache
+    #   reader    - Method used to read the GeoJSON files: 'gdal' (default) to use geopandas read_file, or
+    #               'fast' or 'stream' to use the reader in geojson_reader.py (see read_geofile)
+    #   store     - Optional dictionary in which the obs geodataframes are kept in memory, converted to crs and dissolved,
+    #               so that repeat calls with the same obs files (e.g. for a series of validation times) reuse them
     #
     #   Output arguments are:
     #
-    #   oil      - geodataframe containing the oil observations
+    #   oil      - geodataframe containing the oil observations (in crs and dissolved, if read via the cache or store)
     #   model    - geodataframe containing the model prediction
-    #   no_oil   - geodataframe defining the observation region where no oil was detected
+    #   no_oil   - geodataframe defining the observation region where no oil was detected (in crs and dissolved, if read via the cache or store)
     #   casename - Name of case study, as determined from dataframe header
     #   time     - Validity time of case study, determined from dataframe header
     #   plevs    - Contour/probability levels, used to create colorbar label when plotting
@@ -43,31 +90,101 @@ def read_geojson(obsFile, modelFile, noOilFile, modelType, valType, crs):
     if noOilFile is not None:
         assert os.path.exists(noOilFile), "noOilFile does not exist"
 
+    assert reader in READERS, "Invalid reader argument"
+
     #####
 
     ##### READ IN THE INPUT GEOJSON FILES AND CHECK CONTENTS
 
-    #  Read the oil obs file first
-    oil = gpd.read_file(obsFile, driver="geojson")
-    print("obsFile has been read in as ", type(oil))
+    with stage("read"):
+        #  Read the oil obs file first
+        oil = read_obs(obsFile, crs, cacheDir, cacheSize, reader, store)
+        print("obsFile has been read in as ", type(oil))
+
+        #  Read the no oil file, if specified
+        if noOilFile is not None:
+            no_oil = read_obs(noOilFile, crs, cacheDir, cacheSize, reader, store)
+            print("noOilFile has been read in as ", type(no_oil))
+        else:
+            no_oil = None
 
-    #  Now read model geojson file
-    model = gpd.read_file(modelFile, driver="geojson")
-    print("modelFile has been read in as ", type(model))
+        #  Now read model file. If there is a no oil file, any model output outside the observation scene is excluded
+        #  later, so for formats that support it only the model features within the bounds of the scene are read
+        model = read_geofile(modelFile, reader, scene_bbox(oil, no_oil) if no_oil is not None else None)
+        print("modelFile has been read in as ", type(model))
 
-    #  Read the no oil file, if specified
-    if noOilFile is not None:
-        no_oil = gpd.read_file(noOilFile, driver="geojson")
-        print("noOilFile has been read in as ", type(no_oil))
-    else:
-        no_oil = None
+    #  Check the contents of the geodataframes and prepare them for further processing
+    oil, model, no_oil, casename, time, plevs = prepare_inputs(
+        oil, model, no_oil, modelType, valType
+    )
+
+    #####
+
+    return oil, model, no_oil, casename, time, plevs
+
+
+def prepare_inputs(oil, model, no_oil, modelType, valType):
+    #  Function to perform the validity checks of read_geojson on geodataframes that are already in memory
+    #  (e.g. read from file by read_geojson, or produced directly by a model) and return them ready for further processing.
+    #  No files are read or written.
+    #
+    #   Input arguments:
+    #
+    #   oil       - geodataframe containing the oil observations
+    #   model     - geodataframe containing the model prediction
+    #   no_oil    - geodataframe defining the observation region where no oil was detected (None if not available)
+    #   modelType - Model output type. Either 'BE' for best estimate, or 'Prob' for probabilistic
+    #   valType   - Type of obs data to validate against, either 'Satellite' or 'Coastal'
+    #
+    #   Output arguments:
+    #
+    #   oil, model, no_oil, casename, time, plevs - as returned by read_geojson
+
+    assert modelType == "BE" or modelType == "Prob", "Invalid modelType argument"
+    assert valType == "Satellite" or valType == "Coastal", "Invalid valType argument"
 
     #  Check geometries contain correct data types
     check_geom_types(oil, valType)
-    check_geom_types(model, valType)
-    if noOilFile is not None:
+    if no_oil is not None:
         check_geom_types(no_oil, valType)
 
+    #  Find out how many rows of data there are in the geodataframes
+    print("Number of levels in obsFile : ", len(oil["geometry"]))
+    if no_oil is not None:
+        print("Number of levels in noOilFile : ", len(no_oil["geometry"]))
+
+    #  Record the size of the inputs in the profile of the run, if one is being recorded (see instrumentation.py)
+    record_geometry("obs", oil)
+    record_geometry("model", model)
+    record_geometry("no oil", no_oil)
+
+    #  Check the model data and prepare it for further processing
+    model, casename, time, plevs = prepare_model(model, modelType, valType)
+
+    return oil, model, no_oil, casename, time, plevs
+
+
+def prepare_model(model, modelType, valType):
+    #  Function to check the contents of a model geodataframe (as read from a model prediction file) and prepare it for
+    #  further processing, by sorting it by contour level. This is the part of read_geojson that applies to the model,
+    #  separated from the reading of the files so that it can be used for model data from other sources (e.g. ensembles).
+    #
+    #   Input arguments:
+    #
+    #   model     - geodataframe containing the model prediction
+    #   modelType - Model output type. Either 'BE' for best estimate, or 'Prob' for probabilistic
+    #   valType   - Type of obs data to validate against, either 'Satellite' or 'Coastal'
+    #
+    #   Output arguments:
+    #
+    #   model    - geodataframe containing the model prediction, sorted by contour level (column contourlev)
+    #   casename - Name of case study, as determined from dataframe header
+    #   time     - Validity time of case study, determined from dataframe header
+    #   plevs    - Contour/probability levels, used to create colorbar label when plotting
+
+    #  Check geometries contain correct data types
+    check_geom_types(model, valType)
+
     if modelType == "BE":
         #  BE output should have no more than 5 thickness levels based on the Bonn agreement oil appearance code
         #  See https://odnature.naturalsciences.be/mumm/en/national/ba-oil-appearance-code
@@ -77,11 +194,7 @@ def read_geojson(obsFile, modelFile, noOilFile, modelType, valType, crs):
             + ")"
         )
 
-    #  Find out how many rows of data there are in the geodataframes
-    print("Number of levels in obsFile : ", len(oil["geometry"]))
     print("Number of levels in modelFile : ", len(model["geometry"]))
-    if noOilFile is not None:
-        print("Number of levels in noOilFile : ", len(no_oil["geometry"]))
 
     #  Obtain test case name and validity time (used later for plot labelling)
     if "test-case" in model.columns:
@@ -101,13 +214,25 @@ def read_geojson(obsFile, modelFile, noOilFile, modelType, valType, crs):
     model.rename(columns={"level": "contourlev"}, inplace=True)
     plevs = (model.contourlev).to_numpy()
 
-    #####
-
-    return oil, model, no_oil, casename, time, plevs
+    return model, casename, time, plevs
 
 
 def calc_poly_overlap(
-    oil, model, no_oil, casename, time, noOilFile, modelType, valType, crs
+    oil,
+    model,
+    no_oil,
+    casename,
+    time,
+    noOilFile,
+    modelType,
+    valType,
+    crs,
+    engine="index",
+    keepGeometry=True,
+    resolution=None,
+    bufwidth=DEFAULT_BUFWIDTH,
+    tileVertices=None,
+    workers=None,
 ):
     #  Function to read in geodataframes and update them to include new geoseries representing the observed oil
     #  spill area, the predicted oil spill area, and the overlap area. Note this function assumes
@@ -125,72 +250,136 @@ def calc_poly_overlap(
     #   modelType - Model output type. Either 'BE' for best estimate, or 'Prob' for probabilistic
     #   valType   - Type of obs data to validate against, either 'Satellite' or 'Coastal'
     #   crs       - Integer specifying the coordinate reference system to convert the data to.
+    #   engine    - Method used to calculate the overlap areas. Either 'overlay', which uses geopandas overlay,
+    #               'index' (default), which only calculates the overlap areas (see calc_overlap_areas), or
+    #               'raster', which calculates approximate areas on a grid (see raster_engine.py; Satellite only), or
+    #               'line', which matches the model and obs coastlines directly (see line_engine.py; Coastal only), or
+    #               'tiled', which splits the domain into tiles and sums the areas calculated in each tile on a pool of
+    #               worker processes (see tile_engine.py)
+    #   keepGeometry - If True (default), the overlap geodataframe includes the geometry of the overlap regions,
+    #                  as needed for plotting maps. This always uses geopandas overlay for the 'index' engine.
+    #   resolution   - Width of the grid cells in metres for the 'raster' engine (None to choose automatically)
+    #   bufwidth     - Width in metres of the buffer placed around the coastlines for Coastal validation, to convert
+    #                  them to polygons. For the 'line' engine, the coastlines are not buffered, and bufwidth is
+    #                  instead the maximum distance between the model and obs coastlines for them to be matched.
+    #   tileVertices - Largest number of vertices in a tile for the 'tiled' engine (None for the default)
+    #   workers      - Number of worker processes for the 'tiled' engine (None for one per tile, up to the number of CPUs)
     #
     #   Output arguments:
     #
     #   oil         - updated oil geodataframe to include polygon area (in km^2)
     #   model_known - updated model geodataframe to include polygon area (in km^2)
-    #   overlap     - new geodataframe containing the overlap area between observed oil and model prediction (in km^2)
+    #   overlap     - new geodataframe containing the overlap area between observed oil and model prediction (in km^2).
+    #                 If keepGeometry is False and engine is 'index' or 'raster', this is a dataframe without a geometry column.
+    #                 For the 'raster' engine, the oil, model_known and overlap dataframes also include estimates of the
+    #                 discretisation error of the areas (obs_area_error, area_full_contour_error, overlap_full_contour_error)
+    #                 For the 'line' engine, the areas are replaced by coastline lengths (in km; see MOE_COLUMNS)
+    #                 For the 'tiled' engine, model_known also includes the centroid of each contour within the known
+    #                 observation region (centroid_x, centroid_y), as its geometry is only clipped if keepGeometry is True
     #   plevs       - Contour/probability levels, used to create colorbar label when plotting
     #
     #  C. Dearden, March 2020
 
-    #  Convert coordinate reference system according to value of crs
-    oil = oil.to_crs({"init": "epsg:" + str(crs)})
-    model = model.to_crs({"init": "epsg:" + str(crs)})
-    if noOilFile is not None:
-        no_oil = no_oil.to_crs({"init": "epsg:" + str(crs)})
+    assert engine in ENGINES, "Invalid engine argument"
+    assert engine != "raster" or valType == "Satellite", "raster engine requires Satellite valType"
+    assert engine != "line" or valType == "Coastal", "line engine requires Coastal valType"
 
-    if modelType == "BE":
-        #  Dissolve contour levels for BE case into a single geometry
-        #  This is only necessary for the BE case, since for Prob we want to keep the
-        #  contour levels as separate geometries
-        if "name" in model.columns:
-            model = model.dissolve(by="name")
-        elif "test-case" in model.columns:
-            model = model.dissolve(by="test-case")
-        else:
-            model[
-                "dummy"
-            ] = "dummy"  #  Last resort; introduce dummy column to dissolve geometries
-            model = model.dissolve(by="dummy")
+    #  The time, CPU time and peak memory of each stage are recorded in the profile of the run, if one is being
+    #  recorded (see instrumentation.py)
 
-    #  Do the same for observations for completeness
-    oil = oil.dissolve(by="test-case")
+    #  Convert coordinate reference system according to value of crs
+    with stage("reproject"):
+        oil = project_dissolve(oil, crs, None)
+        model = model.to_crs({"init": "epsg:" + str(crs)})
+        if noOilFile is not None:
+            no_oil = project_dissolve(no_oil, crs, None)
 
-    #  And again for the no_oil obs (if specified)
-    if noOilFile is not None:
-        no_oil = no_oil.dissolve(by="test-case")
+    #  Dissolve the observations (and no_oil obs, if specified) by test case, for completeness
+    #  (obs read from the cache or in-memory store have been dissolved already)
+    with stage("dissolve"):
+        oil = project_dissolve(oil, crs, "test-case")
+        if noOilFile is not None:
+            no_oil = project_dissolve(no_oil, crs, "test-case")
+
+        if modelType == "BE":
+            model = dissolve_levels(model)
+
+    if engine == "line":
+        #  Match the model and obs coastlines directly, rather than buffering them
+        from line_engine import calc_line_lengths
+
+        with stage("overlay"):
+            oil, model_known, overlap = calc_line_lengths(
+                oil,
+                model.sort_values(by="contourlev"),
+                no_oil if noOilFile is not None else None,
+                bufwidth,
+                keepGeometry,
+            )
+        plevs = (model_known.contourlev).to_numpy()
+        overlap["overlap_full_contour_length"] = overlap.loc[
+            ::-1, "overlap_length"
+        ].cumsum()[::-1]
+        return oil, model_known, overlap, plevs
 
     if valType == "Coastal":
         #  To calculate the overlap between predicted and observed coastlines, first the linestrings
         #  need to be converted to polygons, so they are compatible with the overlay function
         #  The conversion to polygons is achieved using the geopandas 'buffer' function
-        bufwidth = 5  #  Width of polygon in metres
-        oil["geometry"] = oil.geometry.buffer(bufwidth)
-        model["geometry"] = model.geometry.buffer(bufwidth)
-        if noOilFile is not None:
-            no_oil["geometry"] = no_oil.geometry.buffer(bufwidth)
+        #  (on copies, so that the coastlines passed in are not modified, e.g. for plotting the coastal maps)
+        with stage("coastal buffer"):
+            oil = oil.copy()
+            oil["geometry"] = oil.geometry.buffer(bufwidth)
+            model = model.copy()
+            model["geometry"] = model.geometry.buffer(bufwidth)
+            if noOilFile is not None:
+                no_oil = no_oil.copy()
+                no_oil["geometry"] = no_oil.geometry.buffer(bufwidth)
+
+    if engine == "raster":
+        #  Calculate the areas approximately on a grid, rather than clipping and overlaying the geometries
+        from raster_engine import calc_raster_areas
+
+        with stage("overlay"):
+            oil, model_known, overlap = calc_raster_areas(
+                oil,
+                model.sort_values(by="contourlev"),
+                no_oil if noOilFile is not None else None,
+                resolution,
+                keepGeometry,
+            )
+        plevs = (model_known.contourlev).to_numpy()
+        overlap["overlap_full_contour"] = overlap.loc[::-1, "overlap_area"].cumsum()[::-1]
+        return oil, model_known, overlap, plevs
+
+    if engine == "tiled":
+        #  Split the domain into tiles, and sum the areas calculated within each tile in parallel
+        from tile_engine import DEFAULT_TILE_VERTICES, calc_tiled_areas
+
+        with stage("overlay"):
+            oil, model_known, overlap = calc_tiled_areas(
+                oil,
+                model.sort_values(by="contourlev"),
+                no_oil if noOilFile is not None else None,
+                tileVertices or DEFAULT_TILE_VERTICES,
+                workers,
+                keepGeometry,
+            )
+        plevs = (model_known.contourlev).to_numpy()
+        overlap["overlap_full_contour"] = overlap.loc[::-1, "overlap_area"].cumsum()[::-1]
+        return oil, model_known, overlap, plevs
 
     #  Before we go any further, we need to check if noOilFile has been specified, and if so,
     #  we use this to exclude any model data that lies outside the known detection limit of the observations
     if noOilFile is not None:
-        #  Combine the oil and no_oil geodataframes into a single geodataframe
-        df_list = [oil, no_oil]
-        obs_combined = gpd.GeoDataFrame(pd.concat(df_list, sort=True))
-        #  Dissolve the combined obs into a single multipolygon
-        obs_combined = obs_combined.dissolve(by="test-case")
-        obs_combined["data"] = "Known observation region"
-        obs_combined.drop(
-            "level", axis=1, inplace=True
-        )  #  remove redundant level column
-        obs_combined.crs = {"init": "epsg:" + str(crs)}
-        #  Use overlay to clip the model prediction according to the bounds of the observations
-        model_known = gpd.overlay(model, obs_combined, how="intersection", keep_geom_type=False)
+        #  Clip the model prediction to the known observation region, i.e. the union of the oil and no_oil obs
+        #  (which is built once for each set of obs, and kept for later model runs; see known_region)
+        with stage("no oil clip"):
+            model_known = clip_to_region(model, known_region(oil, no_oil))
     else:
         model_known = model
 
-    #  Sort again to ensure correct order after use of overlay
+    #  Sort again to ensure correct order after clipping
     model_known = model_known.sort_values(by="contourlev")
     plevs = (model_known.contourlev).to_numpy()
 
@@ -198,32 +387,356 @@ def calc_poly_overlap(
 
     ##### USE GEOPANDAS FUNCTIONS TO CALCULATE OIL AREAS AND THE OVERLAP BETWEEN OBS AND MODEL
 
-    #  Now calculate the area (in km^2) of each model contour and add as a new GeoSeries (column)
-    model_known["contour_cutout_area"] = model_known["geometry"].area / 10 ** 6
+    with stage("overlay"):
+        #  Now calculate the area (in km^2) of each model contour and add as a new GeoSeries (column)
+        #  (the areas are calculated from the coordinate arrays of the geometries; see coord_arrays.py)
+        model_known["contour_cutout_area"] = polygon_areas(model_known["geometry"]) / 10 ** 6
+
+        #  Calculate the full area enclosed by each contour level
+        #  This is necessary since the contours are saved as cut-outs
+        #  NB - this has a null effect for BE cases, since we have already dissolved the thickness contours
+        #  into a single full area contour. But it is necessary for Prob cases where we require the full area
+        #  enclosed by each individual probability level
+        model_known["area_full_contour"] = model_known.loc[
+            ::-1, "contour_cutout_area"
+        ].cumsum()[::-1]
+
+        #  Now add a new GeoSeries (column) to the oil dataframe containing the area of the multipolygon in km^2
+        oil["obs_area"] = polygon_areas(oil["geometry"]) / 10 ** 6
+
+        #  Create a new geodataframe containing the overlap between predicted and observed oil
+        #  For probabilistic output, this will calculate the area of overlap for each prob level individually
+        #  The full overlay is only needed if the geometry of the overlap is wanted (e.g. for plotting)
+        if engine == "overlay" or keepGeometry:
+            overlap = gpd.overlay(model_known, oil, how="intersection", keep_geom_type=False)
+            overlap["overlap_area"] = polygon_areas(overlap["geometry"]) / 10 ** 6
+        else:
+            overlap = calc_overlap_areas(model_known, oil)
 
-    #  Calculate the full area enclosed by each contour level
-    #  This is necessary since the contours are saved as cut-outs
-    #  NB - this has a null effect for BE cases, since we have already dissolved the thickness contours
-    #  into a single full area contour. But it is necessary for Prob cases where we require the full area
-    #  enclosed by each individual probability level
-    model_known["area_full_contour"] = model_known.loc[
-        ::-1, "contour_cutout_area"
-    ].cumsum()[::-1]
+        #  For each contour level, calculate the full area of overlap with obs
+        overlap["overlap_full_contour"] = overlap.loc[::-1, "overlap_area"].cumsum()[::-1]
 
-    #  Now add a new GeoSeries (column) to the oil dataframe containing the area of the multipolygon in km^2
-    oil["obs_area"] = oil["geometry"].area / 10 ** 6
+    #####
 
-    #  Create a new geodataframe containing the overlap between predicted and observed oil
-    #  For probabilistic output, this will calculate the area of overlap for each prob level individually
-    overlap = gpd.overlay(model_known, oil, how="intersection", keep_geom_type=False)
-    overlap["overlap_area"] = overlap["geometry"].area / 10 ** 6
+    return oil, model_known, overlap, plevs
 
-    #  For each contour level, calculate the full area of overlap with obs
-    overlap["overlap_full_contour"] = overlap.loc[::-1, "overlap_area"].cumsum()[::-1]
 
-    #####
+def known_region(oil, no_oil):
+    #  Function to return the known observation region, i.e. the union of the observed oil and the region where no oil
+    #  was detected, prepared for clipping model predictions (see clip_to_region). Building the union is expensive, so
+    #  the regions of the most recent sets of obs (KNOWN_REGION_CACHE_SIZE) are kept in memory, keyed by a hash of the
+    #  obs geometries, and reused when further model runs are validated against the same obs.
+    #
+    #   Input arguments:
+    #
+    #   oil    - geodataframe containing the oil observations, in a projected crs
+    #   no_oil - geodataframe defining the observation region where no oil was detected, in the same crs
+    #
+    #   Output arguments:
+    #
+    #   region - dictionary with the union of the obs as a prepared geometry (geometry), its parts, each prepared
+    #            (parts), and an STRtree spatial index over the parts (tree)
+
+    geoms = np.concatenate([np.asarray(oil.geometry), np.asarray(no_oil.geometry)])
+    key = hashlib.sha1(b"".join(shapely.to_wkb(geoms))).hexdigest()
+    if key in KNOWN_REGION_CACHE:
+        return KNOWN_REGION_CACHE[key]
+
+    geometry = shapely.union_all(geoms)
+    shapely.prepare(geometry)
+    parts = shapely.get_parts(geometry)
+    shapely.prepare(parts)
+    region = {"geometry": geometry, "parts": parts, "tree": STRtree(parts)}
+
+    KNOWN_REGION_CACHE[key] = region
+    while len(KNOWN_REGION_CACHE) > KNOWN_REGION_CACHE_SIZE:
+        KNOWN_REGION_CACHE.pop(next(iter(KNOWN_REGION_CACHE)))
+
+    return region
+
+
+def clip_to_region(gdf, region):
+    #  Function to clip the geometries of a geodataframe (e.g. the model contours) to the known observation region,
+    #  in place of a geopandas overlay. Only the geometries are clipped; no attributes of the region are joined.
+    #  The geometries are split into parts, and the spatial index of the region is used to discard the parts whose
+    #  bounding boxes do not meet any part of the region, before the prepared parts of the region are tested exactly.
+    #  Parts that lie wholly inside the region are kept as they are, and only the parts that cross its boundary are
+    #  intersected with it, after cutting the region down to the bounding box of the part. Rows with nothing left
+    #  inside the region are dropped.
+    #
+    #   Input arguments:
+    #
+    #   gdf    - geodataframe of (multi)polygons to be clipped, in the same crs as the region
+    #   region - known observation region, as returned by known_region
+    #
+    #   Output arguments:
+    #
+    #   clipped - geodataframe of the clipped (multi)polygons, with a new index
+
+    parts, rows = shapely.get_parts(np.asarray(gdf.geometry), return_index=True)
+    ipart, iregion = region["tree"].query(parts)
+    meets = shapely.intersects(region["parts"][iregion], parts[ipart])
+    ipart, iregion = ipart[meets], iregion[meets]
+
+    #  Keep the parts that lie wholly inside a part of the region, and clip the others
+    inside = shapely.contains_properly(region["parts"][iregion], parts[ipart])
+    whole = np.unique(ipart[inside])
+    pair = ~np.isin(ipart, whole)
+    bounds = shapely.bounds(parts[ipart[pair]])
+    cut = np.array(
+        [shapely.clip_by_rect(region["parts"][i], *box) for i, box in zip(iregion[pair], bounds)], dtype=object
+    )
+    #  clip_by_rect can return invalid polygons (e.g. with self-intersecting rings where a hole meets the rectangle),
+    #  so these are cut again with a general intersection (as in tile_engine.clip_pieces)
+    invalid = ~shapely.is_valid(cut)
+    cut[invalid] = shapely.intersection(region["parts"][iregion[pair][invalid]], shapely.box(*bounds[invalid].T))
+    pieces, pieceRows = shapely.get_parts(shapely.intersection(parts[ipart[pair]], cut), return_index=True)
+    pieceRows = rows[ipart[pair]][pieceRows]
+
+    #  The intersection of two polygons may include lines or points where they touch, which have no area
+    polygonal = shapely.get_type_id(pieces) == 3
+    keptParts = np.concatenate([parts[whole], pieces[polygonal]])
+    keptRows = np.concatenate([rows[whole], pieceRows[polygonal]])
+
+    #  Reassemble the parts of each row into a multipolygon
+    order = np.argsort(keptRows, kind="stable")
+    keep, index = np.unique(keptRows[order], return_inverse=True)
+    clipped = gdf.iloc[keep].copy()
+    clipped[gdf.geometry.name] = shapely.multipolygons(keptParts[order], indices=index)
+
+    return clipped.reset_index(drop=True)
+
+
+def dissolve_levels(model):
+    #  Function to dissolve the contour levels of a BE model geodataframe into a single geometry
+    #  This is only necessary for the BE case, since for Prob we want to keep the
+    #  contour levels as separate geometries
+
+    if "name" in model.columns:
+        model = model.dissolve(by="name")
+    elif "test-case" in model.columns:
+        model = model.dissolve(by="test-case")
+    else:
+        model[
+            "dummy"
+        ] = "dummy"  #  Last resort; introduce dummy column to dissolve geometries
+        model = model.dissolve(by="dummy")
 
-    return oil, model_known, overlap, plevs
+    return model
+
+
+def read_obs(path, crs, cacheDir, cacheSize, reader, store):
+    #  Function to read an obs (or no oil) file for read_geojson, either from the in-memory store, from the geometry
+    #  cache (if cacheDir is specified) or from the file itself. Obs kept in the store are converted to crs and dissolved,
+    #  and a copy is returned, so that later changes to the geodataframe (e.g. buffering) do not alter the stored one.
+    #  They are keyed by the modification time and size of the file as well as its path, so that a file overwritten
+    #  at the same path is read again.
+
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, crs)
+    if store is not None and key in store:
+        print("Read ", path, " from memory")
+        return store[key].copy()
+
+    if cacheDir is not None:
+        gdf = load_geometry(path, crs, "test-case", cacheDir, cacheSize, reader)
+    else:
+        gdf = read_geofile(path, reader)
+
+    if store is not None:
+        store[key] = project_dissolve(gdf, crs, "test-case")
+        return store[key].copy()
+
+    return gdf
+
+
+def moe_columns(engine):
+    #  Function to return the names of the overlap dataframe columns (see MOE_COLUMNS) holding the observed,
+    #  predicted and overlap quantities (Aob, Apr, Aov) passed to calc_2DMOE, for the given engine
+
+    return MOE_COLUMNS["length" if engine == "line" else "area"]
+
+
+def centroid_model(model_known):
+    #  Function to return the model geodataframe whose first geometry gives the model centroid for the centroid skill
+    #  score (see calc_metrics.calc_centroid_ss). The 'tiled' engine only clips the model geometry to the known
+    #  observation region if keepGeometry is True, and instead gives the centroid of each contour within the known
+    #  region (centroid_x, centroid_y), so these are used as point geometries where they are present.
+
+    if "centroid_x" not in model_known:
+        return model_known
+
+    return gpd.GeoDataFrame(
+        geometry=gpd.points_from_xy(model_known["centroid_x"], model_known["centroid_y"]),
+        crs=model_known.crs,
+    )
+
+
+def read_geofile(path, reader="gdal", bbox=None):
+    #  Function to read a GeoJSON, GeoParquet or FlatGeobuf file (according to its extension, see geo_formats.py)
+    #  into a geodataframe, using the chosen reader for GeoJSON files
+    #
+    #   Input arguments:
+    #
+    #   path   - absolute/relative path to the file
+    #   reader - 'gdal' to use geopandas read_file (all properties are read), 'fast' to use the reader in
+    #            geojson_reader.py (only the properties used by OMEN are read), or 'stream' to use the same
+    #            reader but decode the features one at a time, reducing the peak memory use
+    #   bbox   - Optional GeoSeries (with a crs), e.g. as returned by scene_bbox. For GeoParquet and FlatGeobuf files,
+    #            only the features whose bounding boxes meet its bounds are read; GeoJSON files are always read whole.
+    #            If no features are within the bounds, the whole file is read (so that the header is still available).
+    #
+    #   Output arguments:
+    #
+    #   gdf - geodataframe containing the contents of the file
+
+    from geo_formats import file_format
+
+    if file_format(path) != "geojson":
+        from geo_formats import read_geoformat
+
+        gdf = read_geoformat(path, bbox)
+        if bbox is not None:
+            print("Read ", len(gdf), " features of ", path, " within the observation scene")
+            if gdf.empty:
+                gdf = read_geoformat(path)
+        return gdf
+
+    if reader == "gdal":
+        return gpd.read_file(path, driver="geojson")
+
+    from geojson_reader import read_geojson_fast
+
+    return read_geojson_fast(path, stream=(reader == "stream"))
+
+
+def scene_bbox(oil, no_oil):
+    #  Function to return the bounding box of the observation scene, i.e. of the oil and no oil obs, as used to
+    #  filter the model features when reading (see read_geofile). The sides of the box are divided into segments,
+    #  so that it still covers the scene when converted to the crs of the model file.
+    #
+    #   Input arguments:
+    #
+    #   oil    - geodataframe containing the oil observations
+    #   no_oil - geodataframe defining the observation region where no oil was detected (in the same or another crs)
+    #
+    #   Output arguments:
+    #
+    #   bbox - GeoSeries holding the bounding box as a polygon, in the crs of oil
+
+    no_oil_box = gpd.GeoSeries([shapely.box(*no_oil.total_bounds)], crs=no_oil.crs).to_crs(oil.crs)
+    bounds = np.array([oil.total_bounds, no_oil_box.total_bounds])
+    box = shapely.box(bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max())
+
+    return gpd.GeoSeries([shapely.segmentize(box, shapely.length(box) / 64)], crs=oil.crs)
+
+
+def project_dissolve(gdf, crs, by):
+    #  Function to convert a geodataframe to the given coordinate reference system and dissolve its geometries
+    #  by the given column. Geodataframes that are in this crs already, or have been dissolved by this
+    #  column already (and so are indexed by it, e.g. when read from the geometry cache), are not converted
+    #  or dissolved again.
+    #
+    #   Input arguments:
+    #
+    #   gdf - geodataframe to be converted
+    #   crs - Integer specifying the coordinate reference system to convert the data to
+    #   by  - name of the column to dissolve the geometries by (None to skip the dissolve)
+    #
+    #   Output arguments:
+    #
+    #   gdf - geodataframe in the given crs, dissolved by (and so indexed by) column 'by'
+
+    if gdf.crs is None or gdf.crs.to_epsg() != crs:
+        gdf = gdf.to_crs({"init": "epsg:" + str(crs)})
+
+    if by is not None and gdf.index.name != by:
+        gdf = gdf.dissolve(by=by)
+
+    return gdf
+
+
+def calc_overlap_areas(model_known, oil, obsIndex=None):
+    #  Function to calculate the area of overlap between each model contour and the observed oil, without
+    #  building the overlap geometries and attribute joins of a full geopandas overlay. The model and obs
+    #  geometries are split into their constituent parts, an STRtree spatial index over the obs parts is used
+    #  to find the pairs of parts that intersect, and the intersection areas of these pairs are then
+    #  calculated in a single vectorized call. Since the parts of a (valid) multipolygon do not overlap,
+    #  summing the areas of the pairs gives the overlap area between each model contour and obs geometry.
+    #
+    #   Input arguments:
+    #
+    #   model_known - geodataframe containing the model prediction, in a projected crs
+    #   oil         - geodataframe containing the oil observations, in the same crs as model_known
+    #   obsIndex    - spatial index over the parts of the obs, as returned by build_obs_index (None to build it here).
+    #                 Passing a prebuilt index saves rebuilding it when many models are compared with the same obs.
+    #
+    #   Output arguments:
+    #
+    #   overlap - new dataframe with one row per intersecting pair of model and obs geometries, in the same
+    #             order and with the same columns as the result of geopandas overlay (except for the geometry),
+    #             plus the overlap area of the pair (in km^2)
+
+    #  Split the geometries into parts, keeping track of the row each part belongs to
+    model_parts, model_rows = shapely.get_parts(
+        np.asarray(model_known.geometry), return_index=True
+    )
+    if obsIndex is None:
+        obsIndex = build_obs_index(oil)
+    obs_parts, obs_rows, tree = obsIndex
+
+    #  Find the intersecting pairs of parts using a spatial index over the obs parts
+    shapely.prepare(model_parts)
+    imodel, iobs = tree.query(model_parts, predicate="intersects")
+
+    #  Calculate the intersection area of every pair in one go, then sum over the parts of each row
+    pair_area = (
+        polygon_areas(shapely.intersection(model_parts[imodel], obs_parts[iobs]))
+        / 10 ** 6
+    )
+    pairs = pd.DataFrame(
+        {
+            "__idx1": model_rows[imodel],
+            "__idx2": obs_rows[iobs],
+            "overlap_area": pair_area,
+        }
+    )
+    pairs = pairs.groupby(["__idx1", "__idx2"], as_index=False).sum()
+
+    #  Join the attributes of the model and obs rows, in the same way as geopandas overlay
+    df1 = pd.DataFrame(model_known.drop(columns=model_known.geometry.name))
+    df2 = pd.DataFrame(oil.drop(columns=oil.geometry.name))
+    overlap = pairs.merge(
+        df1.reset_index(drop=True), left_on="__idx1", right_index=True
+    )
+    overlap = overlap.merge(
+        df2.reset_index(drop=True),
+        left_on="__idx2",
+        right_index=True,
+        suffixes=("_1", "_2"),
+    )
+    overlap["overlap_area"] = overlap.pop("overlap_area")
+    overlap.drop(["__idx1", "__idx2"], axis=1, inplace=True)
+    overlap.reset_index(drop=True, inplace=True)
+
+    return overlap
+
+
+def build_obs_index(oil):
+    #  Function to split the obs geometries into their constituent parts and build an STRtree spatial index over them,
+    #  for use by calc_overlap_areas
+    #
+    #   Input arguments:
+    #
+    #   oil - geodataframe containing the oil observations, in a projected crs
+    #
+    #   Output arguments:
+    #
+    #   obsIndex - tuple of the array of obs parts, the row of oil that each part belongs to, and the STRtree over the parts
+
+    obs_parts, obs_rows = shapely.get_parts(np.asarray(oil.geometry), return_index=True)
+
+    return obs_parts, obs_rows, STRtree(obs_parts)
 
 
 def check_geom_types(geom, valType):
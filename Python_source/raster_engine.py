@@ -0,0 +1,216 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+#  Number of grid cells along the longest side of the grid, used when no resolution is specified
+DEFAULT_GRID_CELLS = 2000
+
+
+class RasterGrid:
+    #  Class defining a regular grid of square cells in a projected coordinate reference system
+    #
+    #   x0, y0     - coordinates of the lower left corner of the grid
+    #   resolution - width of the grid cells (in the units of the crs, i.e. metres)
+    #   nx, ny     - number of cells in the x and y directions
+
+    def __init__(self, bounds, resolution=None):
+        #  Create a grid covering the given bounds (minx, miny, maxx, maxy). If resolution is None, it is chosen
+        #  so that there are DEFAULT_GRID_CELLS cells along the longest side of the grid.
+
+        minx, miny, maxx, maxy = bounds
+        if resolution is None:
+            resolution = max(maxx - minx, maxy - miny) / DEFAULT_GRID_CELLS
+        assert resolution > 0, "Invalid grid resolution: %r" % resolution
+
+        self.x0 = minx
+        self.y0 = miny
+        self.resolution = resolution
+        self.nx = max(int(np.ceil((maxx - minx) / resolution)), 1)
+        self.ny = max(int(np.ceil((maxy - miny) / resolution)), 1)
+
+    def cell_area(self):
+        #  Return the area of a grid cell in km^2
+
+        return self.resolution ** 2 / 10 ** 6
+
+    def rasterize(self, geom):
+        #  Return a boolean mask (ny by nx) of the cells whose centres lie within the geometry.
+        #  Only the cells within the bounding box of the geometry are tested.
+
+        mask = np.zeros((self.ny, self.nx), dtype=bool)
+        if geom is None or geom.is_empty:
+            return mask
+
+        minx, miny, maxx, maxy = geom.bounds
+        i0 = max(int(np.floor((minx - self.x0) / self.resolution)), 0)
+        i1 = min(int(np.ceil((maxx - self.x0) / self.resolution)), self.nx)
+        j0 = max(int(np.floor((miny - self.y0) / self.resolution)), 0)
+        j1 = min(int(np.ceil((maxy - self.y0) / self.resolution)), self.ny)
+        if i0 >= i1 or j0 >= j1:
+            return mask
+
+        x = self.x0 + (np.arange(i0, i1) + 0.5) * self.resolution
+        y = self.y0 + (np.arange(j0, j1) + 0.5) * self.resolution
+        xx, yy = np.meshgrid(x, y)
+        shapely.prepare(geom)
+        mask[j0:j1, i0:i1] = shapely.contains_xy(geom, xx, yy)
+
+        return mask
+
+
+def calc_raster_areas(oil, model, no_oil, resolution=None, keepGeometry=False):
+    #  Function to calculate approximate areas of the observed oil, the model contours within the known
+    #  observation region, and their overlap, by rasterizing all of the geometries onto one shared grid and
+    #  summing boolean masks. This is much cheaper than an exact overlay for large and complex geometries.
+    #  An estimate of the discretisation error of each area is also returned (see discretisation_error).
+    #
+    #   Input arguments:
+    #
+    #   oil          - geodataframe containing the oil observations, in a projected crs and dissolved
+    #   model        - geodataframe containing the model prediction (cut-outs, sorted by contourlev), in the same crs
+    #   no_oil       - geodataframe defining the observation region where no oil was detected, in the same crs
+    #                  (None if not available)
+    #   resolution   - width of the grid cells in metres (None to choose one automatically, see RasterGrid)
+    #   keepGeometry - If True, model_known and overlap also include the exact geometry of the model clipped to the
+    #                  known observation region and of the overlap regions, as needed for plotting maps
+    #
+    #   Output arguments:
+    #
+    #   oil         - updated oil geodataframe to include the observed area (obs_area) and its error (obs_area_error), in km^2
+    #   model_known - updated model geodataframe, containing the contour levels that lie within the known observation
+    #                 region, to include the contour areas (contour_cutout_area, area_full_contour) and the error of the
+    #                 full contour area (area_full_contour_error), in km^2. Its geometry is only clipped to the known
+    #                 observation region if keepGeometry is True.
+    #   overlap     - new dataframe with one row per overlapping pair of model and obs geometries, with the same columns
+    #                 as calc_poly_overlap, plus the overlap area (overlap_area) and the error of the full contour overlap
+    #                 area (overlap_full_contour_error), in km^2
+
+    model_geoms = np.asarray(model.geometry)
+    oil_geoms = np.asarray(oil.geometry)
+
+    #  The grid only needs to cover the model and oil, since the no oil region only restricts the model
+    bounds = np.array([model.total_bounds, oil.total_bounds])
+    grid = RasterGrid(
+        (bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max()),
+        resolution,
+    )
+    print(
+        "Raster grid of ",
+        grid.nx,
+        "x",
+        grid.ny,
+        " cells at a resolution (in m) of : ",
+        grid.resolution,
+    )
+
+    #  Rasterize the obs, and the known observation region (if specified)
+    oil_masks = [grid.rasterize(geom) for geom in oil_geoms]
+    if no_oil is not None:
+        known_mask = np.logical_or.reduce(
+            oil_masks + [grid.rasterize(geom) for geom in np.asarray(no_oil.geometry)]
+        )
+    else:
+        known_mask = np.ones((grid.ny, grid.nx), dtype=bool)
+
+    #  Rasterize each model contour (cut-out), within the known observation region
+    model_masks = [grid.rasterize(geom) & known_mask for geom in model_geoms]
+
+    #  As with a geopandas overlay, contour levels entirely outside the known observation region are dropped
+    cutout_cells = np.array([mask.sum() for mask in model_masks])
+    keep = np.arange(len(model_masks))
+    if no_oil is not None:
+        keep = keep[cutout_cells > 0]
+    model_known = model.iloc[keep].copy()
+    model_masks = [model_masks[i] for i in keep]
+
+    #  The region enclosed by each full contour is the union of the cut-outs of that level and above
+    full_masks = []
+    full_mask = np.zeros((grid.ny, grid.nx), dtype=bool)
+    for mask in model_masks[::-1]:
+        full_mask = full_mask | mask
+        full_masks.insert(0, full_mask)
+
+    #  Calculate the areas and estimate their errors
+    cell_area = grid.cell_area()
+    oil = oil.copy()
+    oil["obs_area"] = np.array([mask.sum() for mask in oil_masks]) * cell_area
+    oil["obs_area_error"] = [discretisation_error(mask, cell_area) for mask in oil_masks]
+
+    model_known["contour_cutout_area"] = cutout_cells[keep] * cell_area
+    model_known["area_full_contour"] = model_known.loc[
+        ::-1, "contour_cutout_area"
+    ].cumsum()[::-1]
+    model_known["area_full_contour_error"] = [
+        discretisation_error(mask, cell_area) for mask in full_masks
+    ]
+
+    #  Calculate the overlap area of each pair of model and obs geometries, keeping the overlapping pairs only
+    pairs = []
+    for imodel, model_mask in enumerate(model_masks):
+        for iobs, oil_mask in enumerate(oil_masks):
+            cells = np.count_nonzero(model_mask & oil_mask)
+            if cells > 0:
+                error = discretisation_error(full_masks[imodel] & oil_mask, cell_area)
+                pairs.append((imodel, iobs, cells * cell_area, error))
+    pairs = pd.DataFrame(
+        pairs, columns=["__idx1", "__idx2", "overlap_area", "overlap_full_contour_error"]
+    )
+
+    #  Join the attributes of the model and obs rows, in the same way as geopandas overlay
+    df1 = pd.DataFrame(model_known.drop(columns=model_known.geometry.name))
+    df2 = pd.DataFrame(oil.drop(columns=oil.geometry.name))
+    overlap = pairs.merge(df1.reset_index(drop=True), left_on="__idx1", right_index=True)
+    overlap = overlap.merge(
+        df2.reset_index(drop=True),
+        left_on="__idx2",
+        right_index=True,
+        suffixes=("_1", "_2"),
+    )
+    overlap["overlap_area"] = overlap.pop("overlap_area")
+    overlap["overlap_full_contour_error"] = overlap.pop("overlap_full_contour_error")
+
+    if keepGeometry:
+        #  Add the exact geometry, for plotting
+        if no_oil is not None:
+            known_geom = shapely.union_all(
+                np.concatenate([oil_geoms, np.asarray(no_oil.geometry)])
+            )
+            model_known["geometry"] = shapely.intersection(
+                np.asarray(model_known.geometry), known_geom
+            )
+        overlap = gpd.GeoDataFrame(
+            overlap,
+            geometry=shapely.intersection(
+                np.asarray(model_known.geometry)[overlap["__idx1"].to_numpy()],
+                oil_geoms[overlap["__idx2"].to_numpy()],
+            ),
+            crs=oil.crs,
+        )
+
+    overlap.drop(["__idx1", "__idx2"], axis=1, inplace=True)
+    overlap.reset_index(drop=True, inplace=True)
+
+    return oil, model_known, overlap
+
+
+def discretisation_error(mask, cellArea):
+    #  Function to estimate the error of an area calculated by summing the cells of a mask. Each cell crossed by
+    #  the boundary of the region may be wrongly included or excluded, so the cells along the boundary are assumed
+    #  to contribute independent errors, uniformly distributed between -1/2 and +1/2 of a cell. The number of
+    #  boundary cells is taken as the number of edges between adjacent cells inside and outside the mask.
+    #
+    #   Input arguments:
+    #
+    #   mask     - 2-D boolean array of the cells within the region
+    #   cellArea - area of a grid cell
+    #
+    #   Output arguments:
+    #
+    #   error - estimated (one standard deviation) error of the area, in the same units as cellArea
+
+    edges = np.count_nonzero(mask[1:, :] != mask[:-1, :]) + np.count_nonzero(
+        mask[:, 1:] != mask[:, :-1]
+    )
+
+    return cellArea * np.sqrt(edges / 12.0)
@@ -0,0 +1,120 @@
+import os
+
+#  Options for the plots produced: none at all, the png figures only, or the png figures plus the interactive maps
+PLOT_MODES = ["none", "png", "all"]
+
+#  Default simplification tolerances (in metres) of the levels of detail written to the interactive maps,
+#  from the coarsest to the finest. The finest level is used when zoomed in beyond the pixel size of all levels.
+#  (Defined here rather than in interactive_map.py, so that the map writer is only imported when a map is written)
+DEFAULT_TOLERANCES = [500.0, 50.0, 5.0]
+
+
+def render_plots(jobs, workers=None):
+    #  Function to render a list of plots from the results of the validation, separately from the calculation of the
+    #  metrics. Each png plot is drawn by one of the functions in plot_maps_metrics.py and saved to file, using the
+    #  non-interactive Agg backend, and its figure is then closed so that the memory it uses is released.
+    #  Interactive maps are written by write_interactive_map (see interactive_map.py), without using matplotlib.
+    #  The plots are rendered on a pool of worker processes; matplotlib is only imported by the processes that
+    #  render png plots, so that runs without any plots never import it.
+    #
+    #   Input arguments:
+    #
+    #   jobs    - list of dictionaries, one per plot, with keys:
+    #             function - name of the plotting function in plot_maps_metrics.py (or interactive_map.py, for html jobs)
+    #             args     - tuple of positional arguments of the plotting function
+    #             kwargs   - dictionary of keyword arguments of the plotting function (optional)
+    #             png      - path of the png file to save the figure to
+    #             html     - path of the html file written by an interactive map function, which is used in place of
+    #                        png for interactive maps (the path must also be passed to the function in args)
+    #   workers - number of worker processes (None to use up to one per plot, limited to the number of CPUs).
+    #             If 1, the plots are rendered in the current process.
+    #
+    #  If a profile of the run is being recorded (see instrumentation.py), the time and peak memory of rendering each
+    #  png plot ('plotting') and interactive map ('html export') are added to it, as measured in the process rendering it.
+    #
+    #   Output arguments:
+    #
+    #   files - list of the files written
+
+    if len(jobs) == 0:
+        return []
+
+    if workers is None:
+        workers = min(len(jobs), os.cpu_count() or 1)
+
+    import instrumentation
+
+    render = render_job if instrumentation.PROFILE is None else render_job_timed
+    if workers == 1:
+        use_agg()
+        results = [render(job) for job in jobs]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=use_agg) as pool:
+            results = list(pool.map(render, jobs))
+
+    if render is render_job_timed:
+        instrumentation.add_stages([record for files, record in results])
+        results = [files for files, record in results]
+
+    files = [filename for result in results for filename in result]
+    print("Number of plot files written : ", len(files))
+
+    return files
+
+
+def use_agg():
+    #  Function to select the non-interactive Agg backend, so that plots can be rendered without a display
+
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def render_job_timed(job):
+    #  Function to render a single plot with render_job, and return the list of files written with the record of the
+    #  time and peak memory taken (see instrumentation.timed_call)
+
+    from instrumentation import timed_call
+
+    return timed_call("html export" if job.get("png") is None else "plotting", render_job, job)
+
+
+def render_job(job):
+    #  Function to draw a single plot (see render_plots), save it to file and close its figure.
+    #  Any error is printed rather than raised, so that the remaining plots are still rendered.
+    #  Returns the list of files written.
+
+    if job.get("png") is None:
+        import interactive_map
+
+        try:
+            getattr(interactive_map, job["function"])(*job["args"], **job.get("kwargs", {}))
+        except Exception as err:
+            print("Failed to render ", job["html"], " : ", repr(err))
+            return []
+        return [job["html"]]
+
+    import matplotlib.pyplot as plot
+    import plot_maps_metrics
+
+    #  Every figure opened by the plot is closed afterwards, including any left open when the plot fails part way
+    #  through, so that repeated failures in a long-running worker do not leak figures
+    existing = set(plot.get_fignums())
+    try:
+        fig = getattr(plot_maps_metrics, job["function"])(
+            *job["args"], **job.get("kwargs", {})
+        )
+        if isinstance(fig, tuple):
+            #  Some plotting functions also return the axis object
+            fig = fig[0]
+        fig.savefig(job["png"], bbox_inches="tight")
+    except Exception as err:
+        print("Failed to render ", job["png"], " : ", repr(err))
+        return []
+    finally:
+        for number in set(plot.get_fignums()) - existing:
+            plot.close(number)
+
+    return [job["png"]]
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import pickle
+import uuid
+
+from geometry_cache import DEFAULT_CACHE_SIZE, evict_lru, update_file_hash
+
+#  Increment this if the contents of the cached geometry stage results change, so that old entries are not reused
+RESULT_CACHE_VERSION = "2"
+
+
+def result_key(paths, options):
+    #  Function to return the key of a cached geometry stage result, as a hash of the contents of the input files
+    #  and of the options that affect the result (crs, modelType, valType, engine options etc.)
+    #
+    #   Input arguments:
+    #
+    #   paths   - list of the paths of the obs, model and no oil files (None for a file that is not given)
+    #   options - dictionary of the options of the geometry stage, with values that can be represented as strings
+    #
+    #   Output arguments:
+    #
+    #   key - hexadecimal string identifying the result
+
+    sha = hashlib.sha256()
+    for path in paths:
+        if path is None:
+            sha.update(b"|None|")
+        else:
+            update_file_hash(sha, path)
+            sha.update(b"|")
+    for name in sorted(options):
+        sha.update((name + "=" + repr(options[name]) + "|").encode())
+    sha.update(RESULT_CACHE_VERSION.encode())
+
+    return sha.hexdigest()
+
+
+def load_result(key, cacheDir):
+    #  Function to return the cached geometry stage result with the given key (see result_key), or None if there is no
+    #  such entry in the cache directory. Entries that cannot be read (e.g. written by an incompatible version of the
+    #  libraries) are treated as missing.
+
+    cacheFile = os.path.join(cacheDir, key + ".pkl")
+    if not os.path.exists(cacheFile):
+        return None
+
+    try:
+        with open(cacheFile, "rb") as f:
+            result = pickle.load(f)
+    except Exception as err:
+        print("Could not read ", cacheFile, " from result cache : ", repr(err))
+        return None
+
+    #  Update the modification time, which is used to record when the entry was last used
+    os.utime(cacheFile)
+    print("Read geometry stage results from result cache")
+
+    return result
+
+
+def save_result(key, result, cacheDir, maxBytes=DEFAULT_CACHE_SIZE):
+    #  Function to add a geometry stage result to the cache directory under the given key (see result_key). The cache
+    #  directory is shared with the geometry cache (see geometry_cache.py), and its total size is limited to maxBytes,
+    #  with the least recently used entries of either kind evicted first.
+    #
+    #   Input arguments:
+    #
+    #   key      - key of the result, as returned by result_key
+    #   result   - dictionary of the results of the geometry stage (geodataframes, levels etc.), which must be picklable
+    #   cacheDir - directory in which the cached files are stored (created if it does not exist)
+    #   maxBytes - maximum total size (in bytes) of the cached files
+
+    os.makedirs(cacheDir, exist_ok=True)
+    cacheFile = os.path.join(cacheDir, key + ".pkl")
+
+    #  Write to a temporary file first, so that other processes never see a partially written entry
+    tmpFile = cacheFile + "." + uuid.uuid4().hex + ".tmp"
+    with open(tmpFile, "wb") as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpFile, cacheFile)
+
+    evict_lru(cacheDir, maxBytes)
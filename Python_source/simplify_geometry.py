@@ -0,0 +1,153 @@
+import numpy as np
+import shapely
+
+#  Number of bisection steps used to find the simplification tolerance, and the range of tolerances searched,
+#  relative to the size (longest side of the bounding box) of the geodataframe
+BISECTION_STEPS = 8
+MIN_RELATIVE_TOLERANCE = 1e-7
+MAX_RELATIVE_TOLERANCE = 1e-1
+
+
+def simplify_bounded(gdf, maxError, maxTolerance=None):
+    #  Function to simplify the geometries of a geodataframe (preserving their topology) with the largest tolerance
+    #  for which the relative change in the area of every geometry stays within a given bound. For (multi)linestrings,
+    #  such as coastlines, the relative change in length is bounded instead. The tolerance is found by bisection
+    #  between very small and very large tolerances (at most maxTolerance, if specified), on a logarithmic scale.
+    #  Note that each geometry is simplified separately, so the shared boundaries of neighbouring geometries (e.g.
+    #  model contour cut-outs) may be simplified differently, within the bound.
+    #
+    #   Input arguments:
+    #
+    #   gdf          - geodataframe to be simplified, ideally in a projected crs
+    #   maxError     - maximum relative change in area (or length) of each geometry, e.g. 0.001 for 0.1%
+    #   maxTolerance - largest tolerance that may be used, in the units of the crs (None for no limit)
+    #
+    #   Output arguments:
+    #
+    #   gdf   - geodataframe with the simplified geometries (the input geodataframe, if no simplification is possible)
+    #   stats - dictionary with the tolerance used (tolerance, in the units of the crs), the largest relative change
+    #           in area/length of any geometry (error), and the number of vertices before and after (vertices_in, vertices_out)
+
+    geoms = np.asarray(gdf.geometry)
+    measure = geometry_measure(geoms)
+    verticesIn = int(shapely.get_num_coordinates(geoms).sum())
+
+    minx, miny, maxx, maxy = gdf.total_bounds
+    size = max(maxx - minx, maxy - miny)
+
+    #  Bisect on log(tolerance), keeping the largest tolerance found that satisfies the bound
+    lo, hi = np.log(size * MIN_RELATIVE_TOLERANCE), np.log(size * MAX_RELATIVE_TOLERANCE)
+    if maxTolerance is not None:
+        hi = min(hi, np.log(maxTolerance))
+    if not hi > lo:
+        stats = {"tolerance": 0.0, "error": 0.0, "vertices_in": verticesIn, "vertices_out": verticesIn}
+        return gdf, stats
+
+    best = None
+    for step in range(BISECTION_STEPS):
+        tolerance = np.exp(0.5 * (lo + hi))
+        simple = shapely.simplify(geoms, tolerance, preserve_topology=True)
+        error = relative_change(measure, geometry_measure(simple))
+        if error <= maxError:
+            best = (tolerance, simple, error)
+            lo = np.log(tolerance)
+        else:
+            hi = np.log(tolerance)
+
+    if best is None:
+        stats = {"tolerance": 0.0, "error": 0.0, "vertices_in": verticesIn, "vertices_out": verticesIn}
+        return gdf, stats
+
+    tolerance, simple, error = best
+    gdf = gdf.copy()
+    gdf["geometry"] = simple
+    stats = {
+        "tolerance": float(tolerance),
+        "error": float(error),
+        "vertices_in": verticesIn,
+        "vertices_out": int(shapely.get_num_coordinates(simple).sum()),
+    }
+
+    return gdf, stats
+
+
+def simplify_inputs(oil, model, no_oil, maxError, crs=3857):
+    #  Function to convert the obs, model and no oil geodataframes to the given crs and simplify them ahead of
+    #  calc_poly_overlap (see simplify_bounded), and print a summary of the simplification of each. All three are
+    #  converted first, since they may arrive in different crs (e.g. obs read from the geometry cache are already
+    #  converted, while the model is not), so that their tolerances are all in metres and can be compared. The no oil
+    #  region is usually far larger than the model and obs, so a small relative change in its area can still move its
+    #  boundary a long way. Since its boundary is used to clip the model, it is simplified with a tolerance no larger
+    #  than that used for the model.
+    #
+    #   Input arguments:
+    #
+    #   oil      - geodataframe containing the oil observations
+    #   model    - geodataframe containing the model prediction
+    #   no_oil   - geodataframe defining the observation region where no oil was detected (None if not available)
+    #   maxError - maximum relative change in area (or length) of each geometry, e.g. 0.001 for 0.1%
+    #   crs      - Integer specifying the (projected) coordinate reference system to convert the data to
+    #
+    #   Output arguments:
+    #
+    #   oil, model, no_oil - simplified geodataframes, in crs
+    #   stats              - dictionary with the largest relative change in area/length of any geometry (simplify_error),
+    #                        and the fraction of the vertices removed over all three geodataframes (vertex_reduction)
+
+    from process_data import project_dissolve
+
+    verticesIn, verticesOut, maxChange = 0, 0, 0.0
+    simplified = []
+    modelTolerance = None
+    for name, gdf in [("obs", oil), ("model", model), ("no oil", no_oil)]:
+        if gdf is None:
+            simplified.append(None)
+            continue
+        gdf = project_dissolve(gdf, crs, None)
+        if name == "no oil":
+            gdf, stats = simplify_bounded(gdf, maxError, modelTolerance)
+        else:
+            gdf, stats = simplify_bounded(gdf, maxError)
+        if name == "model":
+            modelTolerance = stats["tolerance"]
+        print(
+            "Simplified ",
+            name,
+            " geometries with tolerance ",
+            "%.3g" % stats["tolerance"],
+            ": vertices ",
+            stats["vertices_in"],
+            " -> ",
+            stats["vertices_out"],
+            ", relative area/length change ",
+            stats["error"],
+        )
+        verticesIn += stats["vertices_in"]
+        verticesOut += stats["vertices_out"]
+        maxChange = max(maxChange, stats["error"])
+        simplified.append(gdf)
+
+    stats = {
+        "simplify_error": maxChange,
+        "vertex_reduction": 1.0 - verticesOut / verticesIn if verticesIn > 0 else 0.0,
+    }
+
+    return simplified[0], simplified[1], simplified[2], stats
+
+
+def geometry_measure(geoms):
+    #  Function to return the area of each polygonal geometry, or the length of each linear geometry
+
+    return np.where(
+        shapely.get_dimensions(geoms) == 2, shapely.area(geoms), shapely.length(geoms)
+    )
+
+
+def relative_change(before, after):
+    #  Function to return the largest relative change between two arrays of areas/lengths (ignoring empty geometries)
+
+    valid = before > 0
+    if not valid.any():
+        return 0.0
+
+    return float(np.max(np.abs(after[valid] - before[valid]) / before[valid]))
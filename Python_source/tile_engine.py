@@ -0,0 +1,258 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from shapely import STRtree
+
+from coord_arrays import area_moments, polygon_areas
+from process_data import known_region
+
+#  Largest number of vertices (of the obs, no oil obs and model, once clipped) in a tile, before it is split in four
+DEFAULT_TILE_VERTICES = 50000
+
+#  Largest number of times a tile is split, so that vertices piled up at one point cannot split tiles without end
+MAX_TILE_DEPTH = 12
+
+#  Kinds of geometry pieces held by a tile
+MODEL, OIL, NO_OIL = 0, 1, 2
+
+
+def clip_pieces(bounds, geoms, kinds, rows):
+    #  Function to clip pieces of geometry to a rectangle. Pieces that lie within the rectangle are kept as they are,
+    #  pieces that lie outside it are dropped, and the others are cut with shapely clip_by_rect (which is much
+    #  cheaper than a general intersection) and split into their polygon parts. clip_by_rect can return invalid
+    #  polygons (e.g. with self-intersecting rings where a hole meets the rectangle), so these are cut again
+    #  with a general intersection.
+    #
+    #   Input arguments:
+    #
+    #   bounds - bounds (minx, miny, maxx, maxy) of the rectangle
+    #   geoms  - array of the (multi)polygon pieces
+    #   kinds  - array of the kind of each piece (MODEL, OIL or NO_OIL)
+    #   rows   - array of the row of the model, oil or no_oil geodataframe that each piece belongs to
+    #
+    #   Output arguments:
+    #
+    #   geoms, kinds, rows - the same arrays, for the pieces of the geometry within the rectangle
+
+    minx, miny, maxx, maxy = bounds
+    box = shapely.bounds(geoms)
+    meets = (box[:, 0] < maxx) & (box[:, 2] > minx) & (box[:, 1] < maxy) & (box[:, 3] > miny)
+    within = (box[:, 0] >= minx) & (box[:, 2] <= maxx) & (box[:, 1] >= miny) & (box[:, 3] <= maxy)
+    cut = meets & ~within
+
+    clipped = np.array([shapely.clip_by_rect(geom, minx, miny, maxx, maxy) for geom in geoms[cut]], dtype=object)
+    invalid = ~shapely.is_valid(clipped)
+    clipped[invalid] = shapely.intersection(geoms[cut][invalid], shapely.box(minx, miny, maxx, maxy))
+    parts, index = shapely.get_parts(clipped, return_index=True)
+    polygonal = shapely.get_type_id(parts) == 3
+
+    return (
+        np.concatenate([geoms[within], parts[polygonal]]),
+        np.concatenate([kinds[within], kinds[cut][index[polygonal]]]),
+        np.concatenate([rows[within], rows[cut][index[polygonal]]]),
+    )
+
+
+def build_tiles(model, oil, no_oil=None, tileVertices=DEFAULT_TILE_VERTICES):
+    #  Function to split the domain of the model and obs into tiles sized to the complexity of the geometry. Starting
+    #  from the bounding box of the model and obs, any tile holding more than tileVertices vertices is split into four,
+    #  and the geometry is clipped to each quarter (see clip_pieces), so that each vertex is only clipped once per level
+    #  of splitting rather than once per tile.
+    #
+    #   Input arguments:
+    #
+    #   model        - geodataframe containing the model prediction, in a projected crs
+    #   oil          - geodataframe containing the oil observations, in the same crs
+    #   no_oil       - geodataframe defining the observation region where no oil was detected, in the same crs
+    #                  (None if not available)
+    #   tileVertices - largest number of vertices in a tile (a tile at MAX_TILE_DEPTH may hold more)
+    #
+    #   Output arguments:
+    #
+    #   tiles - list of tuples (geoms, kinds, rows), giving the pieces of the geometry within each tile (see clip_pieces)
+
+    frames = [(MODEL, model), (OIL, oil)] + ([(NO_OIL, no_oil)] if no_oil is not None else [])
+    geoms = np.concatenate([np.asarray(gdf.geometry) for kind, gdf in frames])
+    kinds = np.concatenate([np.full(len(gdf), kind) for kind, gdf in frames])
+    rows = np.concatenate([np.arange(len(gdf)) for kind, gdf in frames])
+
+    #  The domain only needs to cover the model and oil, since the no oil region only restricts the model
+    bounds = np.array([model.total_bounds, oil.total_bounds])
+    domain = (bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max())
+
+    tiles = []
+    stack = [(domain, clip_pieces(domain, geoms, kinds, rows), 0)]
+    while stack:
+        (minx, miny, maxx, maxy), pieces, depth = stack.pop()
+        if len(pieces[0]) == 0:
+            continue
+        if shapely.get_num_coordinates(pieces[0]).sum() <= tileVertices or depth == MAX_TILE_DEPTH:
+            tiles.append(pieces)
+            continue
+        midx, midy = (minx + maxx) / 2, (miny + maxy) / 2
+        for quarter in [
+            (minx, miny, midx, midy),
+            (midx, miny, maxx, midy),
+            (minx, midy, midx, maxy),
+            (midx, midy, maxx, maxy),
+        ]:
+            stack.append((quarter, clip_pieces(quarter, *pieces), depth + 1))
+
+    return tiles
+
+
+def tile_areas(geoms, kinds, rows, nmodel, nobs, known):
+    #  Function to calculate the areas within one tile: the area of each model contour within the known observation
+    #  region (with its first moments, for the centroid), and the overlap area of each model contour and obs geometry.
+    #  This is run for each tile on a pool of worker processes (see calc_tiled_areas).
+    #
+    #   Input arguments:
+    #
+    #   geoms, kinds, rows - pieces of the geometry within the tile (see clip_pieces)
+    #   nmodel, nobs       - number of rows of the model and oil geodataframes
+    #   known              - If True, the model is clipped to the known observation region (the union of the oil and
+    #                        no oil obs) before its area is calculated
+    #
+    #   Output arguments:
+    #
+    #   cutout  - array of the area (in m^2) of each model contour within the tile and known observation region
+    #   moments - array (nmodel by 2) of the first moments of area of the same regions, i.e. area times centroid
+    #   overlap - array (nmodel by nobs) of the overlap area (in m^2) of each model contour and obs geometry
+    #   touches - boolean array (nmodel by nobs), True where a model contour and obs geometry intersect in the tile
+
+    model, modelRows = geoms[kinds == MODEL], rows[kinds == MODEL]
+    oil, oilRows = geoms[kinds == OIL], rows[kinds == OIL]
+
+    clipped = model
+    if known:
+        region = shapely.union_all(geoms[kinds != MODEL])
+        shapely.prepare(region)
+        clipped = shapely.intersection(model, region)
+
+    #  The areas and first moments of the clipped pieces are calculated together (see coord_arrays.py)
+    area, moment = area_moments(clipped)
+    cutout = np.bincount(modelRows, weights=area, minlength=nmodel)
+    moments = np.column_stack(
+        [np.bincount(modelRows, weights=moment[:, i], minlength=nmodel) for i in range(2)]
+    )
+
+    #  Since the oil lies within the known observation region, the model need not be clipped to find the overlap
+    overlap = np.zeros((nmodel, nobs))
+    touches = np.zeros((nmodel, nobs), dtype=bool)
+    shapely.prepare(model)
+    imodel, iobs = STRtree(oil).query(model, predicate="intersects")
+    np.add.at(
+        overlap,
+        (modelRows[imodel], oilRows[iobs]),
+        polygon_areas(shapely.intersection(model[imodel], oil[iobs])),
+    )
+    touches[modelRows[imodel], oilRows[iobs]] = True
+
+    return cutout, moments, overlap, touches
+
+
+def calc_tiled_areas(oil, model, no_oil, tileVertices=DEFAULT_TILE_VERTICES, workers=None, keepGeometry=False):
+    #  Function to calculate the areas of the observed oil, the model contours within the known observation region,
+    #  and their overlap, by splitting the domain into tiles (see build_tiles) and summing the areas calculated within
+    #  each tile on a pool of worker processes. Since only the areas are summed, the merged geometry of the clipped
+    #  contours and overlap regions is never built (unless keepGeometry is set, for plotting maps), which bounds the
+    #  memory used by the intersection of very large and detailed geometries.
+    #
+    #   Input arguments:
+    #
+    #   oil          - geodataframe containing the oil observations, in a projected crs and dissolved
+    #   model        - geodataframe containing the model prediction (cut-outs, sorted by contourlev), in the same crs
+    #   no_oil       - geodataframe defining the observation region where no oil was detected, in the same crs
+    #                  (None if not available)
+    #   tileVertices - largest number of vertices in a tile
+    #   workers      - number of worker processes (None for one per tile, up to the number of CPUs)
+    #   keepGeometry - If True, model_known and overlap also include the exact geometry of the model clipped to the
+    #                  known observation region and of the overlap regions, as needed for plotting maps
+    #
+    #   Output arguments:
+    #
+    #   oil         - updated oil geodataframe to include the observed area (obs_area), in km^2
+    #   model_known - updated model geodataframe, containing the contour levels that lie within the known observation
+    #                 region, to include the contour areas (contour_cutout_area, area_full_contour), in km^2, and the
+    #                 centroid of each contour within the known observation region (centroid_x, centroid_y). Its geometry
+    #                 is only clipped to the known observation region if keepGeometry is True.
+    #   overlap     - new dataframe with one row per intersecting pair of model and obs geometries, with the same columns
+    #                 as calc_poly_overlap, plus the overlap area (overlap_area), in km^2
+
+    tiles = build_tiles(model, oil, no_oil, tileVertices)
+    nmodel, nobs = len(model), len(oil)
+    known = no_oil is not None
+
+    workers = min(workers or os.cpu_count() or 1, max(len(tiles), 1))
+    print("Number of tiles : ", len(tiles), " on ", workers, " worker processes")
+
+    columns = [list(column) for column in zip(*tiles)] + [
+        [nmodel] * len(tiles),
+        [nobs] * len(tiles),
+        [known] * len(tiles),
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(tile_areas, *columns))
+    else:
+        results = list(map(tile_areas, *columns))
+
+    cutout = sum(result[0] for result in results) if results else np.zeros(nmodel)
+    moments = sum(result[1] for result in results) if results else np.zeros((nmodel, 2))
+    overlap_area = sum(result[2] for result in results) if results else np.zeros((nmodel, nobs))
+    touches = np.logical_or.reduce([result[3] for result in results]) if results else overlap_area > 0
+
+    #  As with a geopandas overlay, contour levels entirely outside the known observation region are dropped
+    keep = np.arange(nmodel)
+    if known:
+        keep = keep[cutout > 0]
+    model_known = model.iloc[keep].copy()
+    model_known["contour_cutout_area"] = cutout[keep] / 10 ** 6
+    model_known["area_full_contour"] = model_known.loc[::-1, "contour_cutout_area"].cumsum()[::-1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        model_known["centroid_x"] = moments[keep, 0] / cutout[keep]
+        model_known["centroid_y"] = moments[keep, 1] / cutout[keep]
+    model_known.reset_index(drop=True, inplace=True)
+
+    oil = oil.copy()
+    oil["obs_area"] = polygon_areas(oil["geometry"]) / 10 ** 6
+
+    #  Join the attributes of the model and obs rows, in the same way as geopandas overlay
+    imodel, iobs = np.nonzero(touches[keep])
+    pairs = pd.DataFrame(
+        {"__idx1": imodel, "__idx2": iobs, "overlap_area": overlap_area[keep][imodel, iobs] / 10 ** 6}
+    )
+    df1 = pd.DataFrame(model_known.drop(columns=model_known.geometry.name))
+    df2 = pd.DataFrame(oil.drop(columns=oil.geometry.name))
+    overlap = pairs.merge(df1, left_on="__idx1", right_index=True)
+    overlap = overlap.merge(
+        df2.reset_index(drop=True),
+        left_on="__idx2",
+        right_index=True,
+        suffixes=("_1", "_2"),
+    )
+    overlap["overlap_area"] = overlap.pop("overlap_area")
+
+    if keepGeometry:
+        #  Add the exact geometry, for plotting
+        if known:
+            model_known["geometry"] = shapely.intersection(
+                np.asarray(model_known.geometry), known_region(oil, no_oil)["geometry"]
+            )
+        overlap = gpd.GeoDataFrame(
+            overlap,
+            geometry=shapely.intersection(
+                np.asarray(model_known.geometry)[overlap["__idx1"].to_numpy()],
+                np.asarray(oil.geometry)[overlap["__idx2"].to_numpy()],
+            ),
+            crs=oil.crs,
+        )
+
+    overlap.drop(["__idx1", "__idx2"], axis=1, inplace=True)
+    overlap.reset_index(drop=True, inplace=True)
+
+    return oil, model_known, overlap
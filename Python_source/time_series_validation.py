@@ -0,0 +1,255 @@
+"""
+Script name: time_series_validation.py
+Purpose: Script to validate every timestamp of a test case (e.g. the three validation times of validation_data/Corsica) in a single
+pass, rather than invoking Calc_2D_MOE_GeoJSON.py once per time. The times are validated in order within one process, so the
+libraries are loaded and the coordinate reference systems set up once, and observation files shared between times (such as the
+undated coastal reports of Sea_Empress) are read, converted and dissolved once and then kept in memory. The 2-D MOE and skill
+score results of every time are written to one trajectory table in CSV format, and a single 2-D MOE scatter plot showing how the
+skill evolves over the validation times is produced for each model output type.
+Usage: ./time_series_validation.py <caseDir> [--modelType MODELTYPE] [--valType VALTYPE] [--crs CRS] [--engine ENGINE]
+                                   [--resolution RESOLUTION] [--bufwidth BUFWIDTH] [--tileVertices TILEVERTICES] [--simplify SIMPLIFY] [--gridSize GRIDSIZE]
+                                   [--cacheDir CACHEDIR] [--reader READER] [--output OUTPUT] [--plotDir PLOTDIR] [--plots PLOTS] [--logDir LOGDIR] [-h]
+        <caseDir>     - Required. Path to a test case directory containing GeoJSON files named according to the convention used in
+                        validation_data (see batch_validation.py)
+        <--modelType> - Optional. Restrict the validation to either 'BE' or 'Prob' (default is to run both)
+        <--valType>   - Optional. Override the validation type ('Satellite' or 'Coastal') inferred from the filenames
+        <--crs>       - Optional. Integer code of the coordinate reference system to convert to (default 3857)
+        <--engine>    - Optional. Method used to calculate the overlap areas, either 'index' (default), 'overlay', 'raster', 'line' or 'tiled'
+        <--resolution> - Optional. Width in metres of the grid cells used by the 'raster' engine
+        <--bufwidth>  - Optional. Width in metres of the coastline buffer, or matching tolerance of the 'line' engine (default 5)
+        <--tileVertices> - Optional. Largest number of vertices in a tile for the 'tiled' engine (default 50000)
+        <--simplify>  - Optional. Maximum relative change in area (or length) allowed when simplifying the geometries, e.g. 0.001
+        <--gridSize>  - Optional. Size in metres of the grid to snap the input geometries to before the dissolve and overlay, which run at
+                        full precision (see precision_geometry.py)
+        <--cacheDir>  - Optional. Directory used to cache the obs files once converted to crs and dissolved (see geometry_cache.py)
+        <--reader>    - Optional. Method used to read the GeoJSON files, either 'gdal' (default), 'fast' or 'stream'
+        <--output>    - Optional. Path of the trajectory table (default time_series_results.csv)
+        <--plotDir>   - Optional. Directory in which to save the trajectory plots (default /media)
+        <--plots>     - Optional. Either 'png' (default) to plot the trajectories, or 'none' to write the table only
+        <--logDir>    - Optional. Directory in which to write the log output of each time (default is to discard it)
+        <--help>      - Optional. Shows help text.
+"""
+
+##### IMPORT RELEVANT LIBRARIES
+
+import argparse
+import os
+import time as timer
+
+import pandas as pd
+
+from batch_validation import RESULT_COLUMNS, discover_cases, run_case
+from process_data import DEFAULT_BUFWIDTH
+from render_plots import render_plots
+
+#####
+
+
+def run_time_series(cases, logDir=None, cacheDir=None, reader="gdal"):
+    #  Function to validate a series of cases (e.g. the validation times of a test case) in order within the current
+    #  process, keeping the obs files in memory once read, so that any obs shared between the cases are only read,
+    #  converted and dissolved once
+    #
+    #   Input arguments:
+    #
+    #   cases    - list of case dictionaries, as returned by batch_validation.discover_cases
+    #   logDir   - directory in which to write the log output of each case (None to discard it)
+    #   cacheDir - directory of the geometry cache used to read the obs files (None to read them directly)
+    #   reader   - method used to read the GeoJSON files, either 'gdal', 'fast' or 'stream'
+    #
+    #   Output arguments:
+    #
+    #   results - pandas DataFrame with the results of every case (with columns as given by RESULT_COLUMNS),
+    #             sorted by model output type, validation type, time and contour level
+
+    if logDir is not None:
+        os.makedirs(logDir, exist_ok=True)
+
+    store = {}
+    rows = []
+    for case in cases:
+        start = timer.perf_counter()
+        caseRows = run_case(case, logDir, cacheDir, reader, store)
+        print(
+            "Validated ",
+            os.path.basename(case["modelFile"]),
+            " in ",
+            round(timer.perf_counter() - start, 2),
+            " s : ",
+            caseRows[0]["status"],
+        )
+        rows.extend(caseRows)
+
+    results = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    results = results.sort_values(
+        by=["modelType", "valType", "time", "contourlev"], kind="stable"
+    ).reset_index(drop=True)
+
+    return results
+
+
+def trajectory_plot_jobs(results, plotDir):
+    #  Function to return the render jobs (see render_plots.py) of the 2-D MOE trajectory plots, one for each
+    #  combination of model output type and validation type with any successful validations
+
+    jobs = []
+    ok = results[results["status"] == "ok"]
+    for (modelType, valType), group in ok.groupby(["modelType", "valType"]):
+        casename = group["casename"].iloc[0]
+        jobs.append(
+            {
+                "function": "plot_2D_MOE_trajectory",
+                "args": (group[["time", "contourlev", "x", "y"]], casename, modelType),
+                "png": os.path.join(
+                    plotDir,
+                    "2D_MOE_trajectory_"
+                    + str(casename)
+                    + "_"
+                    + str(modelType)
+                    + "_"
+                    + str(valType)
+                    + ".png",
+                ),
+            }
+        )
+
+    return jobs
+
+
+def main():
+
+    ##### READ IN COMMAND LINE ARGUMENTS
+
+    parser = argparse.ArgumentParser(
+        description="""
+        Purpose: Script to run the 2-D MOE validation for every validation time of a test case in a single pass,
+        reusing the observation files shared between times. The results are written to one trajectory table, and the
+        2-D MOE of all times is plotted on one scatter diagram.""",
+        epilog="Example of use: ./time_series_validation.py ../validation_data/Corsica --modelType BE",
+    )
+    parser.add_argument(
+        "caseDir",
+        help="Required. Path to a test case directory, e.g. validation_data/Corsica",
+        type=str,
+    )
+    parser.add_argument(
+        "--modelType",
+        help="Optional. Type of model output to validate, either 'BE' or 'Prob'. Default is to run both",
+        type=str,
+        choices=["BE", "Prob"],
+    )
+    parser.add_argument(
+        "--valType",
+        help="Optional. Validation type, either 'Satellite' or 'Coastal'. Inferred from the filenames if not given",
+        type=str,
+        choices=["Satellite", "Coastal"],
+    )
+    parser.add_argument(
+        "--crs",
+        help="Optional integer specifying the crs code to convert obs and model data to. Default value is 3857",
+        type=int,
+        default=3857,
+    )
+    parser.add_argument(
+        "--engine",
+        help="Optional method used to calculate the overlap areas, either 'index' (default), 'overlay', 'raster', 'line' or 'tiled'",
+        type=str,
+        choices=["index", "overlay", "raster", "line", "tiled"],
+        default="index",
+    )
+    parser.add_argument(
+        "--resolution",
+        help="Optional width in metres of the grid cells used by the 'raster' engine",
+        type=float,
+    )
+    parser.add_argument(
+        "--bufwidth",
+        help="Optional width in metres of the coastline buffer, or matching tolerance of the 'line' engine. Default value is 5",
+        type=float,
+        default=DEFAULT_BUFWIDTH,
+    )
+    parser.add_argument(
+        "--tileVertices",
+        help="Optional largest number of vertices in a tile for the 'tiled' engine. Default value is 50000",
+        type=int,
+    )
+    parser.add_argument(
+        "--simplify",
+        help="Optional maximum relative change in area (or length) allowed when simplifying the geometries, e.g. 0.001",
+        type=float,
+    )
+    parser.add_argument(
+        "--gridSize",
+        help="Optional size in metres of the grid to snap the input geometries to before the dissolve and overlay (which run at \
+                            full precision), e.g. 1",
+        type=float,
+    )
+    parser.add_argument(
+        "--cacheDir",
+        help="Optional directory in which to cache the obs files, once converted to crs and dissolved",
+        type=str,
+    )
+    parser.add_argument(
+        "--reader",
+        help="Optional method used to read the GeoJSON files, either 'gdal' (default), 'fast' or 'stream'",
+        type=str,
+        choices=["gdal", "fast", "stream"],
+        default="gdal",
+    )
+    parser.add_argument(
+        "--output",
+        help="Optional path of the trajectory table. Default is time_series_results.csv",
+        type=str,
+        default="time_series_results.csv",
+    )
+    parser.add_argument(
+        "--plotDir",
+        help="Optional directory in which to save the trajectory plots. Default is /media",
+        type=str,
+        default="/media",
+    )
+    parser.add_argument(
+        "--plots",
+        help="Optional choice of plots to produce, either 'png' (default) or 'none'",
+        type=str,
+        choices=["none", "png"],
+        default="png",
+    )
+    parser.add_argument(
+        "--logDir",
+        help="Optional directory in which to write the log output of each validation time",
+        type=str,
+    )
+
+    args = parser.parse_args()
+
+    #####
+
+    ##### VALIDATE EVERY TIME, THEN WRITE OUT AND PLOT THE TRAJECTORY
+
+    cases = discover_cases(
+        args.caseDir,
+        args.modelType,
+        args.valType,
+        args.crs,
+        args.engine,
+        args.resolution,
+        args.bufwidth,
+        args.simplify,
+        args.gridSize,
+        args.tileVertices,
+    )
+    print("Number of validation times to run : ", len(cases))
+
+    results = run_time_series(cases, args.logDir, args.cacheDir, args.reader)
+    results.to_csv(args.output, index=False)
+    print("Trajectory table written to : ", args.output)
+
+    if args.plots != "none":
+        render_plots(trajectory_plot_jobs(results, args.plotDir))
+
+    #####
+
+
+if __name__ == "__main__":
+    main()
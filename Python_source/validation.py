@@ -0,0 +1,515 @@
+import contextlib
+import io
+import os
+
+import geopandas as gpd
+import pandas as pd
+
+from calc_metrics import calc_2DMOE, calc_area_ss, calc_centroid_ss
+from geometry_cache import DEFAULT_CACHE_SIZE
+from instrumentation import stage
+from process_data import (
+    DEFAULT_BUFWIDTH,
+    calc_poly_overlap,
+    centroid_model,
+    moe_columns,
+    prepare_inputs,
+    read_geofile,
+    read_geojson,
+)
+from render_plots import DEFAULT_TOLERANCES, render_plots
+
+
+class ValidationResult:
+    #  Class holding the results of the validation of a model prediction against observations (see validate)
+    #
+    #   casename, time     - name and validity time of the case study, from the model data
+    #   model_type         - model output type, either 'BE' or 'Prob'
+    #   val_type           - type of validation, either 'Satellite' or 'Coastal'
+    #   engine             - method used to calculate the overlap areas (see process_data.calc_poly_overlap)
+    #   oil, model_known, overlap - geodataframes returned by calc_poly_overlap, with the areas (or coastline lengths)
+    #   inputs             - tuple of the oil, model and no_oil geodataframes before the overlap was calculated
+    #                        (used to plot the coastal and interactive maps)
+    #   levels             - contour/probability levels of the model
+    #   moe                - pandas DataFrame with one row per contour level that overlaps the obs, with columns contourlev,
+    #                        obs_area, area_full_contour, overlap_full_contour (coastline lengths for the 'line' engine),
+    #                        the 2-D MOE components x and y, and the areas of false negative (Afn) and false positive (Afp)
+    #   Ass, Css           - area and centroid skill scores (None except for BE output against satellite data)
+    #   centroids          - tuple of the obs centroid, model centroid and the corners of the obs bounding box, as returned
+    #                        by calc_centroid_ss (None except for BE output against satellite data)
+    #   fss                - pandas DataFrame of the Fractions Skill Score of each contour level against neighbourhood width,
+    #                        as returned by calc_fss.calc_fss_curves (None unless requested, and for satellite validation only)
+    #   simplify_stats     - dictionary of the simplification statistics (empty unless the inputs were simplified)
+    #   precision_stats    - dictionary of the statistics of snapping to a grid (empty unless a grid_size was given), i.e. the
+    #                        largest relative change in area (precision_drift) and the number of geometries repaired
+    #   figures            - dictionary of matplotlib figures, keyed by plot name (empty unless requested)
+    #   profile            - profile of the time and memory of each stage of the run (None unless recorded; see instrumentation.py)
+
+    def __init__(self, **attributes):
+        self.figures = {}
+        self.simplify_stats = {}
+        self.precision_stats = {}
+        self.profile = None
+        self.fss = None
+        for name, value in attributes.items():
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return "<ValidationResult %s %s %s/%s: %d levels with overlap, Ass=%s, Css=%s>" % (
+            self.casename,
+            self.time,
+            self.model_type,
+            self.val_type,
+            len(self.moe),
+            self.Ass,
+            self.Css,
+        )
+
+    def summary(self):
+        #  Return the 2-D MOE table, with the case details and skill scores added as columns (and the change in area due
+        #  to snapping the geometries to a grid, if they were snapped)
+
+        summary = self.moe.copy()
+        summary.insert(0, "casename", self.casename)
+        summary.insert(1, "time", self.time)
+        summary.insert(2, "modelType", self.model_type)
+        summary.insert(3, "valType", self.val_type)
+        summary["Ass"] = self.Ass
+        summary["Css"] = self.Css
+        for name, value in self.precision_stats.items():
+            summary[name] = value
+
+        return summary
+
+    def plot_jobs(self, plotDir="/media", plots="all", mapTolerance=DEFAULT_TOLERANCES):
+        #  Return the render jobs (see render_plots.py) of the plots of the results, as produced by Calc_2D_MOE_GeoJSON.py.
+        #  plots is either 'all' (png plots and the interactive map), 'png' or 'none'. The overlap geometry is needed for
+        #  the area maps and interactive map, so the validation must have been run with keep_geometry for these.
+
+        jobs = []
+        if plots == "none":
+            return jobs
+
+        casename, time, modelType, valType = self.casename, self.time, self.model_type, self.val_type
+        oil, model, no_oil = self.inputs
+
+        def filename(*parts):
+            return os.path.join(plotDir, "_".join(str(part) for part in parts))
+
+        if valType == "Coastal":
+            #  Basic plot of the model coastal prediction with the obs regions highlighted
+            #  (obs read from the cache have been converted to crs already, so convert them back to the crs of the model)
+            jobs.append(
+                {
+                    "function": "plot_coastal_maps",
+                    "args": (oil.to_crs(model.crs), model, casename, time, modelType),
+                    "kwargs": {
+                        "noOil": None if no_oil is None else no_oil.to_crs(model.crs),
+                        "levels": self.input_levels,
+                    },
+                    "png": filename("Coastal_map", casename, modelType, time) + ".png",
+                }
+            )
+
+        if plots == "all":
+            #  Interactive map of the obs, model and overlap regions in html format. The map of a coastal validation
+            #  shows the coastlines themselves, rather than the buffered coastlines
+            mapLayers = (self.oil, self.model_known, no_oil) if valType == "Satellite" else self.inputs
+            htmlFile = filename("Interactive_map", casename, modelType, time) + ".html"
+            jobs.append(
+                {
+                    "function": "write_interactive_map",
+                    "args": (htmlFile, mapLayers[0], mapLayers[1], casename, time),
+                    "kwargs": {
+                        "overlap": self.overlap,
+                        "noOil": mapLayers[2],
+                        "tolerances": mapTolerance,
+                    },
+                    "html": htmlFile,
+                }
+            )
+
+        if not self.overlap.empty:
+            if valType == "Satellite":
+                jobs.append(
+                    {
+                        "function": "plot_area_maps",
+                        "args": (self.oil, self.model_known, self.overlap, casename, time, modelType),
+                        "kwargs": {"levels": self.levels},
+                        "png": filename("Area_maps", casename, modelType, time) + ".png",
+                    }
+                )
+            jobs.append(
+                {
+                    "function": "plot_2D_MOE_scat",
+                    "args": (self.moe["x"], self.moe["y"], modelType, casename, time),
+                    "kwargs": {"levels": self.moe["contourlev"].to_numpy()}
+                    if modelType == "Prob"
+                    else {},
+                    "png": filename("2D_MOE", casename, modelType, valType, time) + ".png",
+                }
+            )
+
+        if self.centroids is not None:
+            obs_centroid, model_centroid, minpoint, maxpoint = self.centroids
+            jobs.append(
+                {
+                    "function": "plot_centroid_map",
+                    "args": (
+                        self.oil,
+                        obs_centroid,
+                        self.model_known,
+                        model_centroid,
+                        minpoint,
+                        maxpoint,
+                        casename,
+                        time,
+                    ),
+                    "png": filename("Centroid_map", casename, time) + ".png",
+                }
+            )
+            jobs.append(
+                {
+                    "function": "plot_ss_scat",
+                    "args": (self.Ass, self.Css, casename, time),
+                    "png": filename("Skillscores_scatterplot", casename, time) + ".png",
+                }
+            )
+
+        return jobs
+
+    def make_figures(self):
+        #  Draw the png plots of the results as matplotlib figures (see plot_maps_metrics.py), without saving them,
+        #  and keep them in the figures dictionary, keyed by the name of the plotting function
+
+        import plot_maps_metrics
+
+        for job in self.plot_jobs(plots="png"):
+            fig = getattr(plot_maps_metrics, job["function"])(*job["args"], **job.get("kwargs", {}))
+            if isinstance(fig, tuple):
+                #  Some plotting functions also return the axis object
+                fig = fig[0]
+            self.figures[job["function"]] = fig
+
+        return self.figures
+
+    def save_plots(self, plotDir, plots="all", mapTolerance=DEFAULT_TOLERANCES, workers=None):
+        #  Render the plots of the results to files in plotDir (see render_plots.py), and return the list of files written
+
+        return render_plots(self.plot_jobs(plotDir, plots, mapTolerance), workers)
+
+
+def validate(
+    obs,
+    model,
+    no_oil=None,
+    model_type="BE",
+    val_type="Satellite",
+    crs=3857,
+    engine="index",
+    resolution=None,
+    bufwidth=DEFAULT_BUFWIDTH,
+    tile_vertices=None,
+    tile_workers=None,
+    simplify=None,
+    grid_size=None,
+    fss_scales=None,
+    fss_resolution=None,
+    keep_geometry=False,
+    figures=False,
+    reader="gdal",
+    cache_dir=None,
+    cache_size=DEFAULT_CACHE_SIZE,
+    verbose=False,
+    store=None,
+):
+    #  Function to validate a model prediction against observations, performing the same steps as Calc_2D_MOE_GeoJSON.py
+    #  and returning the results as a ValidationResult. The obs, model and no oil data can be given either as GeoJSON file
+    #  paths or as geodataframes already in memory (e.g. produced directly by a model), which are not modified. No files
+    #  are written, and only the files given as paths (and the geometry cache, if cache_dir is given) are read.
+    #
+    #   Input arguments:
+    #
+    #   obs           - path to the oil observation file, or geodataframe containing the oil observations
+    #   model         - path to the model prediction file, or geodataframe containing the model prediction
+    #   no_oil        - path to, or geodataframe defining, the observation region where no oil was detected (None if not available)
+    #   model_type    - Model output type. Either 'BE' for best estimate, or 'Prob' for probabilistic
+    #   val_type      - Type of obs data to validate against, either 'Satellite' or 'Coastal'
+    #   crs           - Integer specifying the coordinate reference system to convert the data to
+    #   engine        - Method used to calculate the overlap areas (see process_data.calc_poly_overlap)
+    #   resolution    - Width of the grid cells in metres for the 'raster' engine (None to choose automatically)
+    #   bufwidth      - Width in metres of the coastline buffer, or matching tolerance of the 'line' engine
+    #   tile_vertices - Largest number of vertices in a tile for the 'tiled' engine (None for the default)
+    #   tile_workers  - Number of worker processes for the 'tiled' engine (None for one per tile, up to the number of CPUs)
+    #   simplify      - Maximum relative change in area (or length) allowed when simplifying the geometries (None to keep them)
+    #   grid_size     - Size in metres (in the units of crs) of the grid to snap the input geometries to before the dissolve
+    #                   and overlay, which run at full precision (None to keep their full precision; see precision_geometry.py)
+    #   fss_scales    - Neighbourhood widths (odd numbers of grid cells) over which to calculate the Fractions Skill Score of
+    #                   each contour level, for satellite validation (None to skip it; see calc_fss.py)
+    #   fss_resolution - Width in metres of the grid cells used for the Fractions Skill Score (None to choose automatically)
+    #   keep_geometry - If True, keep the geometry of the overlap regions (needed for the area and interactive maps)
+    #   figures       - If True, also draw the png plots as matplotlib figures (see ValidationResult.make_figures)
+    #   reader        - Method used to read any GeoJSON files, either 'gdal', 'fast' or 'stream'
+    #   cache_dir     - Optional directory of the geometry cache used to read the obs files (see geometry_cache.py). If the
+    #                   inputs are given as files, the results of the geometry stage are also memoized there (see result_cache.py)
+    #   cache_size    - Maximum size (in bytes) of the cache directory
+    #   verbose       - If True, print the progress and results of the validation, as Calc_2D_MOE_GeoJSON.py does
+    #   store         - Optional dictionary in which obs read from file are kept in memory for reuse (see read_geojson)
+    #
+    #   Output arguments:
+    #
+    #   result - ValidationResult holding the areas, overlaps, 2-D MOE and skill scores
+
+    with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+        fromFiles = all(isinstance(data, (str, os.PathLike)) for data in (obs, model)) and not isinstance(
+            no_oil, gpd.GeoDataFrame
+        )
+
+        #  The results of the geometry stage (reading, simplification and calc_poly_overlap) depend only on the input
+        #  files and the options below, so if the inputs are files and a cache directory is given, they are memoized
+        #  there (see result_cache.py), and a later run with the same inputs and options (e.g. to change the plots)
+        #  goes straight to the metrics
+        key, geometry = None, None
+        if fromFiles and cache_dir is not None:
+            from result_cache import load_result, result_key
+
+            key = result_key(
+                [obs, model, no_oil],
+                {
+                    "crs": crs,
+                    "model_type": model_type,
+                    "val_type": val_type,
+                    "engine": engine,
+                    "resolution": resolution,
+                    "bufwidth": bufwidth,
+                    "tile_vertices": tile_vertices,
+                    "simplify": simplify,
+                    "grid_size": grid_size,
+                    "keep_geometry": keep_geometry or figures,
+                    "reader": reader,
+                },
+            )
+            geometry = load_result(key, cache_dir)
+
+        if geometry is None:
+            geometry = geometry_stage(
+                obs,
+                model,
+                no_oil,
+                model_type,
+                val_type,
+                crs,
+                fromFiles,
+                engine,
+                resolution,
+                bufwidth,
+                tile_vertices,
+                tile_workers,
+                simplify,
+                grid_size,
+                keep_geometry or figures,
+                reader,
+                cache_dir,
+                cache_size,
+                store,
+            )
+            if key is not None:
+                from result_cache import save_result
+
+                save_result(key, geometry, cache_dir, cache_size)
+
+        casename, time = geometry["casename"], geometry["time"]
+        oil_out, model_known = geometry["oil"], geometry["model_known"]
+        overlap, plevs = geometry["overlap"], geometry["levels"]
+
+        with stage("metrics"):
+            #  Names of the columns holding the observed, predicted and overlap areas (or coastline lengths)
+            obsCol, predCol, overlapCol = moe_columns(engine)
+
+            if overlap.empty:
+                Aob = oil_out[obsCol]
+                Apr = model_known[predCol]
+                print("Overlap geodataframe is empty; skipping 2-D MOE calculation")
+                moe = pd.DataFrame(
+                    columns=["contourlev", "obs_area", "area_full_contour", "overlap_full_contour", "x", "y", "Afn", "Afp"]
+                )
+            else:
+                #  Calculate the 2-D MOE (see Warner et al 2004., J. Appl. Met)
+                Aob = overlap[obsCol]
+                Apr = overlap[predCol]
+                Aov = overlap[overlapCol]
+                (x, y) = calc_2DMOE(Aob, Apr, Aov)
+                moe = pd.DataFrame(
+                    {
+                        "contourlev": overlap["contourlev"].to_numpy(),
+                        "obs_area": Aob.to_numpy(),
+                        "area_full_contour": Apr.to_numpy(),
+                        "overlap_full_contour": Aov.to_numpy(),
+                        "x": x.to_numpy(),
+                        "y": y.to_numpy(),
+                        "Afn": ((1 - x) * Aob).to_numpy(),
+                        "Afp": ((1 - y) * Apr).to_numpy(),
+                    }
+                )
+
+            #  For satellite validation against deterministic output, calculate the additional skill scores
+            Ass, Css, centroids = None, None, None
+            if val_type == "Satellite" and model_type == "BE":
+                print("Area (in km^2) of observed spill is : ", Aob.iloc[0])
+                print("Area (in km^2) of modelled spill is : ", Apr.iloc[0])
+
+                Ass = calc_area_ss(Aob.iloc[0], Apr.iloc[0])
+                print("Area skill score is : ", Ass)
+
+                #  (the 'tiled' engine gives the centroid of the model within the known observation region, without clipping it)
+                Css, obs_centroid, model_centroid, minpoint, maxpoint = calc_centroid_ss(
+                    oil_out, centroid_model(model_known)
+                )
+                print("Centroid skill score is : ", Css)
+                centroids = (obs_centroid, model_centroid, minpoint, maxpoint)
+
+        #  Calculate the Fractions Skill Score of each contour level over a range of neighbourhood widths (see calc_fss.py)
+        fss = None
+        if fss_scales is not None and val_type == "Satellite":
+            with stage("fss"):
+                from calc_fss import calc_fss_curves, prepare_fss_obs, useful_scales
+
+                no_oil = geometry["inputs"][2]
+                if no_oil is not None:
+                    no_oil = no_oil.to_crs(oil_out.crs)
+                fss = calc_fss_curves(
+                    prepare_fss_obs(oil_out, no_oil, model_known, fss_resolution, fss_scales), model_known
+                )
+                print("Smallest skilful neighbourhood width (in km) of each contour level : ")
+                print(useful_scales(fss).to_string(index=False))
+
+        result = ValidationResult(
+            casename=casename,
+            time=time,
+            model_type=model_type,
+            val_type=val_type,
+            engine=engine,
+            oil=oil_out,
+            model_known=model_known,
+            overlap=overlap,
+            inputs=geometry["inputs"],
+            input_levels=geometry["input_levels"],
+            levels=plevs,
+            moe=moe,
+            Ass=Ass,
+            Css=Css,
+            centroids=centroids,
+            fss=fss,
+            simplify_stats=geometry["simplify_stats"],
+            precision_stats=geometry["precision_stats"],
+        )
+
+        if figures:
+            result.make_figures()
+
+    return result
+
+
+def geometry_stage(
+    obs,
+    model,
+    no_oil,
+    model_type,
+    val_type,
+    crs,
+    fromFiles,
+    engine,
+    resolution,
+    bufwidth,
+    tile_vertices,
+    tile_workers,
+    simplify,
+    grid_size,
+    keep_geometry,
+    reader,
+    cache_dir,
+    cache_size,
+    store,
+):
+    #  Function to perform the geometry stage of validate: read (or check) the inputs, simplify them if requested, and
+    #  calculate the areas and overlaps with calc_poly_overlap. The arguments are as for validate, with fromFiles True
+    #  if the obs and model are given as file paths.
+    #
+    #   Output arguments:
+    #
+    #   stage - dictionary with the casename and time of the case, the inputs and input_levels (as passed to
+    #           calc_poly_overlap), the simplify_stats and precision_stats, and the oil, model_known, overlap and levels returned by calc_poly_overlap
+
+    if fromFiles:
+        oil, model, no_oil, casename, time, plevs = read_geojson(
+            obs, model, no_oil, model_type, val_type, crs, cache_dir, cache_size, reader, store
+        )
+    else:
+        oil, model, no_oil, casename, time, plevs = prepare_inputs(
+            as_geodataframe(obs, reader),
+            as_geodataframe(model, reader),
+            None if no_oil is None else as_geodataframe(no_oil, reader),
+            model_type,
+            val_type,
+        )
+
+    simplifyStats = {}
+    if simplify is not None:
+        #  Reduce the number of vertices of the obs and model geometries, within the given bound on the area change
+        from simplify_geometry import simplify_inputs
+
+        oil, model, no_oil, simplifyStats = simplify_inputs(oil, model, no_oil, simplify, crs)
+        print("Largest relative change in area due to simplification : ", simplifyStats["simplify_error"])
+        print("Fraction of vertices removed by simplification : ", simplifyStats["vertex_reduction"])
+
+    precisionStats = {}
+    if grid_size is not None:
+        #  Snap the obs and model geometries to a fixed-precision grid (in crs), repairing any invalid geometry
+        from precision_geometry import snap_inputs
+
+        oil, model, no_oil, precisionStats = snap_inputs(oil, model, no_oil, grid_size, crs)
+        print("Largest relative change in area due to snapping to the grid : ", precisionStats["precision_drift"])
+
+    #  (calc_poly_overlap only uses its noOilFile argument to tell whether there is a no oil region)
+    oil_out, model_known, overlap, levels = calc_poly_overlap(
+        oil,
+        model,
+        no_oil,
+        casename,
+        time,
+        no_oil,
+        model_type,
+        val_type,
+        crs,
+        engine=engine,
+        keepGeometry=keep_geometry,
+        resolution=resolution,
+        bufwidth=bufwidth,
+        tileVertices=tile_vertices,
+        workers=tile_workers,
+    )
+
+    return {
+        "casename": casename,
+        "time": time,
+        "inputs": (oil, model, no_oil),
+        "input_levels": plevs,
+        "simplify_stats": simplifyStats,
+        "precision_stats": precisionStats,
+        "oil": oil_out,
+        "model_known": model_known,
+        "overlap": overlap,
+        "levels": levels,
+    }
+
+
+def as_geodataframe(data, reader="gdal"):
+    #  Function to return obs/model data given either as a path to a GeoJSON file or as a geodataframe. Geodataframes
+    #  are copied (with a fresh index, as assumed by the checks in process_data.py) so that the caller's data are not modified.
+
+    if isinstance(data, gpd.GeoDataFrame):
+        assert data.crs is not None, "Geodataframe has no coordinate reference system"
+        return data.reset_index(drop=True)
+
+    assert os.path.exists(data), "File does not exist: %r" % data
+    return read_geofile(data, reader)
@@ -0,0 +1,75 @@
+"""
+Script name: validation_client.py
+Purpose: Thin client of the validation service (see validation_service.py). It accepts the same command line arguments as
+Calc_2D_MOE_GeoJSON.py, sends them to the service to be run by a warm worker process, and prints the output of the validation
+as Calc_2D_MOE_GeoJSON.py would. Only the Python standard library is imported, so the client starts quickly.
+Usage: ./validation_client.py [--server SERVER] [--json] <arguments of Calc_2D_MOE_GeoJSON.py>
+        <--server> - Optional. URL of the validation service (default http://127.0.0.1:8765)
+        <--json>   - Optional. Print the JSON response of the service (results, plot files written, output) instead
+        <--help>   - Optional. Shows the help text of Calc_2D_MOE_GeoJSON.py, as returned by the service.
+"""
+
+import argparse
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+
+DEFAULT_SERVER = "http://127.0.0.1:8765"
+
+
+def submit(argv, server=DEFAULT_SERVER, cwd=None):
+    #  Function to send a validation job to the service and return its response
+    #
+    #   Input arguments:
+    #
+    #   argv   - list of the command line arguments of Calc_2D_MOE_GeoJSON.py
+    #   server - URL of the validation service
+    #   cwd    - directory relative to which the paths in argv are resolved (None for the current directory)
+    #
+    #   Output arguments:
+    #
+    #   code     - HTTP status code of the response
+    #   response - dictionary with the response of the service (see validation_service.run_job)
+
+    body = json.dumps({"argv": argv, "cwd": cwd or os.getcwd()}).encode("utf-8")
+    request = urllib.request.Request(
+        server.rstrip("/") + "/validate",
+        data=body,
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request) as reply:
+            return reply.status, json.loads(reply.read())
+    except urllib.error.HTTPError as err:
+        return err.code, json.loads(err.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument("--server", type=str, default=DEFAULT_SERVER)
+    parser.add_argument("--json", action="store_true")
+    args, argv = parser.parse_known_args()
+
+    try:
+        code, response = submit(argv, args.server)
+    except urllib.error.URLError as err:
+        print("Could not connect to the validation service at ", args.server, " : ", err.reason, file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(response, indent=1))
+    else:
+        print(response.get("log", ""), end="")
+        if "error" in response:
+            print("Validation failed : ", response["error"], file=sys.stderr)
+
+    if response["status"] == "invalid arguments":
+        sys.exit(2)
+    if code != 200:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
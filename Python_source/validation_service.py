@@ -0,0 +1,321 @@
+"""
+Script name: validation_service.py
+Purpose: Script to run a resident validation service, so that the cost of starting Python and importing geopandas, pyproj and
+matplotlib is paid once rather than for every validation. The service is a local HTTP server that accepts validation jobs
+with the same arguments as Calc_2D_MOE_GeoJSON.py, runs them concurrently on a bounded pool of warm worker processes, and
+returns the results in JSON format. Each worker keeps the obs files it has read in memory (converted to crs and dissolved),
+so that later jobs against the same observations skip reading them. Jobs are submitted with validation_client.py, or by
+POSTing a JSON object {"argv": [...], "cwd": "..."} to /validate, where argv holds the command line arguments of
+Calc_2D_MOE_GeoJSON.py and relative paths are taken relative to cwd. The state of the service is returned by GET /health.
+If a worker process dies (e.g. killed for running out of memory), the jobs running on the pool fail, the pool is replaced
+with a new one, and /health reports the service as degraded, with the number of times the pool has been replaced.
+Usage: ./validation_service.py [--host HOST] [--port PORT] [--workers WORKERS] [--queue QUEUE] [-h]
+        <--host>    - Optional. Address to listen on (default 127.0.0.1, i.e. local connections only)
+        <--port>    - Optional. Port to listen on (default 8765)
+        <--workers> - Optional. Number of worker processes running validations (default is the number of CPUs)
+        <--queue>   - Optional. Number of jobs that may wait for a free worker before further jobs are refused (default 16)
+        <--help>    - Optional. Shows help text.
+"""
+
+##### IMPORT RELEVANT LIBRARIES
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import threading
+import time as timer
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from Calc_2D_MOE_GeoJSON import build_parser, run_validation
+
+#####
+
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE = 16
+
+#  Arguments of Calc_2D_MOE_GeoJSON.py holding paths, which are resolved relative to the working directory of the client
+PATH_ARGUMENTS = ["obsFile", "modelFile", "noOilFile", "cacheDir", "output", "fss", "timings", "profile"]
+
+#  Maximum number of obs files kept in memory by each worker process (the oldest are dropped first)
+MAX_STORED_OBS = 32
+
+#  Obs kept in memory by a worker process, converted to crs and dissolved (see process_data.read_geojson)
+WORKER_STORE = {}
+
+
+def warm_worker():
+    #  Function to import the libraries used by the validation and plotting in a new worker process, so that the
+    #  first job sent to the worker does not pay the cost of importing them
+
+    from render_plots import use_agg
+
+    use_agg()
+    import interactive_map
+    import plot_maps_metrics
+
+
+def start_pool(workers):
+    #  Function to start a pool of worker processes and warm them (see warm_worker), so that they are ready for jobs
+    #
+    #   Input arguments:
+    #
+    #   workers - number of worker processes
+    #
+    #   Output arguments:
+    #
+    #   pool - ProcessPoolExecutor running the worker processes
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=warm_worker)
+    list(pool.map(abs, range(workers)))
+
+    return pool
+
+
+def run_job(args):
+    #  Function to run one validation job in a worker process, capturing the output that Calc_2D_MOE_GeoJSON.py
+    #  would print
+    #
+    #   Input arguments:
+    #
+    #   args - argparse namespace of the command line arguments of the job (see Calc_2D_MOE_GeoJSON.build_parser)
+    #
+    #   Output arguments:
+    #
+    #   response - dictionary with the status of the job ('ok' or 'failed'), the 2-D MOE and skill scores of each
+    #              contour level (results), the FSS curves (fss, if requested), the plot files written (files), the
+    #              printed output (log), the error (if any) and the time taken (seconds)
+
+    start = timer.perf_counter()
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            result, files = run_validation(args, WORKER_STORE)
+        response = {
+            "status": "ok",
+            "results": json.loads(result.summary().to_json(orient="records")),
+            "simplify_stats": result.simplify_stats,
+            "files": files,
+        }
+        if result.profile is not None:
+            response["profile"] = result.profile
+        if result.fss is not None:
+            response["fss"] = json.loads(result.fss.to_json(orient="records"))
+    except Exception as err:
+        response = {"status": "failed", "error": repr(err)}
+
+    while len(WORKER_STORE) > MAX_STORED_OBS:
+        WORKER_STORE.pop(next(iter(WORKER_STORE)))
+
+    response["log"] = log.getvalue()
+    response["seconds"] = timer.perf_counter() - start
+
+    return response
+
+
+def parse_job(job):
+    #  Function to parse the command line arguments of a job, as sent in the body of a request to /validate
+    #
+    #   Input arguments:
+    #
+    #   job - dictionary with the command line arguments of Calc_2D_MOE_GeoJSON.py (argv, a list of strings),
+    #         and optionally the directory relative to which paths are resolved (cwd)
+    #
+    #   Output arguments:
+    #
+    #   args     - argparse namespace of the arguments (None if they could not be parsed, or help was requested)
+    #   response - dictionary returned to the client if args is None, with the usage or error message (log)
+
+    argv = job.get("argv") if isinstance(job, dict) else None
+    if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+        return None, {"status": "invalid arguments", "log": "Request must contain argv, a list of strings\n"}
+
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            parser = build_parser()
+            parser.prog = "Calc_2D_MOE_GeoJSON.py"
+            args = parser.parse_args(argv)
+    except SystemExit as exit:
+        status = "help" if exit.code == 0 else "invalid arguments"
+        return None, {"status": status, "log": log.getvalue()}
+
+    #  Resolve relative paths against the working directory of the client
+    cwd = job.get("cwd") or os.getcwd()
+    for name in PATH_ARGUMENTS:
+        path = getattr(args, name)
+        if path is not None:
+            setattr(args, name, os.path.join(cwd, path))
+
+    #  Plots are rendered, and tiles of the 'tiled' engine processed, within the worker process running the job
+    args.plotWorkers = 1
+    args.tileWorkers = 1
+
+    return args, None
+
+
+class ValidationHandler(BaseHTTPRequestHandler):
+    #  Class handling the HTTP requests to the validation service. The server attributes pool (the pool of worker
+    #  processes), slots (a semaphore bounding the number of jobs running or waiting), workers, and restarts and
+    #  last_restart (the number of times the pool has been replaced after a worker process died, and the time of the
+    #  last one) are set by serve.
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_json(404, {"status": "not found"})
+            return
+
+        server = self.server
+        self.send_json(
+            200,
+            {
+                "status": "degraded" if server.restarts else "ok",
+                "workers": server.workers,
+                "jobs": server.jobs,
+                "capacity": server.capacity,
+                "restarts": server.restarts,
+                "last_restart": server.last_restart,
+            },
+        )
+
+    def do_POST(self):
+        if self.path != "/validate":
+            self.send_json(404, {"status": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = json.loads(self.rfile.read(length))
+        except ValueError:
+            self.send_json(400, {"status": "invalid arguments", "log": "Request body is not valid JSON\n"})
+            return
+
+        args, response = parse_job(job)
+        if args is None:
+            self.send_json(200 if response["status"] == "help" else 400, response)
+            return
+
+        #  Refuse the job rather than queueing it without limit if all the workers and queue places are taken
+        server = self.server
+        if not server.slots.acquire(blocking=False):
+            self.send_json(503, {"status": "busy", "log": "Validation service is busy; try again later\n"})
+            return
+
+        try:
+            with server.lock:
+                server.jobs += 1
+                pool = server.pool
+            response = pool.submit(run_job, args).result()
+        except BrokenProcessPool as err:
+            #  A worker process died, so the pool can run no more jobs. Replace it, unless another job has already.
+            with server.lock:
+                if server.pool is pool:
+                    pool.shutdown(wait=False)
+                    server.pool = start_pool(server.workers)
+                    server.restarts += 1
+                    server.last_restart = timer.strftime("%Y-%m-%dT%H:%M:%S")
+                    print("Worker process died; replaced the pool of worker processes")
+            response = {"status": "failed", "error": repr(err), "log": ""}
+        except Exception as err:
+            response = {"status": "failed", "error": repr(err), "log": ""}
+        finally:
+            with server.lock:
+                server.jobs -= 1
+            server.slots.release()
+
+        self.send_json(200 if response["status"] == "ok" else 500, response)
+
+    def send_json(self, code, response):
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        print("%s - %s" % (self.address_string(), format % args))
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, workers=None, queue=DEFAULT_QUEUE):
+    #  Function to start the validation service and handle requests until interrupted
+    #
+    #   Input arguments:
+    #
+    #   host    - address to listen on
+    #   port    - port to listen on
+    #   workers - number of worker processes running validations (None for the number of CPUs)
+    #   queue   - number of jobs that may wait for a free worker before further jobs are refused
+
+    workers = workers or os.cpu_count() or 1
+
+    server = ThreadingHTTPServer((host, port), ValidationHandler)
+    server.daemon_threads = True
+    server.workers = workers
+    server.capacity = workers + queue
+    server.slots = threading.BoundedSemaphore(server.capacity)
+    server.lock = threading.Lock()
+    server.jobs = 0
+    server.restarts = 0
+    server.last_restart = None
+
+    #  Start (and warm) the workers before accepting jobs
+    server.pool = start_pool(workers)
+    print("Validation service listening on http://%s:%d with %d workers" % (host, port, workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.shutdown()
+
+
+def main():
+
+    ##### READ IN COMMAND LINE ARGUMENTS
+
+    parser = argparse.ArgumentParser(
+        description="""
+        Purpose: Script to run a resident validation service, which keeps the libraries and observation data loaded
+        and runs validation jobs (with the same arguments as Calc_2D_MOE_GeoJSON.py) on a bounded pool of worker
+        processes, returning the results in JSON format. Jobs are submitted with validation_client.py.""",
+        epilog="Example of use: ./validation_service.py --port 8765 --workers 4",
+    )
+    parser.add_argument(
+        "--host",
+        help="Optional address to listen on. Default is 127.0.0.1 (local connections only)",
+        type=str,
+        default="127.0.0.1",
+    )
+    parser.add_argument(
+        "--port",
+        help="Optional port to listen on. Default is " + str(DEFAULT_PORT),
+        type=int,
+        default=DEFAULT_PORT,
+    )
+    parser.add_argument(
+        "--workers",
+        help="Optional number of worker processes running validations. Default is the number of CPUs",
+        type=int,
+    )
+    parser.add_argument(
+        "--queue",
+        help="Optional number of jobs that may wait for a free worker before further jobs are refused. Default is "
+        + str(DEFAULT_QUEUE),
+        type=int,
+        default=DEFAULT_QUEUE,
+    )
+
+    args = parser.parse_args()
+
+    #####
+
+    serve(args.host, args.port, args.workers, args.queue)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Script name: bench_clip.py
+Purpose: Benchmark of the clipping of the model contours to the known observation region (the union of the oil and no oil obs),
+the first step of calc_poly_overlap when a no oil file is given. The previous method (dissolving the combined obs and using a
+geopandas overlay) is compared with process_data.clip_to_region, both when the known region has to be built (cold, as for the
+first model run validated against a set of obs) and when it is taken from the in-memory cache (as for later model runs, e.g. in
+ensemble_validation.py or the validation service). For each case in the validation_data directory with a no oil file, the best
+time of each method over several repeats is reported, with the largest difference in the clipped area of any contour level.
+Usage: python benchmarks/bench_clip.py [--repeat REPEAT] [--dataDir DATADIR] [-h]
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+
+import geopandas as gpd
+import pandas as pd
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Python_source")
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "validation_data")
+
+sys.path.insert(0, SOURCE_DIR)
+import process_data
+from batch_validation import discover_cases
+from process_data import clip_to_region, dissolve_levels, known_region, project_dissolve, read_geojson
+
+
+def prepare_case(case, bufwidth=process_data.DEFAULT_BUFWIDTH):
+    #  Function to read a case and prepare the obs and model as calc_poly_overlap does before clipping
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        oil, model, no_oil, casename, tm, plevs = read_geojson(
+            case["obsFile"],
+            case["modelFile"],
+            case["noOilFile"],
+            case["modelType"],
+            case["valType"],
+            case["crs"],
+        )
+    oil = project_dissolve(oil, case["crs"], "test-case")
+    no_oil = project_dissolve(no_oil, case["crs"], "test-case")
+    model = model.to_crs({"init": "epsg:" + str(case["crs"])})
+    if case["modelType"] == "BE":
+        model = dissolve_levels(model)
+    if case["valType"] == "Coastal":
+        for gdf in (oil, model, no_oil):
+            gdf["geometry"] = gdf.geometry.buffer(bufwidth)
+
+    return oil, model, no_oil
+
+
+def clip_overlay(oil, model, no_oil, crs):
+    #  Function to clip the model with the method used by calc_poly_overlap before clip_to_region
+
+    obs_combined = gpd.GeoDataFrame(pd.concat([oil, no_oil], sort=True))
+    obs_combined = obs_combined.dissolve(by="test-case")
+    obs_combined.drop("level", axis=1, inplace=True)
+    obs_combined.crs = {"init": "epsg:" + str(crs)}
+
+    return gpd.overlay(model, obs_combined, how="intersection", keep_geom_type=False)
+
+
+def clip_cold(oil, model, no_oil, crs):
+    #  Function to clip the model with clip_to_region, building the known region from scratch
+
+    process_data.KNOWN_REGION_CACHE.clear()
+
+    return clip_to_region(model, known_region(oil, no_oil))
+
+
+def clip_cached(oil, model, no_oil, crs):
+    #  Function to clip the model with clip_to_region, taking the known region from the cache
+
+    return clip_to_region(model, known_region(oil, no_oil))
+
+
+METHODS = [("overlay", clip_overlay), ("region (cold)", clip_cold), ("region (cached)", clip_cached)]
+
+
+def contour_areas(clipped):
+    #  Function to return the clipped area (in km^2) of each contour level
+
+    return clipped.geometry.area.groupby(clipped["contourlev"].to_numpy()).sum() / 10 ** 6
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark of the clipping of the model to the known observation region")
+    parser.add_argument("--repeat", help="Number of repeats used for the timings (default 5)", type=int, default=5)
+    parser.add_argument("--dataDir", help="Directory searched for test cases (default validation_data)", type=str, default=DATA_DIR)
+    args = parser.parse_args()
+
+    print("%-68s %-5s %-16s %9s %12s" % ("model file", "type", "method", "time(ms)", "max diff"))
+    for caseDir in sorted(glob.glob(os.path.join(args.dataDir, "*"))):
+        for case in discover_cases(caseDir, valType=None):
+            if case["noOilFile"] is None:
+                continue
+            oil, model, no_oil = prepare_case(case)
+            reference = None
+            for name, method in METHODS:
+                times = []
+                for i in range(args.repeat):
+                    start = time.perf_counter()
+                    clipped = method(oil, model, no_oil, case["crs"])
+                    times.append(time.perf_counter() - start)
+                areas = contour_areas(clipped)
+                if reference is None:
+                    reference = areas
+                print(
+                    "%-68s %-5s %-16s %9.1f %12.3e"
+                    % (
+                        os.path.basename(case["modelFile"]),
+                        case["modelType"],
+                        name,
+                        min(times) * 1000,
+                        (areas - reference).abs().max(),
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Script name: bench_coastal.py
+Purpose: Benchmark comparing the 'line' engine used for coastal validation (matching the model and observed coastlines directly,
+see line_engine.py) with the approach of buffering the coastlines into polygons and calculating their overlap ('index' and
+'overlay' engines). For each coastline case in the validation_data directory and each buffer width/tolerance, the time taken by
+calc_poly_overlap (best of several repeats) and the resulting 2-D MOE (x, y) of the highest probability/concentration level are reported.
+Usage: python benchmarks/bench_coastal.py [--repeat REPEAT] [--bufwidth BUFWIDTH [BUFWIDTH ...]] [--dataDir DATADIR] [-h]
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Python_source")
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "validation_data")
+ENGINES = ["overlay", "index", "line"]
+
+sys.path.insert(0, SOURCE_DIR)
+from process_data import calc_poly_overlap, moe_columns, read_geojson
+from batch_validation import discover_cases
+
+
+def measure(case, engine, bufwidth, repeat):
+    #  Function to run calc_poly_overlap for a case with the given engine and buffer width/tolerance, and return
+    #  the best time taken (in s) and the 2-D MOE (x, y) of the last (highest) contour level with any overlap
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        inputs = read_geojson(
+            case["obsFile"],
+            case["modelFile"],
+            case["noOilFile"],
+            case["modelType"],
+            case["valType"],
+            case["crs"],
+        )
+
+    times = []
+    for i in range(repeat):
+        oil, model, no_oil, casename, tm, plevs = [
+            item.copy() if hasattr(item, "copy") else item for item in inputs
+        ]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            oil, model_known, overlap, plevs = calc_poly_overlap(
+                oil,
+                model,
+                no_oil,
+                casename,
+                tm,
+                case["noOilFile"],
+                case["modelType"],
+                case["valType"],
+                case["crs"],
+                engine=engine,
+                keepGeometry=False,
+                bufwidth=bufwidth,
+            )
+        times.append(time.perf_counter() - start)
+
+    if overlap.empty:
+        return min(times), 0.0, 0.0
+
+    obsCol, predCol, overlapCol = moe_columns(engine)
+    last = overlap.iloc[-1]
+
+    return min(times), last[overlapCol] / last[obsCol], last[overlapCol] / last[predCol]
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark of the coastline line-matching engine against buffering")
+    parser.add_argument("--repeat", help="Number of repeats used for the timings (default 3)", type=int, default=3)
+    parser.add_argument(
+        "--bufwidth",
+        help="Buffer widths/tolerances in metres to compare (default 5 and 50)",
+        type=float,
+        nargs="+",
+        default=[5.0, 50.0],
+    )
+    parser.add_argument("--dataDir", help="Directory searched for test cases (default validation_data)", type=str, default=DATA_DIR)
+    args = parser.parse_args()
+
+    print("%-68s %-5s %-8s %8s %9s %7s %7s" % ("model file", "type", "engine", "buf(m)", "time(ms)", "x", "y"))
+    for caseDir in sorted(glob.glob(os.path.join(args.dataDir, "*"))):
+        for case in discover_cases(caseDir, valType=None):
+            if case["valType"] != "Coastal":
+                continue
+            for bufwidth in args.bufwidth:
+                for engine in ENGINES:
+                    seconds, x, y = measure(case, engine, bufwidth, args.repeat)
+                    print(
+                        "%-68s %-5s %-8s %8.1f %9.1f %7.4f %7.4f"
+                        % (os.path.basename(case["modelFile"]), case["modelType"], engine, bufwidth, seconds * 1000, x, y)
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Script name: bench_formats.py
+Purpose: Benchmark comparing the read time and memory use of the same obs and model data stored as GeoJSON, GeoParquet and
+FlatGeobuf (see geo_formats.py). The cases in the validation_data directory are converted to each format in a temporary directory,
+and each file is read with process_data.read_geofile: GeoJSON with the 'gdal' and 'fast' readers, and GeoParquet and FlatGeobuf both
+in full and, for the model files of cases with a no oil file, with the bounding box filter of the observation scene used by
+read_geojson. The read time (best of several repeats), the peak memory use of the process (maximum resident set size, which includes
+that of the imported libraries) and the number of features read are reported. Each file/format combination is run in a fresh Python
+process, so that the peak memory of one read does not hide that of the next. With --explode, each polygon of the files is written as
+a separate feature, to mimic model output with many features.
+Usage: python benchmarks/bench_formats.py [--repeat REPEAT] [--dataDir DATADIR] [--explode] [-h]
+"""
+
+import argparse
+import glob
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Python_source")
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "validation_data")
+
+#  Formats compared: name, file extension and GeoJSON reader (see process_data.read_geofile)
+FORMATS = [
+    ("geojson (gdal)", ".geojson", "gdal"),
+    ("geojson (fast)", ".geojson", "fast"),
+    ("geoparquet", ".parquet", "gdal"),
+    ("flatgeobuf", ".fgb", "gdal"),
+]
+
+
+def convert_case(case, outDir, explode):
+    #  Function to write the files of a case to outDir in each format, and return their paths (by format extension)
+
+    import geopandas as gpd
+    from geo_formats import write_geoparquet
+
+    paths = {}
+    for key in ["obsFile", "modelFile", "noOilFile"]:
+        if case[key] is None:
+            continue
+        gdf = gpd.read_file(case[key], driver="geojson")
+        if explode:
+            gdf = gdf.explode(index_parts=False).reset_index(drop=True)
+        stem = os.path.join(outDir, os.path.splitext(os.path.basename(case[key]))[0])
+        gdf.to_file(stem + ".geojson", driver="GeoJSON")
+        write_geoparquet(gdf, stem + ".parquet")
+        gdf.to_file(stem + ".fgb", driver="FlatGeobuf", SPATIAL_INDEX="YES")
+        paths[key] = stem
+    return paths
+
+
+def measure(path, reader, repeat, obsFile=None, noOilFile=None):
+    #  Function to read a file in the current process, optionally with the bounding box filter of the observation
+    #  scene defined by obsFile and noOilFile, and return the best read time (in s), the peak memory use of the
+    #  process (in MB) and the number of features read
+
+    import contextlib
+    import io
+
+    sys.path.insert(0, SOURCE_DIR)
+    from process_data import read_geofile, scene_bbox
+
+    bbox = None
+    if obsFile is not None:
+        bbox = scene_bbox(read_geofile(obsFile), read_geofile(noOilFile))
+
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            gdf = read_geofile(path, reader, bbox)
+        times.append(time.perf_counter() - start)
+        features = len(gdf)
+        del gdf
+
+    #  ru_maxrss is in kB on Linux
+    return min(times), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, features
+
+
+def run_single(path, reader, repeat, obsFile=None, noOilFile=None):
+    #  Function to measure a single read in a fresh Python process (see measure)
+
+    command = [sys.executable, "-W", "ignore", __file__, "--repeat", str(repeat), "--single", reader, path]
+    if obsFile is not None:
+        command += ["--scene", obsFile, noOilFile]
+    out = subprocess.run(command, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout.split()
+
+    return float(out[-3]), float(out[-2]), int(out[-1])
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark of reading the obs and model files in each file format")
+    parser.add_argument("--repeat", help="Number of repeats used for the timings (default 5)", type=int, default=5)
+    parser.add_argument("--dataDir", help="Directory searched for test cases (default validation_data)", type=str, default=DATA_DIR)
+    parser.add_argument(
+        "--explode", help="Write each polygon as a separate feature, to mimic output with many features", action="store_true"
+    )
+    parser.add_argument("--single", nargs=2, metavar=("READER", "PATH"), help=argparse.SUPPRESS)
+    parser.add_argument("--scene", nargs=2, metavar=("OBSFILE", "NOOILFILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        #  Worker mode: measure a single read and report the result to the parent process
+        reader, path = args.single
+        scene = args.scene or (None, None)
+        seconds, peakMB, features = measure(path, reader, args.repeat, *scene)
+        print(seconds, peakMB, features)
+        return
+
+    sys.path.insert(0, SOURCE_DIR)
+    from batch_validation import discover_cases
+
+    print("%-68s %-22s %9s %9s %10s %9s" % ("file", "format", "size(MB)", "time(ms)", "maxrss(MB)", "features"))
+    with tempfile.TemporaryDirectory() as outDir:
+        done = set()
+        for caseDir in sorted(glob.glob(os.path.join(args.dataDir, "*"))):
+            for case in discover_cases(caseDir, valType=None):
+                paths = convert_case(case, outDir, args.explode)
+                for key, stem in paths.items():
+                    runs = [(name, ext, reader, None) for name, ext, reader in FORMATS]
+                    if key == "modelFile" and "noOilFile" in paths:
+                        scene = (paths["obsFile"] + ".parquet", paths["noOilFile"] + ".parquet")
+                        runs += [(name + " + bbox", ext, reader, scene) for name, ext, reader in FORMATS[2:]]
+                    for name, ext, reader, scene in runs:
+                        if (stem, name) in done:
+                            continue
+                        done.add((stem, name))
+                        path = stem + ext
+                        seconds, peakMB, features = run_single(path, reader, args.repeat, *(scene or (None, None)))
+                        print(
+                            "%-68s %-22s %9.2f %9.1f %10.0f %9d"
+                            % (os.path.basename(stem), name, os.path.getsize(path) / 1024.0 ** 2, seconds * 1000, peakMB, features)
+                        )
+
+
+if __name__ == "__main__":
+    main()
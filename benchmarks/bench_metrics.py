@@ -0,0 +1,107 @@
+"""
+Script name: bench_metrics.py
+Purpose: Benchmark comparing the scalar skill score functions of calc_metrics.py (called once per case and threshold in a
+Python loop) with the vectorized batch kernel calc_metrics_batch, for a synthetic campaign of cases with random areas,
+centroids and bounds. The time taken by each approach and the largest difference between their skill scores are reported.
+Usage: python benchmarks/bench_metrics.py [--cases CASES] [--thresholds THRESHOLDS] [--seed SEED] [-h]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import box
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Python_source")
+
+sys.path.insert(0, SOURCE_DIR)
+import calc_metrics
+from calc_metrics import calc_area_ss, calc_centroid_ss, calc_metrics_batch
+
+
+def synthetic_cases(cases, seed):
+    #  Function to return random observed, predicted and overlap areas, and square obs and model footprints
+    #  (as bounds, minx, miny, maxx, maxy) for a number of cases
+
+    rng = np.random.default_rng(seed)
+    Aob = rng.uniform(10.0, 200.0, cases)
+    Apr = Aob * rng.uniform(0.2, 3.0, cases)
+    Aov = np.minimum(Aob, Apr) * rng.uniform(0.0, 1.0, cases)
+
+    obsSize = np.sqrt(Aob) * 1000.0
+    modelSize = np.sqrt(Apr) * 1000.0
+    obsMin = rng.uniform(0.0, 1e5, (cases, 2))
+    modelMin = obsMin + rng.normal(0.0, 1e4, (cases, 2))
+    obsBounds = np.column_stack([obsMin, obsMin + obsSize[:, np.newaxis]])
+    modelBounds = np.column_stack([modelMin, modelMin + modelSize[:, np.newaxis]])
+
+    return Aob, Apr, Aov, obsBounds, modelBounds
+
+
+def loop_scores(Aob, Apr, obsBounds, modelBounds, thresholds):
+    #  Function to calculate the skill scores of every case and threshold by calling the scalar functions in a loop,
+    #  setting the module thresholds for each pass
+
+    Ass = np.empty((len(Aob), len(thresholds)))
+    Css = np.empty((len(Aob), len(thresholds)))
+    oils = [gpd.GeoDataFrame(geometry=[box(*b)]) for b in obsBounds]
+    models = [gpd.GeoDataFrame(geometry=[box(*b)]) for b in modelBounds]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for k, thr in enumerate(thresholds):
+            calc_metrics.AREA_THRESHOLD = thr
+            calc_metrics.CENTROID_THRESHOLD = thr
+            for i in range(len(Aob)):
+                Ass[i, k] = calc_area_ss(Aob[i], Apr[i])
+                Css[i, k] = calc_centroid_ss(oils[i], models[i])[0]
+    calc_metrics.AREA_THRESHOLD = 1
+    calc_metrics.CENTROID_THRESHOLD = 1
+
+    return Ass, Css
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the scalar and vectorized skill score calculations of calc_metrics.py"
+    )
+    parser.add_argument("--cases", help="Number of synthetic cases. Default is 1000", type=int, default=1000)
+    parser.add_argument(
+        "--thresholds", help="Number of thresholds scored per case. Default is 5", type=int, default=5
+    )
+    parser.add_argument("--seed", help="Seed of the random number generator", type=int, default=0)
+    args = parser.parse_args()
+
+    thresholds = np.linspace(0.5, 2.5, args.thresholds)
+    Aob, Apr, Aov, obsBounds, modelBounds = synthetic_cases(args.cases, args.seed)
+
+    start = time.perf_counter()
+    loopAss, loopCss = loop_scores(Aob, Apr, obsBounds, modelBounds, thresholds)
+    loopTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    obsCentroid = 0.5 * (obsBounds[:, :2] + obsBounds[:, 2:])
+    modelCentroid = 0.5 * (modelBounds[:, :2] + modelBounds[:, 2:])
+    metrics = calc_metrics_batch(
+        Aob, Apr, Aov, obsCentroid, modelCentroid, obsBounds, thresholds, thresholds
+    )
+    batchTime = time.perf_counter() - start
+
+    names = ["%g" % thr for thr in thresholds]
+    batchAss = metrics[["Ass_" + name for name in names]].to_numpy()
+    batchCss = metrics[["Css_" + name for name in names]].to_numpy()
+    difference = max(np.abs(batchAss - loopAss).max(), np.abs(batchCss - loopCss).max())
+
+    print("%d cases x %d thresholds" % (args.cases, args.thresholds))
+    print("%-8s %12s" % ("method", "time (ms)"))
+    print("%-8s %12.1f" % ("loop", 1000 * loopTime))
+    print("%-8s %12.1f" % ("batch", 1000 * batchTime))
+    print("Speed-up : %.0fx, largest difference in skill scores : %.2g" % (loopTime / batchTime, difference))
+
+
+if __name__ == "__main__":
+    main()
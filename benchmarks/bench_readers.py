@@ -0,0 +1,74 @@
+"""
+Script name: bench_readers.py
+Purpose: Benchmark comparing the GeoJSON readers available to read_geojson (see process_data.read_geofile):
+'gdal' (geopandas read_file), 'fast' (geojson_reader.py) and 'stream' (geojson_reader.py, decoding one feature at a time).
+The parse time (best of several repeats) and the increase in peak resident memory are reported for every GeoJSON file
+in the validation_data directory. Each file/reader combination is run in a fresh Python process, so that the peak
+memory of one read does not hide that of the next.
+Usage: python benchmarks/bench_readers.py [--repeat REPEAT] [--dataDir DATADIR] [-h]
+"""
+
+import argparse
+import glob
+import os
+import resource
+import subprocess
+import sys
+import time
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Python_source")
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "validation_data")
+READERS = ["gdal", "fast", "stream"]
+
+
+def measure(path, reader, repeat):
+    #  Function to read a file with the given reader, in the current process, and return the best read time (in s)
+    #  and the increase in peak resident memory (in MB) caused by the first read
+
+    sys.path.insert(0, SOURCE_DIR)
+    from process_data import read_geofile
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        gdf = read_geofile(path, reader)
+        times.append(time.perf_counter() - start)
+        del gdf
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    #  ru_maxrss is in kB on Linux
+    return min(times), (after - before) / 1024.0
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark of the GeoJSON readers used by read_geojson")
+    parser.add_argument("--repeat", help="Number of repeats used for the timings (default 5)", type=int, default=5)
+    parser.add_argument("--dataDir", help="Directory searched for GeoJSON files (default validation_data)", type=str, default=DATA_DIR)
+    parser.add_argument("--single", nargs=2, metavar=("READER", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        #  Worker mode: measure a single file/reader combination and report the result to the parent process
+        reader, path = args.single
+        seconds, peakMB = measure(path, reader, args.repeat)
+        print(seconds, peakMB)
+        return
+
+    print("%-72s %-7s %9s %9s %9s" % ("file", "reader", "size(MB)", "time(ms)", "peak(MB)"))
+    for path in sorted(glob.glob(os.path.join(args.dataDir, "*", "*.geojson"))):
+        sizeMB = os.path.getsize(path) / 1024.0 ** 2
+        for reader in READERS:
+            out = subprocess.run(
+                [sys.executable, "-W", "ignore", __file__, "--repeat", str(args.repeat), "--single", reader, path],
+                check=True,
+                stdout=subprocess.PIPE,
+                universal_newlines=True,
+            ).stdout.split()
+            seconds, peakMB = float(out[-2]), float(out[-1])
+            print("%-72s %-7s %9.2f %9.1f %9.1f" % (os.path.basename(path), reader, sizeMB, seconds * 1000, peakMB))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Script name: bench_startup.py
+Purpose: Benchmark of the start-up cost of the validation script Calc_2D_MOE_GeoJSON.py. Each measurement runs a fresh Python
+interpreter (best of several repeats), to time: importing the modules needed to calculate the metrics; importing the plotting
+and map modules as well, as the script did when they were imported at the top level; and complete runs of the script on a
+validation case with --metricsOnly, --plots none and --plots png. The libraries loaded by a metrics-only run are listed, and the
+largest imports (from python -X importtime) are reported, to show where the remaining start-up time is spent.
+Usage: python benchmarks/bench_startup.py [--repeat REPEAT] [--top TOP] [-h]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Python_source")
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "validation_data")
+
+CASE = [
+    os.path.join(DATA_DIR, "Corsica", "Corsica_contour_geojson_detected_oil_20181008T172210.geojson"),
+    os.path.join(DATA_DIR, "Corsica", "Corsica_contour_geojson_concentration_20181008T172210.geojson"),
+    "BE",
+    "Satellite",
+    "--noOilFile",
+    os.path.join(DATA_DIR, "Corsica", "Corsica_contour_geojson_detected_no_oil_20181008T172210.geojson"),
+]
+
+#  Libraries checked for in the modules loaded by a metrics-only run
+HEAVY_MODULES = ["matplotlib", "plot_maps_metrics", "interactive_map", "pyproj", "geopandas", "pandas", "shapely"]
+
+
+def run_time(command, repeat):
+    #  Function to return the best wall clock time (in s) of running a command in a fresh interpreter
+
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=SOURCE_DIR, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def loaded_modules():
+    #  Function to return which of HEAVY_MODULES are loaded by a metrics-only run of the script
+
+    code = (
+        "import sys; sys.argv = ['Calc_2D_MOE_GeoJSON.py'] + %r + ['--metricsOnly', '--output', '/dev/null']; "
+        "import Calc_2D_MOE_GeoJSON; Calc_2D_MOE_GeoJSON.main(); "
+        "print(' '.join(m for m in %r if m in sys.modules))" % (CASE, HEAVY_MODULES)
+    )
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code], cwd=SOURCE_DIR, check=True, capture_output=True, text=True
+    )
+
+    return result.stdout.split()
+
+
+def largest_imports(top):
+    #  Function to return the largest top-level imports (cumulative time in ms) of the script, from python -X importtime
+
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c", "import Calc_2D_MOE_GeoJSON"],
+        cwd=SOURCE_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if len(name) - len(name.lstrip()) <= 5:
+            #  Only the modules of the script, and the libraries that they import directly
+            imports.append((int(cumulative_us) / 1000.0, name.strip()))
+
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the start-up cost of Calc_2D_MOE_GeoJSON.py")
+    parser.add_argument("--repeat", help="Number of repeats of each measurement. Default is 5", type=int, default=5)
+    parser.add_argument("--top", help="Number of largest imports to report. Default is 8", type=int, default=8)
+    args = parser.parse_args()
+
+    python = [sys.executable, "-W", "ignore"]
+    script = python + ["Calc_2D_MOE_GeoJSON.py"] + CASE
+    measurements = [
+        ("interpreter only", python + ["-c", "pass"]),
+        ("import (metrics modules)", python + ["-c", "import Calc_2D_MOE_GeoJSON"]),
+        (
+            "import (plus plotting/map modules)",
+            python + ["-c", "import Calc_2D_MOE_GeoJSON, interactive_map, plot_maps_metrics"],
+        ),
+        ("run --metricsOnly", script + ["--metricsOnly", "--output", os.devnull]),
+        ("run --plots none", script + ["--plots", "none"]),
+        ("run --plots png", script + ["--plots", "png", "--plotWorkers", "1"]),
+    ]
+
+    print("%-36s %10s" % ("measurement", "time (s)"))
+    for name, command in measurements:
+        print("%-36s %10.3f" % (name, run_time(command, args.repeat)))
+
+    print("\nLibraries loaded by a metrics-only run : ", " ".join(loaded_modules()))
+
+    print("\nLargest imports of Calc_2D_MOE_GeoJSON (cumulative, ms):")
+    for ms, name in largest_imports(args.top):
+        print("%10.1f  %s" % (ms, name))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Script name: bench_suite.py
+Purpose: Benchmark suite of the main functions of the validation: reading the input files (read_geojson), the overlap
+calculation (calc_poly_overlap, with and without the no oil region), the metrics (calc_2DMOE, calc_area_ss, calc_centroid_ss)
+and each of the plots (rendered as by Calc_2D_MOE_GeoJSON.py), for deterministic (BE) and probabilistic (Prob) model output
+against satellite and coastal observations. The cases in validation_data (Corsica and Sea_Empress) are used as fixtures, together
+with synthetic scenes (see synthetic_spill.py) over a sweep of the number of vertices, number of contour levels, fragmentation or
+coastline length, from which scaling curves of the time taken against the size of the scene can be plotted. The best time of a
+number of repeats is reported for each case and function, and written to a JSON file that can be kept as a baseline: when a
+baseline is given, any function that has become slower than the baseline by more than the given factor is reported as a
+regression, and the script exits with a non-zero status.
+Usage: python benchmarks/bench_suite.py [--sweep {vertices,levels,fragments,coastline}] [--values VALUES [VALUES ...]]
+                                        [--valTypes VALTYPES [VALTYPES ...]] [--allFixtures] [--noFixtures] [--noPlots]
+                                        [--repeat REPEAT] [--output OUTPUT] [--baseline BASELINE] [--tolerance TOLERANCE]
+                                        [--minTime MINTIME] [--curves CURVES] [-h]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import shapely
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BENCH_DIR, "..", "Python_source")
+DATA_DIR = os.path.join(BENCH_DIR, "..", "validation_data")
+
+sys.path.insert(0, SOURCE_DIR)
+from batch_validation import discover_cases
+from calc_metrics import calc_2DMOE, calc_area_ss, calc_centroid_ss
+from process_data import calc_poly_overlap, read_geojson
+from render_plots import render_job, use_agg
+from synthetic_spill import write_spill
+from validation import validate
+
+#  Test case directories used as fixtures
+FIXTURES = ["Corsica", "Sea_Empress"]
+
+#  Default values of each parameter of the synthetic scenes, and the values swept by default
+SYNTHETIC_DEFAULTS = {"vertices": 4000, "levels": 5, "fragments": 1, "coastline": 50.0}
+SWEEP_VALUES = {
+    "vertices": [1000, 4000, 16000, 64000],
+    "levels": [2, 5, 10, 20],
+    "fragments": [1, 4, 16, 64],
+    "coastline": [10.0, 50.0, 200.0, 800.0],
+}
+
+#  crs used for the benchmarks, as for the scripts
+CRS = 3857
+
+
+def best_time(setup, function, repeat):
+    #  Function to return the shortest time (in seconds) of a number of calls of function(*setup()), and the result of
+    #  the last call. setup is called (untimed) before each call, e.g. to copy inputs that the function modifies.
+
+    best = None
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+
+    return best, result
+
+
+def count_vertices(*gdfs):
+    #  Function to return the total number of vertices of the geometries of the given geodataframes
+
+    return sum(int(shapely.get_num_coordinates(np.asarray(gdf.geometry)).sum()) for gdf in gdfs if gdf is not None)
+
+
+def bench_case(case, repeat, plots, plotDir):
+    #  Function to time each of the functions of the validation for a single case
+    #
+    #   Input arguments:
+    #
+    #   case    - dictionary with the obsFile, modelFile, noOilFile, modelType and valType of the case, and the details of the
+    #             case (name, source and any synthetic scene parameters) that are added to its records
+    #   repeat  - number of times each function is called, of which the shortest time is kept
+    #   plots   - if True, the time taken to render each of the plots is also measured
+    #   plotDir - directory to which the plots are written
+    #
+    #   Output arguments:
+    #
+    #   records - list of dictionaries, one per function, with the details of the case, the name of the function and its
+    #             time in seconds
+
+    obsFile, modelFile, noOilFile = case["obsFile"], case["modelFile"], case["noOilFile"]
+    modelType, valType = case["modelType"], case["valType"]
+    timings = {}
+
+    #  Read the input files
+    timings["read_geojson"], inputs = best_time(
+        lambda: (obsFile, modelFile, noOilFile, modelType, valType, CRS),
+        read_geojson,
+        repeat,
+    )
+    oil, model, no_oil, casename, validity, plevs = inputs
+    details = dict(
+        {key: value for key, value in case.items() if key not in ["obsFile", "modelFile", "noOilFile"]},
+        input_vertices=count_vertices(oil, model, no_oil),
+    )
+
+    #  Calculate the overlap, with and without the no oil region (the inputs are modified, so copies are passed)
+    def overlap_inputs(noOil):
+        return lambda: (
+            oil.copy(),
+            model.copy(),
+            None if noOil is None else noOil.copy(),
+            casename,
+            validity,
+            None if noOil is None else noOilFile,
+            modelType,
+            valType,
+            CRS,
+            "index",
+            False,
+        )
+
+    timings["calc_poly_overlap (no oil)"], _ = best_time(overlap_inputs(None), calc_poly_overlap, repeat)
+    if no_oil is not None:
+        timings["calc_poly_overlap"], _ = best_time(overlap_inputs(no_oil), calc_poly_overlap, repeat)
+    oilArea, modelKnown, overlap, plevs = calc_poly_overlap(*overlap_inputs(no_oil)())
+
+    #  Calculate the metrics, on the same inputs as in the validation (see validation.py)
+    if not overlap.empty:
+        timings["calc_2DMOE"], _ = best_time(
+            lambda: (overlap["obs_area"], overlap["area_full_contour"], overlap["overlap_full_contour"]),
+            calc_2DMOE,
+            repeat,
+        )
+    timings["calc_area_ss"], _ = best_time(
+        lambda: (oilArea["obs_area"].iloc[0], modelKnown["area_full_contour"].iloc[0]), calc_area_ss, repeat
+    )
+    if valType == "Satellite":
+        timings["calc_centroid_ss"], _ = best_time(lambda: (oilArea, modelKnown), calc_centroid_ss, repeat)
+
+    #  Render each of the plots, in this process (the time is summed over the plots drawn by the same function)
+    if plots:
+        result = validate(obsFile, modelFile, noOilFile, modelType, valType, CRS, keep_geometry=True)
+        for job in result.plot_jobs(plotDir, "all"):
+            seconds, _ = best_time(lambda: (job,), render_job, repeat)
+            name = "plot " + job["function"]
+            timings[name] = timings.get(name, 0.0) + seconds
+
+    return [dict(details, function=name, seconds=seconds) for name, seconds in timings.items()]
+
+
+def fixture_cases(allFixtures):
+    #  Function to return the cases in the fixture directories of validation_data. Unless allFixtures is True, only the
+    #  first case of each model type in each directory is used.
+
+    cases = []
+    for name in FIXTURES:
+        seen = set()
+        for case in discover_cases(os.path.join(DATA_DIR, name)):
+            if not allFixtures and case["modelType"] in seen:
+                continue
+            seen.add(case["modelType"])
+            cases.append(
+                {
+                    "case": os.path.splitext(os.path.basename(case["modelFile"]))[0],
+                    "source": "fixture",
+                    "obsFile": case["obsFile"],
+                    "modelFile": case["modelFile"],
+                    "noOilFile": case["noOilFile"],
+                    "modelType": case["modelType"],
+                    "valType": case["valType"],
+                }
+            )
+
+    return cases
+
+
+def synthetic_cases(sweep, values, valTypes, outDir):
+    #  Function to write the synthetic scenes of a sweep of one of the scene parameters (see SYNTHETIC_DEFAULTS) to
+    #  outDir, and return them as cases. Probabilistic output is used, so that any number of levels can be swept.
+
+    cases = []
+    for valType in valTypes:
+        for value in values:
+            options = dict(SYNTHETIC_DEFAULTS, **{sweep: type(SYNTHETIC_DEFAULTS[sweep])(value)})
+            name = "synthetic_%s_%s=%g" % (valType, sweep, value)
+            files = write_spill(os.path.join(outDir, name), valType, "Prob", **options)
+            cases.append(
+                dict(files, case=name, source="synthetic", modelType="Prob", valType=valType, sweep=sweep, **options)
+            )
+
+    return cases
+
+
+def compare(records, baseline, tolerance, minTime):
+    #  Function to compare the times of the records with those of a baseline (as written with --output), and return the
+    #  records of the functions that have become slower by more than the factor tolerance. Times shorter than minTime
+    #  (in seconds) in both are not compared, since they are dominated by noise.
+
+    reference = {(record["case"], record["function"]): record["seconds"] for record in baseline["records"]}
+    regressions = []
+    print()
+    print("%-60s %-32s %10s %10s %7s" % ("case", "function", "base (s)", "now (s)", "ratio"))
+    for record in records:
+        key = (record["case"], record["function"])
+        if key not in reference:
+            continue
+        ratio = record["seconds"] / reference[key] if reference[key] > 0 else np.inf
+        flag = ""
+        if ratio > tolerance and max(record["seconds"], reference[key]) >= minTime:
+            regressions.append(dict(record, baseline=reference[key], ratio=ratio))
+            flag = "  REGRESSION"
+        print("%-60s %-32s %10.4f %10.4f %7.2f%s" % (key + (reference[key], record["seconds"], ratio, flag)))
+
+    return regressions
+
+
+def plot_curves(records, sweep, path):
+    #  Function to plot the time taken by each function against the swept parameter of the synthetic scenes, on
+    #  log-log axes, with one panel per type of validation, and save the figure to path
+
+    use_agg()
+    import matplotlib.pyplot as plot
+
+    records = [record for record in records if record["source"] == "synthetic"]
+    valTypes = sorted(set(record["valType"] for record in records))
+    fig, axes = plot.subplots(1, len(valTypes), figsize=(7 * len(valTypes), 5), squeeze=False)
+    for ax, valType in zip(axes[0], valTypes):
+        subset = [record for record in records if record["valType"] == valType]
+        for function in sorted(set(record["function"] for record in subset)):
+            points = sorted((record[sweep], record["seconds"]) for record in subset if record["function"] == function)
+            ax.loglog(*zip(*points), marker="o", label=function)
+        ax.set_xlabel(sweep)
+        ax.set_ylabel("time (s)")
+        ax.set_title("Synthetic " + valType + " scenes")
+        ax.grid(True, which="both", alpha=0.3)
+        ax.legend(fontsize="small")
+    fig.savefig(path, bbox_inches="tight")
+    plot.close(fig)
+    print("Scaling curves written to : ", path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite of the validation, on the fixture and synthetic cases")
+    parser.add_argument(
+        "--sweep",
+        help="Parameter of the synthetic scenes to sweep. Default is vertices",
+        choices=sorted(SWEEP_VALUES),
+        default="vertices",
+    )
+    parser.add_argument("--values", help="Values of the swept parameter (default depends on --sweep)", type=float, nargs="+")
+    parser.add_argument(
+        "--valTypes",
+        help="Types of synthetic scene. Default is Satellite Coastal",
+        nargs="+",
+        choices=["Satellite", "Coastal"],
+        default=["Satellite", "Coastal"],
+    )
+    parser.add_argument("--allFixtures", help="Use every case in the fixture directories, not just the first of each model type", action="store_true")
+    parser.add_argument("--noFixtures", help="Only run the synthetic scenes", action="store_true")
+    parser.add_argument("--noPlots", help="Do not time the plots", action="store_true")
+    parser.add_argument("--repeat", help="Number of repeats of each function, of which the best is kept. Default is 3", type=int, default=3)
+    parser.add_argument("--output", help="JSON file to write the results to, e.g. to keep as a baseline", type=str)
+    parser.add_argument("--baseline", help="JSON file of results (written with --output) to compare against", type=str)
+    parser.add_argument(
+        "--tolerance",
+        help="Factor by which a function may be slower than the baseline before it is reported as a regression. Default is 1.5",
+        type=float,
+        default=1.5,
+    )
+    parser.add_argument(
+        "--minTime",
+        help="Times (in seconds) below which functions are not compared with the baseline. Default is 0.005",
+        type=float,
+        default=0.005,
+    )
+    parser.add_argument("--curves", help="png file to plot the scaling curves of the synthetic scenes to", type=str)
+    args = parser.parse_args()
+
+    values = args.values if args.values is not None else SWEEP_VALUES[args.sweep]
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        cases = [] if args.noFixtures else fixture_cases(args.allFixtures)
+        cases += synthetic_cases(args.sweep, values, args.valTypes, tmpDir)
+
+        records = []
+        print("%-60s %-32s %10s %10s" % ("case", "function", "vertices", "time (s)"))
+        for case in cases:
+            with contextlib.redirect_stdout(io.StringIO()):
+                caseRecords = bench_case(case, args.repeat, not args.noPlots, tmpDir)
+            for record in caseRecords:
+                print("%-60s %-32s %10d %10.4f" % (record["case"], record["function"], record["input_vertices"], record["seconds"]))
+            records += caseRecords
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "records": records,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+        print("Results written to : ", args.output)
+
+    if args.curves is not None:
+        plot_curves(records, args.sweep, args.curves)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(records, baseline, args.tolerance, args.minTime)
+        if regressions:
+            print("%d function(s) slower than the baseline by more than a factor of %g" % (len(regressions), args.tolerance))
+            sys.exit(1)
+        print("No regressions against the baseline (tolerance %g)" % args.tolerance)
+
+
+if __name__ == "__main__":
+    main()
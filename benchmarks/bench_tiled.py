@@ -0,0 +1,116 @@
+"""
+Script name: bench_tiled.py
+Purpose: Benchmark of the 'tiled' engine of calc_poly_overlap (see tile_engine.py) on a synthetic spill much larger and more
+detailed than the cases in validation_data. The obs, no oil region and probabilistic model contours are irregular polygons with
+a given number of vertices each, so that the whole case holds several million vertices. The 'index' engine (one exact intersection
+of the whole geometry) is compared with the 'tiled' engine for a range of tile sizes and numbers of worker processes. Each run is
+made in a fresh Python process, and the time taken, the peak memory use (maximum resident set size) and the largest difference
+in the overlap areas from the 'index' engine are reported.
+Usage: python benchmarks/bench_tiled.py [--vertices VERTICES] [--tileVertices TILEVERTICES [TILEVERTICES ...]]
+                                        [--workers WORKERS [WORKERS ...]] [-h]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Python_source")
+
+#  Code run in a fresh process for each measurement: build the synthetic case, and time calc_poly_overlap
+RUN = """
+import contextlib, io, json, resource, sys, time
+import numpy as np
+import geopandas as gpd
+import shapely
+sys.path.insert(0, %(source)r)
+from process_data import calc_poly_overlap
+
+def blob(cx, cy, radius, vertices, seed):
+    #  Irregular polygon with the given number of vertices, around a circle of the given centre and radius (in m)
+    #  (the boundary is a sum of harmonics with random phases, decaying in amplitude up to wavelengths of ~100 m)
+    rng = np.random.default_rng(seed)
+    theta = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    r = np.full(vertices, float(radius))
+    for k in np.unique(np.geomspace(2, radius / 20, 40).astype(int)):
+        r += radius * 0.3 / k * np.sin(k * theta + rng.uniform(0, 2 * np.pi))
+    return shapely.Polygon(np.column_stack([cx + r * np.cos(theta), cy + r * np.sin(theta)]))
+
+n = %(vertices)d
+crs = "EPSG:3857"
+oil = gpd.GeoDataFrame({"test-case": ["synthetic"], "level": [1]}, geometry=[blob(0, 0, 50e3, n, 1)], crs=crs)
+no_oil = gpd.GeoDataFrame({"test-case": ["synthetic"], "level": [0]}, geometry=[blob(-5e3, 0, 90e3, n, 2)], crs=crs)
+levels = [blob(10e3, 5e3, radius, n, 3 + i) for i, radius in enumerate([100e3, 75e3, 50e3, 25e3])]
+cutouts = [outer.difference(inner) for outer, inner in zip(levels[:-1], levels[1:])] + [levels[-1]]
+model = gpd.GeoDataFrame({"contourlev": [0.1, 0.3, 0.5, 0.7]}, geometry=cutouts, crs=crs)
+
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    oil, model_known, overlap, plevs = calc_poly_overlap(
+        oil, model, no_oil, "synthetic", "", "no_oil", "Prob", "Satellite", 3857,
+        engine=%(engine)r, keepGeometry=False, tileVertices=%(tileVertices)r, workers=%(workers)r,
+    )
+seconds = time.perf_counter() - start
+vertices = sum(int(shapely.get_num_coordinates(np.asarray(g.geometry)).sum()) for g in (oil, model, no_oil))
+print(json.dumps({
+    "seconds": seconds,
+    "maxrss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "vertices": vertices,
+    "overlap": overlap["overlap_full_contour"].tolist(),
+}))
+"""
+
+
+def measure(vertices, engine, tileVertices=None, workers=None):
+    #  Function to run calc_poly_overlap on the synthetic case in a fresh process, and return its measurements
+
+    code = RUN % {
+        "source": SOURCE_DIR,
+        "vertices": vertices,
+        "engine": engine,
+        "tileVertices": tileVertices,
+        "workers": workers,
+    }
+    result = subprocess.run([sys.executable, "-W", "ignore", "-c", code], check=True, capture_output=True, text=True)
+
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the 'tiled' engine on a large synthetic spill")
+    parser.add_argument(
+        "--vertices", help="Number of vertices of each synthetic polygon (default 200000)", type=int, default=200000
+    )
+    parser.add_argument(
+        "--tileVertices",
+        help="Largest numbers of vertices in a tile to compare (default 20000 100000 500000)",
+        type=int,
+        nargs="+",
+        default=[20000, 100000, 500000],
+    )
+    parser.add_argument(
+        "--workers",
+        help="Numbers of worker processes to compare (default 1 and the number of CPUs)",
+        type=int,
+        nargs="+",
+        default=sorted({1, os.cpu_count() or 1}),
+    )
+    args = parser.parse_args()
+
+    reference = measure(args.vertices, "index")
+    print("Synthetic case with ", reference["vertices"], " vertices")
+    print("%-8s %12s %8s %9s %12s %12s" % ("engine", "tileVertices", "workers", "time(s)", "maxrss(MB)", "max diff"))
+    print("%-8s %12s %8s %9.2f %12.0f %12.3e" % ("index", "-", "-", reference["seconds"], reference["maxrss"], 0.0))
+    for tileVertices in args.tileVertices:
+        for workers in args.workers:
+            run = measure(args.vertices, "tiled", tileVertices, workers)
+            diff = max(abs(a - b) for a, b in zip(run["overlap"], reference["overlap"]))
+            print(
+                "%-8s %12d %8d %9.2f %12.0f %12.3e"
+                % ("tiled", tileVertices, workers, run["seconds"], run["maxrss"], diff)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Script name: check_golden.py
+Purpose: Regression check of the validation against stored golden values. Every case in validation_data (each Corsica timestamp
+for BE and Prob, and the Sea_Empress coastal cases for BE and Prob) is run as by batch_validation.py, with each of the given
+engines, and the obs, model and overlap areas, the 2-D MOE (x, y) and the skill scores (Ass, Css) of each contour level are compared
+with the golden values in golden_values.json, which are calculated with the reference 'overlay' engine. The exact engines ('overlay',
+'index' and 'tiled') must match to within a tight relative tolerance, while the approximate 'raster' engine has its own, looser,
+tolerances (see TOLERANCES). The time taken by each case and engine is also checked against a runtime budget stored with the
+golden values. The coastal cases are also checked to leave the coastlines passed to the validation unbuffered (as they are
+plotted on the coastal maps). Any difference beyond the tolerances, or time over budget, is reported, and the script exits with a
+non-zero status.
+Run with --update to recalculate the golden values and budgets (e.g. after a deliberate change to the results).
+Usage: python benchmarks/check_golden.py [--engines ENGINES [ENGINES ...]] [--golden GOLDEN] [--budgetScale BUDGETSCALE]
+                                         [--noBudgets] [--update] [-h]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Python_source")
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "validation_data")
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_values.json")
+
+sys.path.insert(0, SOURCE_DIR)
+from batch_validation import discover_cases, validate_case
+from validation import validate
+
+#  Test case directories in validation_data that are checked
+CASE_DIRS = ["Corsica", "Sea_Empress"]
+
+#  Engine used to calculate the golden values, and the engines checked by default
+REFERENCE_ENGINE = "overlay"
+ENGINES = ["overlay", "index", "tiled", "raster"]
+
+#  Values compared for each contour level, and the tolerances of each engine: a value passes if it is within
+#  atol + rtol * |golden value| of the golden value. Areas (obs_area, area_full_contour, overlap_full_contour) use the
+#  relative tolerance, while the 2-D MOE and skill scores (which lie between 0 and 1) use the absolute tolerance.
+AREA_COLUMNS = ["obs_area", "area_full_contour", "overlap_full_contour"]
+SCORE_COLUMNS = ["x", "y", "Ass", "Css"]
+TOLERANCES = {
+    "overlay": {"rtol": 1e-9, "atol": 1e-9},
+    "index": {"rtol": 1e-6, "atol": 1e-6},
+    "tiled": {"rtol": 1e-6, "atol": 1e-6},
+    "raster": {"rtol": 0.01, "atol": 0.005},
+}
+
+#  Runtime budget of each case and engine, as a multiple of the time taken when the golden values were calculated,
+#  with a lower limit (in seconds) so that short cases are not failed by timing noise
+BUDGET_FACTOR = 3.0
+MIN_BUDGET = 2.0
+
+
+def golden_cases(engine):
+    #  Function to return the cases in validation_data that are checked, for the given engine, keyed by the path of the
+    #  model file relative to validation_data. The 'raster' engine only applies to satellite validation.
+
+    cases = {}
+    for name in CASE_DIRS:
+        for case in discover_cases(os.path.join(DATA_DIR, name), engine=engine):
+            if engine == "raster" and case["valType"] != "Satellite":
+                continue
+            cases[os.path.join(name, os.path.basename(case["modelFile"]))] = case
+
+    return cases
+
+
+def run_case(case):
+    #  Function to run the validation of a single case (without plotting), and return the values compared for each
+    #  contour level, with the time taken (in seconds)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = validate_case(case)
+    seconds = time.perf_counter() - start
+
+    columns = ["contourlev", "status"] + AREA_COLUMNS + SCORE_COLUMNS
+    values = [{column: plain(row.get(column)) for column in columns} for row in rows]
+
+    return values, seconds
+
+
+def check_coastal_inputs():
+    #  Function to check that the validation of each coastal case leaves its inputs (ValidationResult.inputs, used to plot
+    #  the coastal and interactive maps) as coastlines, rather than the buffered coastlines used for the overlap, print the
+    #  results, and return the number of failures. The obs are read through an in-memory store (as in the validation
+    #  service), so that they are passed to the overlap calculation already converted to crs and dissolved.
+
+    failed = 0
+    for key, case in golden_cases(REFERENCE_ENGINE).items():
+        if case["valType"] != "Coastal":
+            continue
+
+        result = validate(
+            case["obsFile"],
+            case["modelFile"],
+            case["noOilFile"],
+            case["modelType"],
+            case["valType"],
+            case["crs"],
+            engine=REFERENCE_ENGINE,
+            bufwidth=case["bufwidth"],
+            store={},
+        )
+        types = set()
+        for gdf in result.inputs:
+            if gdf is not None:
+                types.update(gdf.geom_type)
+        buffered = sorted(types - {"LineString", "MultiLineString"})
+
+        print("%-80s %-8s %-6s %s" % (key, "inputs", "FAIL" if buffered else "ok", ", ".join(sorted(types))))
+        failed += bool(buffered)
+
+    return failed
+
+
+def plain(value):
+    #  Function to convert a numpy scalar to the equivalent Python value, so that it can be written as JSON (NaN, which
+    #  is written for missing skill scores in the batch results, is stored as None)
+
+    if value is None:
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+
+    return value
+
+
+def compare_rows(rows, golden, tolerance):
+    #  Function to compare the values of each contour level of a case with the golden values, and return a list of
+    #  descriptions of the differences beyond the tolerance (empty if the case passes), with the largest relative
+    #  difference of any area and the largest absolute difference of any score
+
+    if len(rows) != len(golden):
+        return ["%d contour levels, expected %d" % (len(rows), len(golden))], None, None
+
+    failures = []
+    maxArea, maxScore = 0.0, 0.0
+    for row, expected in zip(rows, golden):
+        if row["contourlev"] != expected["contourlev"] or row["status"] != expected["status"]:
+            failures.append(
+                "level %s (%s), expected level %s (%s)"
+                % (row["contourlev"], row["status"], expected["contourlev"], expected["status"])
+            )
+            continue
+        for column in AREA_COLUMNS + SCORE_COLUMNS:
+            value, reference = row[column], expected[column]
+            if value is None or reference is None:
+                if value is not reference:
+                    failures.append("level %s %s = %s, expected %s" % (row["contourlev"], column, value, reference))
+                continue
+            difference = abs(value - reference)
+            if column in AREA_COLUMNS:
+                allowed = tolerance["atol"] + tolerance["rtol"] * abs(reference)
+                if reference != 0:
+                    maxArea = max(maxArea, difference / abs(reference))
+            else:
+                allowed = tolerance["atol"]
+                maxScore = max(maxScore, difference)
+            if difference > allowed:
+                failures.append(
+                    "level %s %s = %.10g, expected %.10g" % (row["contourlev"], column, value, reference)
+                )
+
+    return failures, maxArea, maxScore
+
+
+def update(engines, path):
+    #  Function to recalculate the golden values with the reference engine, and the runtime budget of each case for each
+    #  of the engines (and the reference engine), and write them to path
+
+    golden = {"reference_engine": REFERENCE_ENGINE, "cases": {}}
+    for key, case in golden_cases(REFERENCE_ENGINE).items():
+        rows, seconds = run_case(case)
+        golden["cases"][key] = {"rows": rows, "budget_s": {}}
+
+    #  The engines are timed once the golden values have been calculated, so that the imports are warm for all of them
+    for engine in [REFERENCE_ENGINE] + [engine for engine in engines if engine != REFERENCE_ENGINE]:
+        for key, case in golden_cases(engine).items():
+            rows, seconds = run_case(case)
+            golden["cases"][key]["budget_s"][engine] = round(max(MIN_BUDGET, BUDGET_FACTOR * seconds), 1)
+            print("%-80s %-8s %8.2f s" % (key, engine, seconds))
+
+    with open(path, "w") as f:
+        json.dump(golden, f, indent=1)
+    print("Golden values written to : ", path)
+
+
+def check(engines, path, budgetScale, budgets):
+    #  Function to check each case and engine against the golden values and runtime budgets in path, print a table of
+    #  the results, and return the number of failures
+
+    with open(path) as f:
+        golden = json.load(f)
+
+    failed = 0
+    print(
+        "%-80s %-8s %-6s %10s %10s %8s %8s"
+        % ("case", "engine", "result", "area diff", "score diff", "time (s)", "budget")
+    )
+    for engine in engines:
+        for key, case in golden_cases(engine).items():
+            if key not in golden["cases"]:
+                print("%-80s %-8s %-6s (no golden values; run with --update)" % (key, engine, "FAIL"))
+                failed += 1
+                continue
+
+            entry = golden["cases"][key]
+            rows, seconds = run_case(case)
+            failures, maxArea, maxScore = compare_rows(rows, entry["rows"], TOLERANCES[engine])
+
+            #  Engines without a budget of their own (e.g. new engines) are held to the budget of the reference engine
+            budget = entry["budget_s"].get(engine, entry["budget_s"][golden["reference_engine"]]) * budgetScale
+            if budgets and seconds > budget:
+                failures.append("took %.2f s, over the budget of %.2f s" % (seconds, budget))
+
+            print(
+                "%-80s %-8s %-6s %10s %10s %8.2f %8.1f"
+                % (
+                    key,
+                    engine,
+                    "FAIL" if failures else "ok",
+                    "-" if maxArea is None else "%.2e" % maxArea,
+                    "-" if maxScore is None else "%.2e" % maxScore,
+                    seconds,
+                    budget,
+                )
+            )
+            for failure in failures:
+                print("    ", failure)
+            failed += bool(failures)
+
+    failed += check_coastal_inputs()
+
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Regression check of the validation results against stored golden values and runtime budgets"
+    )
+    parser.add_argument(
+        "--engines",
+        help="Engines to check. Default is " + " ".join(ENGINES),
+        nargs="+",
+        choices=sorted(TOLERANCES),
+        default=ENGINES,
+    )
+    parser.add_argument("--golden", help="File of golden values. Default is benchmarks/golden_values.json", type=str, default=GOLDEN_FILE)
+    parser.add_argument(
+        "--budgetScale",
+        help="Factor by which to scale the runtime budgets, e.g. on a slower machine. Default is 1",
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument("--noBudgets", help="Do not check the runtime budgets", action="store_true")
+    parser.add_argument(
+        "--update",
+        help="Recalculate the golden values with the reference engine, and the budgets of the engines, and write them to the golden file",
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    if args.update:
+        update(args.engines, args.golden)
+        return
+
+    failed = check(args.engines, args.golden, args.budgetScale, not args.noBudgets)
+    if failed:
+        print("%d case(s) failed the regression check" % failed)
+        sys.exit(1)
+    print("All cases match the golden values")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Script name: synthetic_spill.py
+Purpose: Generator of synthetic oil spill scenes for the benchmarks, with a controllable number of vertices, number of contour
+(probability or thickness) levels, fragmentation of the polygons into separate parts (multipolygons), and coastline length.
+Satellite scenes hold an observed slick, the region where no oil was detected, and model contours that are offset from the
+observation and nested, supplied as cut-outs as the model output in validation_data is. Coastal scenes hold a meandering coastline,
+with the stretches where oil was and was not reported, and nested model stretches. The geometries are built in metres (EPSG:3857)
+and returned in longitude/latitude (EPSG:4326), with the same properties as the files in validation_data. Run as a script, a
+scene is written to GeoJSON files named as in validation_data, so that it can be run with Calc_2D_MOE_GeoJSON.py or
+batch_validation.py.
+Usage: python benchmarks/synthetic_spill.py <outDir> [--valType VALTYPE] [--modelType MODELTYPE] [--vertices VERTICES]
+                                            [--levels LEVELS] [--fragments FRAGMENTS] [--coastline COASTLINE] [--seed SEED] [-h]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import geopandas as gpd
+import shapely
+
+#  Centre of the synthetic scenes (in EPSG:3857 metres; off the west coast of Corsica)
+CENTRE = (950e3, 5235e3)
+
+#  Thickness levels (in micrometres) of the Bonn agreement oil appearance code, used as the levels of BE model output
+BE_LEVELS = [0.04, 0.3, 5.0, 50.0, 200.0]
+
+#  Name and validity time given to the synthetic scenes
+CASENAME = "Synthetic"
+TIME = "2020-01-01T00:00:00"
+
+
+def blob_radius(radius, vertices, rng):
+    #  Function to return the angles and radii (in m) of the vertices of an irregular closed curve around a circle of the
+    #  given radius. The curve is a sum of harmonics with random phases and decaying amplitudes, which together displace
+    #  it by at most 40% of the radius, so that the polygon it bounds is star-shaped and valid.
+
+    vertices = max(int(vertices), 8)
+    theta = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    harmonics = np.unique(np.geomspace(2, max(radius / 20, 3), 30).astype(int))
+    amplitude = 0.4 * radius / harmonics / np.sum(1.0 / harmonics)
+    r = np.full(vertices, float(radius))
+    for k, a in zip(harmonics, amplitude):
+        r += a * np.sin(k * theta + rng.uniform(0, 2 * np.pi))
+
+    return theta, r
+
+
+def blob(cx, cy, radius, vertices, rng):
+    #  Function to return an irregular polygon with the given number of vertices, around a circle of the given centre and
+    #  radius (in m) (see blob_radius)
+
+    theta, r = blob_radius(radius, vertices, rng)
+
+    return shapely.Polygon(np.column_stack([cx + r * np.cos(theta), cy + r * np.sin(theta)]))
+
+
+def nested_blobs(cx, cy, radius, vertices, fragments, scales, rotation, shift, rng):
+    #  Function to return nested multipolygons, as the contours of a smooth field at several levels. Each is made of the
+    #  given number of separate parts (fragments), laid out on a circle of the given centre and radius, and has the
+    #  given total number of vertices. The parts of each contour have the same shapes and centres as those of the
+    #  first, scaled by the corresponding factor in scales, so that for decreasing scales each contour lies strictly
+    #  inside the one before, as the contours of a model do.
+    #
+    #   Input arguments:
+    #
+    #   cx, cy    - centre of the layout (in m)
+    #   radius    - radius of the layout (in m), which is the radius of the single part if fragments is 1
+    #   vertices  - total number of vertices of each contour
+    #   fragments - number of parts of each contour
+    #   scales    - factors (at most 1.3, so that the parts do not meet) by which the parts of each contour are scaled
+    #   rotation  - angle (in radians) of the first part on the layout circle
+    #   shift     - (x, y) displacement of each part from its place on the layout, as a fraction of the part radius
+    #   rng       - numpy random number generator
+    #
+    #   Output arguments:
+    #
+    #   contours - list of multipolygons, one for each scale
+
+    if fragments <= 1:
+        centres, partRadius = [(cx, cy)], radius
+    else:
+        #  Each part is at most 1.4 times its radius across (see blob_radius), so at most 1.3 times this size, the
+        #  parts do not meet their neighbours on the layout circle
+        angles = np.linspace(0, 2 * np.pi, fragments, endpoint=False) + rotation
+        centres = [(cx + radius * 0.6 * np.cos(a), cy + radius * 0.6 * np.sin(a)) for a in angles]
+        partRadius = 0.3 * radius * np.sin(np.pi / fragments)
+
+    centres = [(x + shift[0] * partRadius, y + shift[1] * partRadius) for x, y in centres]
+    shapes = [blob_radius(partRadius, vertices / max(fragments, 1), rng) for _ in centres]
+
+    return [
+        shapely.MultiPolygon(
+            [
+                shapely.Polygon(np.column_stack([x + scale * r * np.cos(theta), y + scale * r * np.sin(theta)]))
+                for (x, y), (theta, r) in zip(centres, shapes)
+            ]
+        )
+        for scale in scales
+    ]
+
+
+def coastline_points(length, vertices, rng):
+    #  Function to return the vertices of a meandering coastline of the given length (in m) along the x axis through the
+    #  scene centre, as an array of shape (vertices, 2)
+
+    vertices = max(int(vertices), 2)
+    x = np.linspace(-length / 2, length / 2, vertices)
+    y = np.zeros(vertices)
+    for k in np.geomspace(1, max(length / 200, 2), 25):
+        y += length * 0.02 / k * np.sin(2 * np.pi * k * x / length + rng.uniform(0, 2 * np.pi))
+
+    return np.column_stack([CENTRE[0] + x, CENTRE[1] + y])
+
+
+def stretch(points, start, stop):
+    #  Function to return the part of a coastline between the given fractions (0 to 1) of its vertices, as a linestring
+
+    n = len(points)
+    i, j = int(start * (n - 1)), int(stop * (n - 1))
+
+    return shapely.LineString(points[i : j + 1]) if j > i else None
+
+
+def stretches(points, bounds):
+    #  Function to return a multilinestring of the parts of a coastline between each pair of fractions in bounds
+
+    lines = [stretch(points, start, stop) for start, stop in bounds]
+
+    return shapely.MultiLineString([line for line in lines if line is not None])
+
+
+def as_multi(geom):
+    #  Function to return a polygon or linestring as a multi-part geometry with one part, as in the files in validation_data
+
+    if geom.geom_type == "Polygon":
+        return shapely.MultiPolygon([geom])
+    if geom.geom_type == "LineString":
+        return shapely.MultiLineString([geom])
+
+    return geom
+
+
+def level_values(modelType, levels):
+    #  Function to return the contour levels of a synthetic model: thickness levels for BE, probabilities (in %) for Prob
+
+    if modelType == "BE":
+        assert levels <= len(BE_LEVELS), "BE output has at most %d levels" % len(BE_LEVELS)
+        return BE_LEVELS[:levels]
+
+    return list(np.linspace(100.0 / (levels + 1), 100.0 * levels / (levels + 1), levels).round(1))
+
+
+def synthetic_spill(
+    valType="Satellite",
+    modelType="Prob",
+    vertices=10000,
+    levels=5,
+    fragments=1,
+    coastline=50.0,
+    seed=0,
+):
+    #  Function to generate a synthetic oil spill scene
+    #
+    #   Input arguments:
+    #
+    #   valType   - Type of validation, either 'Satellite' (polygons) or 'Coastal' (coastlines)
+    #   modelType - Model output type, either 'BE' (up to 5 thickness levels) or 'Prob' (any number of probability levels)
+    #   vertices  - Number of vertices of each contour (of the obs, no oil region and each model level), or of the coastline
+    #   levels    - Number of model contour levels
+    #   fragments - Number of separate parts that the obs and each model contour are split into
+    #   coastline - Length of the coastline in km (Coastal only)
+    #   seed      - Seed of the random number generator
+    #
+    #   Output arguments:
+    #
+    #   oil    - geodataframe containing the observed oil
+    #   model  - geodataframe containing the model contours, as cut-outs
+    #   no_oil - geodataframe defining the observation region where no oil was detected
+
+    assert valType in ["Satellite", "Coastal"], "Invalid valType argument"
+    assert modelType in ["BE", "Prob"], "Invalid modelType argument"
+
+    rng = np.random.default_rng(seed)
+    cx, cy = CENTRE
+    values = level_values(modelType, levels)
+
+    if valType == "Satellite":
+        #  Observed slick, within a larger scene; the no oil region is the rest of the scene
+        rotation = rng.uniform(0, 2 * np.pi)
+        obs = nested_blobs(cx, cy, 20e3, vertices, fragments, [1.0], rotation, (0.0, 0.0), rng)[0]
+        scene = blob(cx, cy, 60e3, vertices, rng)
+        noOil = scene.difference(obs)
+
+        #  Nested model contours, with the parts offset from those of the obs and shrinking with level, and with each
+        #  level cut out of the one below
+        scales = np.linspace(1.3, 0.3, levels)
+        full = nested_blobs(cx, cy, 20e3, vertices, fragments, scales, rotation, (0.4, 0.2), rng)
+        contours = [outer.difference(inner) for outer, inner in zip(full[:-1], full[1:])] + [full[-1]]
+        kind = "contour"
+    else:
+        points = coastline_points(coastline * 1000.0, vertices, rng)
+
+        #  Stretches of coastline where oil was reported, and surveyed stretches without oil
+        edges = np.sort(rng.uniform(0.2, 0.7, 2 * fragments))
+        obsBounds = list(zip(edges[0::2], edges[1::2]))
+        gaps = [0.1] + list(edges) + [0.9]
+        obs = stretches(points, obsBounds)
+        noOil = stretches(points, list(zip(gaps[0::2], gaps[1::2])))
+
+        #  Nested model stretches, shifted a few metres off the coastline, with each level cut out of the one below
+        shifted = points + rng.normal(0.0, 1.0, points.shape)
+        spans = [(0.15 + 0.3 * i / levels, 0.75 - 0.3 * i / levels) for i in range(levels)]
+        contours = []
+        for i, (start, stop) in enumerate(spans):
+            if i + 1 < levels:
+                inner = spans[i + 1]
+                contours.append(stretches(shifted, [(start, inner[0]), (inner[1], stop)]))
+            else:
+                contours.append(stretches(shifted, [(start, stop)]))
+        kind = "coastline"
+
+    def frame(geoms, data, levelValues):
+        return gpd.GeoDataFrame(
+            {"data": data, "level": levelValues, "test-case": CASENAME, "time": TIME},
+            geometry=[as_multi(geom) for geom in geoms],
+            crs="EPSG:3857",
+        ).to_crs("EPSG:4326")
+
+    oil = frame([obs], "detected.oil." + kind, [1.0])
+    no_oil = frame([noOil], "detected.no.oil." + kind, [1.0])
+    model = frame(contours, ("concentration." if modelType == "BE" else "probability.") + kind, values)
+
+    return oil, model, no_oil
+
+
+def write_spill(outDir, valType="Satellite", modelType="Prob", date="20200101T000000", **options):
+    #  Function to generate a synthetic scene (see synthetic_spill) and write it to GeoJSON files in outDir, named as in
+    #  validation_data (e.g. Synthetic_contour_geojson_detected_oil_<date>.geojson), and return their paths
+    #
+    #   Output arguments:
+    #
+    #   files - dictionary with the paths of the obsFile, modelFile and noOilFile
+
+    oil, model, no_oil = synthetic_spill(valType, modelType, **options)
+
+    os.makedirs(outDir, exist_ok=True)
+    prefix = os.path.join(outDir, CASENAME + ("_contour" if valType == "Satellite" else "_coastline") + "_geojson_")
+    files = {
+        "obsFile": prefix + "detected_oil_" + date + ".geojson",
+        "modelFile": prefix + ("concentration_" if modelType == "BE" else "probability_") + date + ".geojson",
+        "noOilFile": prefix + "detected_no_oil_" + date + ".geojson",
+    }
+    for gdf, key in [(oil, "obsFile"), (model, "modelFile"), (no_oil, "noOilFile")]:
+        gdf.to_file(files[key], driver="GeoJSON")
+
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generator of synthetic oil spill scenes in GeoJSON format")
+    parser.add_argument("outDir", help="Directory to write the GeoJSON files to", type=str)
+    parser.add_argument("--valType", help="Either 'Satellite' (default) or 'Coastal'", type=str, default="Satellite")
+    parser.add_argument("--modelType", help="Either 'Prob' (default) or 'BE'", type=str, default="Prob")
+    parser.add_argument("--vertices", help="Number of vertices of each contour (default 10000)", type=int, default=10000)
+    parser.add_argument("--levels", help="Number of model contour levels (default 5)", type=int, default=5)
+    parser.add_argument("--fragments", help="Number of parts of each contour (default 1)", type=int, default=1)
+    parser.add_argument("--coastline", help="Length of the coastline in km (default 50)", type=float, default=50.0)
+    parser.add_argument("--seed", help="Seed of the random number generator (default 0)", type=int, default=0)
+    args = parser.parse_args()
+
+    files = write_spill(
+        args.outDir,
+        args.valType,
+        args.modelType,
+        vertices=args.vertices,
+        levels=args.levels,
+        fragments=args.fragments,
+        coastline=args.coastline,
+        seed=args.seed,
+    )
+    for key, path in files.items():
+        print(key, " : ", path)
+
+
+if __name__ == "__main__":
+    main()
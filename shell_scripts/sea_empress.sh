@@ -85,7 +85,7 @@ echo "Model output file: "$modelfile
 # Run validation scipt, mounting $FILEPATH on host to /media inside the container
 echo "Running validation script..."
 
-docker run -it -v "$FILEPATH":/media omen/geopandas python3.7 Python_source/Calc_2D_MOE_GeoJSON.py \
+docker run -it -v "$FILEPATH":/media omen/geopandas python3.8 Python_source/Calc_2D_MOE_GeoJSON.py \
                    /media/"$oilfile" /media/"$modelfile" $modeltype $valtype --noOilFile /media/"$nooilfile" --crs $crs  \
                    &> $FILEPATH/"$TESTCASE"_2D_MOE_"$valtype"_"$DATE"_"$modeltype"_crs_"$crs".log
 